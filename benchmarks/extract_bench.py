@@ -0,0 +1,102 @@
+"""候选提取微基准：原逐行、逐关键词的正则循环 vs 预编译提取器
+
+用法:
+    python benchmarks/extract_bench.py [--texts 2000] [--repeat 5]
+
+同时校验两种实现对每段文本给出完全相同的候选。
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.extract import CandidateExtractor, KEYWORDS
+
+
+def legacy_extract(text):
+    """原 scan_image 中的提取逻辑（逐行、逐关键词、未编译的正则）"""
+    results = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        for keyword in KEYWORDS:
+            if keyword in line:
+                matches = re.findall(r'[YT][ST][0-9]{8,10}', line, re.IGNORECASE)
+                results.extend(matches)
+                matches = re.findall(r'[:：=](.*?)(?=\s|$)', line)
+                for match in matches:
+                    cleaned = re.sub(r'[^A-Z0-9]', '', match.upper())
+                    if cleaned and len(cleaned) >= 8:
+                        results.append(cleaned)
+        matches = re.findall(r'[YT][ST][0-9]{8,10}', line, re.IGNORECASE)
+        results.extend(matches)
+        matches = re.findall(r'[A-Z]{2}[0-9]{8,10}', line)
+        results.extend(matches)
+    
+    cleaned_results = []
+    for result in results:
+        result = result.upper()
+        result = ''.join(result.split())
+        result = re.sub(r'[^A-Z0-9]', '', result)
+        if result:
+            cleaned_results.append(result)
+    return list(dict.fromkeys(cleaned_results))
+
+
+FILLER = ['收货人', '发货地址', '广东省深圳市', '电话 13800138000', '件数: 3', '重量 12.5kg',
+          'Tel 0755-1234', '备注', 'Date 2024-05-01', '签收', 'ABC', '货物名称 配件']
+
+
+def synthetic_text(rng):
+    """模拟一页 OCR 输出：若干干扰行 + 一到两行运单号"""
+    lines = [rng.choice(FILLER) for _ in range(rng.randint(15, 40))]
+    number = rng.choice(['YS', 'YT', 'ys', 'TS', 'SF']) + ''.join(
+        rng.choice('0123456789') for _ in range(rng.randint(8, 10)))
+    template = rng.choice(['运单号: {}', '单号：{}', 'NO={}', '{}', '快递单 {} 编号',
+                           'Number:{} #', '运输单号 {}'])
+    lines.insert(rng.randrange(len(lines)), template.format(number))
+    return '\n'.join(lines)
+
+
+def bench(func, texts, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            func(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="候选提取微基准")
+    parser.add_argument('--texts', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    texts = [synthetic_text(rng) for _ in range(args.texts)]
+    extractor = CandidateExtractor()
+    
+    mismatches = sum(legacy_extract(t) != extractor.extract(t) for t in texts)
+    legacy = bench(legacy_extract, texts, args.repeat)
+    compiled = bench(extractor.extract, texts, args.repeat)
+    print(json.dumps({
+        'texts': len(texts),
+        'mismatches': mismatches,
+        'legacy_us_per_text': legacy / len(texts) * 1e6,
+        'compiled_us_per_text': compiled / len(texts) * 1e6,
+        'speedup': legacy / compiled,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
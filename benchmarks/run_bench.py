@@ -0,0 +1,189 @@
+"""WaybillScanner 吞吐量与准确率基准
+
+在合成回单（benchmarks/synth.py 生成，或由 --generate 现场生成）上运行识别，
+输出每文件延迟分位数、每秒文件数、各步骤耗时、识别准确率和各工作进程的峰值内存，
+报告为 JSON 便于对比。
+
+用 --options '{"decode_max_side": 0}' 可关闭缩小解码，与默认设置对比内存和速度。
+批量 OCR 与逐张调用对比:
+    python benchmarks/run_bench.py --corpus bench_corpus --backend pytesseract --json single.json
+    python benchmarks/run_bench.py --corpus bench_corpus --backend pytesseract \
+        --options '{"ocr_batch_size": 8}' --compare single.json
+
+用法:
+    python benchmarks/run_bench.py --generate 200 --json report.json
+    python benchmarks/run_bench.py --corpus bench_corpus --workers 8 --compare old.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.batch import BatchRunner
+from core.metrics import percentile
+
+# 与界面默认值一致的识别选项
+DEFAULT_OPTIONS = {
+    'scan_barcode': True,
+    'scan_qrcode': True,
+    'scan_text': True,
+    'min_length': 8,
+    'max_length': 12,
+    'uppercase': True,
+    'lowercase': False,
+    'digits': True,
+    'custom_chars': '',
+    'prefix': '',
+    'suffix': '',
+    'region': None,
+}
+
+
+def latency_summary(seconds):
+    return {
+        'mean_ms': statistics.mean(seconds) * 1000 if seconds else 0.0,
+        'p50_ms': percentile(seconds, 50) * 1000,
+        'p90_ms': percentile(seconds, 90) * 1000,
+        'p95_ms': percentile(seconds, 95) * 1000,
+        'p99_ms': percentile(seconds, 99) * 1000,
+        'max_ms': max(seconds) * 1000 if seconds else 0.0,
+    }
+
+
+def run_benchmark(corpus_dir, options, workers=1, backend='auto'):
+    """运行一次基准，返回报告字典"""
+    with open(os.path.join(corpus_dir, 'manifest.json'), encoding='utf-8') as f:
+        manifest = {item['file']: item for item in json.load(f)}
+    paths = [os.path.join(corpus_dir, name) for name in sorted(manifest)]
+    
+    latencies = []
+    stages = {}
+    produced_by = {}
+    correct = wrong = missed = errors = 0
+    failures = []
+    # 各工作进程的峰值常驻内存（字节）
+    peak_rss = {}
+    
+    runner = BatchRunner(dict(options, workers=workers), ocr_backend=backend)
+    start = time.perf_counter()
+    for result in runner.run(paths):
+        truth = manifest[os.path.basename(result.path)]
+        latencies.append(result.timings.get('total', 0.0))
+        for name, seconds in result.timings.items():
+            entry = stages.setdefault(name, {'count': 0, 'total_s': 0.0})
+            entry['count'] += 1
+            entry['total_s'] += seconds
+        if result.peak_rss:
+            peak_rss[result.worker] = max(peak_rss.get(result.worker, 0), result.peak_rss)
+        
+        if result.error:
+            errors += 1
+            failures.append({'file': truth['file'], 'error': result.error})
+        elif result.number == truth['number']:
+            correct += 1
+            key = result.stage or 'unknown'
+            produced_by[key] = produced_by.get(key, 0) + 1
+        elif result.number:
+            wrong += 1
+            failures.append({'file': truth['file'], 'expected': truth['number'], 'got': result.number})
+        else:
+            missed += 1
+            failures.append({'file': truth['file'], 'expected': truth['number'], 'got': None})
+    wall = time.perf_counter() - start
+    
+    for entry in stages.values():
+        entry['mean_ms'] = entry['total_s'] / entry['count'] * 1000
+    total = len(paths)
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'workers': workers,
+        'backend': backend,
+        'ocr_batch_size': int(options.get('ocr_batch_size') or 1),
+        'files': total,
+        'wall_seconds': wall,
+        'files_per_second': total / wall if wall else 0.0,
+        'latency': latency_summary(latencies),
+        'stages': stages,
+        'produced_by': produced_by,
+        'accuracy': {
+            'correct': correct,
+            'wrong': wrong,
+            'missed': missed,
+            'errors': errors,
+            'rate': correct / total if total else 0.0,
+        },
+        'memory': {
+            'peak_rss_mb_per_worker': sorted(v / 1024 / 1024 for v in peak_rss.values()),
+            'max_peak_rss_mb': max(peak_rss.values()) / 1024 / 1024 if peak_rss else None,
+        },
+        'failures': failures,
+    }
+
+
+def compare(report, baseline):
+    """与基线报告比较主要指标"""
+    rows = [
+        ('files_per_second', report['files_per_second'], baseline['files_per_second']),
+        ('latency.p50_ms', report['latency']['p50_ms'], baseline['latency']['p50_ms']),
+        ('latency.p95_ms', report['latency']['p95_ms'], baseline['latency']['p95_ms']),
+        ('accuracy.rate', report['accuracy']['rate'], baseline['accuracy']['rate']),
+    ]
+    # 旧报告没有内存统计
+    if report.get('memory', {}).get('max_peak_rss_mb') and baseline.get('memory', {}).get('max_peak_rss_mb'):
+        rows.append(('memory.peak_mb', report['memory']['max_peak_rss_mb'], baseline['memory']['max_peak_rss_mb']))
+    lines = []
+    for name, new, old in rows:
+        change = (new - old) / old * 100 if old else 0.0
+        lines.append(f"{name:<18}{old:>12.3f} -> {new:<12.3f}({change:+.1f}%)")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WaybillScanner 基准测试")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--corpus', help="已生成的合成回单文件夹（含 manifest.json）")
+    source.add_argument('--generate', type=int, metavar='N', help="现场生成 N 张合成回单")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--backend', default='auto', help="OCR 后端: auto, tesserocr, pytesseract")
+    parser.add_argument('--options', help="覆盖默认识别选项的 JSON 字符串")
+    parser.add_argument('--json', help="把报告写入 JSON 文件")
+    parser.add_argument('--compare', help="与之前的 JSON 报告比较")
+    args = parser.parse_args()
+    
+    options = dict(DEFAULT_OPTIONS)
+    if args.options:
+        options.update(json.loads(args.options))
+    
+    if args.generate:
+        from benchmarks.synth import generate_corpus
+        corpus = tempfile.mkdtemp(prefix='waybill_bench_')
+        generate_corpus(corpus, args.generate, args.seed)
+    else:
+        corpus = args.corpus
+    
+    report = run_benchmark(corpus, options, args.workers, args.backend)
+    report['options'] = options
+    
+    summary = {k: report[k] for k in ('files', 'files_per_second', 'latency', 'accuracy', 'memory')}
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print(compare(report, json.load(f)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""冷启动与扫描器构造耗时
+
+每轮在新的 Python 进程中测量：导入 core.batch、初始化 Engine（查找二进制、准备 DLL）、
+首次导入 cv2/pytesseract/pyzbar、首个 WaybillScanner 的构造，以及之后每个扫描器的构造耗时。
+
+用法:
+    python benchmarks/startup_bench.py [--rounds 5] [--backend auto] [--json report.json]
+"""
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 之后构造扫描器的次数
+WARM_CONSTRUCTIONS = 20
+
+
+def measure(backend):
+    """在当前（新启动的）进程中测量一次，返回各项耗时（秒）"""
+    timings = {}
+    start = time.perf_counter()
+    importlib.import_module('core.batch')
+    timings['import.core'] = time.perf_counter() - start
+    
+    from core.engine import get_engine
+    from core.scanner import WaybillScanner, cv2, pytesseract, pyzbar
+    start = time.perf_counter()
+    engine = get_engine()
+    timings['engine'] = time.perf_counter() - start
+    
+    # 触发延迟导入（正常运行时发生在第一个文件的识别中）
+    for module in (cv2, pytesseract, pyzbar):
+        getattr(module, '__version__', None)
+    
+    start = time.perf_counter()
+    scanner = WaybillScanner(backend)
+    timings['scanner.first'] = time.perf_counter() - start
+    scanner.close()
+    
+    start = time.perf_counter()
+    for _ in range(WARM_CONSTRUCTIONS):
+        WaybillScanner(backend).close()
+    timings['scanner.warm'] = (time.perf_counter() - start) / WARM_CONSTRUCTIONS
+    
+    timings.update(engine.startup_timings())
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动与扫描器构造耗时")
+    parser.add_argument('--rounds', type=int, default=5, help="冷启动测量轮数（每轮一个新进程）")
+    parser.add_argument('--backend', default='auto', help="OCR 后端: auto, tesserocr, pytesseract")
+    parser.add_argument('--json', help="保存报告的路径")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        print(json.dumps(measure(args.backend)))
+        return 0
+    
+    rounds = []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', '--backend', args.backend],
+            check=True, capture_output=True, text=True, cwd=ROOT
+        ).stdout
+        timings = json.loads(output.strip().splitlines()[-1])
+        timings['process'] = time.perf_counter() - start
+        rounds.append(timings)
+    
+    names = sorted({name for timings in rounds for name in timings})
+    report = {
+        'rounds': args.rounds,
+        'backend': args.backend,
+        'median_ms': {name: statistics.median(t.get(name, 0.0) for t in rounds) * 1000 for name in names},
+    }
+    for name, ms in report['median_ms'].items():
+        print(f"{name:28s} {ms:10.2f} ms")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
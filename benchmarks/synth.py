@@ -0,0 +1,179 @@
+"""离线生成合成运单图片，用于基准测试
+
+每张图片包含一个已知运单号，可带 Code128 条码或二维码、关键词文字行、
+干扰文字，并施加噪声、模糊、旋转和不同 DPI。生成的 manifest.json 记录真值。
+
+用法:
+    python benchmarks/synth.py <输出文件夹> [--count 200] [--seed 0]
+
+可选依赖（缺失时不生成对应的条码）: python-barcode、qrcode，见 benchmarks/requirements.txt
+"""
+import argparse
+import io
+import json
+import os
+import random
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+try:
+    import barcode
+    from barcode.writer import ImageWriter
+except ImportError:
+    barcode = None
+
+try:
+    import qrcode
+except ImportError:
+    qrcode = None
+
+# 回单尺寸（A5，毫米）
+PAGE_MM = (148, 210)
+
+DPIS = (200, 300, 600)
+
+# 常见的中文字体位置（找不到时只绘制英文关键词）
+CJK_FONTS = [
+    'C:/Windows/Fonts/simhei.ttf',
+    'C:/Windows/Fonts/msyh.ttc',
+    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc',
+    '/System/Library/Fonts/PingFang.ttc',
+]
+LATIN_FONTS = [
+    'C:/Windows/Fonts/arial.ttf',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/Library/Fonts/Arial.ttf',
+]
+
+FILLER_CJK = ['收货人：张三', '发货地址：广东省深圳市南山区', '件数：3', '重量：12.5kg',
+              '货物名称：配件', '备注：易碎品', '签收人：', '日期：2024-05-01']
+FILLER_LATIN = ['Consignee: ZHANG SAN', 'Tel: 0755-12345678', 'Pieces: 3', 'Weight: 12.5kg',
+                'Remark: FRAGILE', 'Date: 2024-05-01']
+
+
+def find_font(candidates, size):
+    for path in candidates:
+        if os.path.exists(path):
+            return ImageFont.truetype(path, size)
+    return None
+
+
+def make_number(rng):
+    return rng.choice(['YS', 'YT']) + ''.join(rng.choice('0123456789') for _ in range(8))
+
+
+def render_code128(number, module_px):
+    writer = ImageWriter()
+    code = barcode.get('code128', number, writer=writer)
+    buffer = io.BytesIO()
+    code.write(buffer, options={'module_width': module_px / 10, 'module_height': module_px * 4,
+                                'quiet_zone': 2, 'write_text': False, 'dpi': 254})
+    buffer.seek(0)
+    return Image.open(buffer).convert('L')
+
+
+def render_qr(number, box_px):
+    qr = qrcode.QRCode(border=2, box_size=max(1, box_px))
+    qr.add_data(number)
+    qr.make(fit=True)
+    return qr.make_image(fill_color='black', back_color='white').convert('L')
+
+
+def render_page(rng, number, dpi, kind):
+    """绘制一张回单，返回 PIL 灰度图"""
+    width = int(PAGE_MM[0] / 25.4 * dpi)
+    height = int(PAGE_MM[1] / 25.4 * dpi)
+    page = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    
+    text_size = max(12, int(dpi / 10))
+    cjk = find_font(CJK_FONTS, text_size)
+    font = cjk or find_font(LATIN_FONTS, text_size) or ImageFont.load_default()
+    filler = FILLER_CJK if cjk else FILLER_LATIN
+    
+    # 运单号文字行（随机位置在上半部分）
+    label = rng.choice(['运单号：', '单号：', '快递单号 ']) if cjk else rng.choice(['NO: ', 'Number: ', '# '])
+    x = int(width * rng.uniform(0.05, 0.4))
+    y = int(height * rng.uniform(0.05, 0.35))
+    draw.text((x, y), label + number, fill=0, font=font)
+    
+    # 干扰文字
+    line_height = int(text_size * 1.6)
+    top = int(height * 0.45)
+    for i in range(rng.randint(5, 10)):
+        draw.text((int(width * 0.08), top + i * line_height), rng.choice(filler), fill=0, font=font)
+    
+    # 条码
+    if kind == 'code128' and barcode is not None:
+        code = render_code128(number, max(2, dpi // 100))
+        page.paste(code, (int(width * rng.uniform(0.05, 0.3)), int(height * 0.8)))
+    elif kind == 'qr' and qrcode is not None:
+        qr = render_qr(number, max(2, dpi // 60))
+        page.paste(qr, (int(width * 0.65), int(height * 0.05)))
+    return page
+
+
+def degrade(rng, page, rotation, noise, blur):
+    """施加模糊、旋转和噪声"""
+    if blur:
+        page = page.filter(ImageFilter.GaussianBlur(blur))
+    if rotation:
+        page = page.rotate(rotation, expand=True, fillcolor=255)
+    if noise:
+        pixels = np.asarray(page, dtype=np.float32)
+        pixels += np.random.default_rng(rng.randrange(1 << 30)).normal(0, noise, pixels.shape)
+        page = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    return page
+
+
+def generate_corpus(out_dir, count=200, seed=0, dpis=DPIS):
+    """生成 count 张合成回单和 manifest.json，返回 manifest 列表"""
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    kinds = ['text']
+    if barcode is not None:
+        kinds.append('code128')
+    if qrcode is not None:
+        kinds.append('qr')
+    
+    manifest = []
+    for index in range(count):
+        number = make_number(rng)
+        dpi = rng.choice(dpis)
+        kind = rng.choice(kinds)
+        rotation = rng.choice([0, 0, 0, rng.uniform(-3, 3), 90, 180])
+        noise = rng.choice([0, 0, 8, 20])
+        blur = rng.choice([0, 0, 0.8, 1.5])
+        fmt = rng.choice(['jpg', 'png'])
+        
+        page = degrade(rng, render_page(rng, number, dpi, kind), rotation, noise, blur)
+        filename = f"{index:05d}.{fmt}"
+        save_options = {'dpi': (dpi, dpi)}
+        if fmt == 'jpg':
+            save_options['quality'] = rng.choice([70, 85, 95])
+        page.save(os.path.join(out_dir, filename), **save_options)
+        manifest.append({
+            'file': filename, 'number': number, 'kind': kind, 'dpi': dpi,
+            'rotation': rotation, 'noise': noise, 'blur': blur,
+        })
+    
+    with open(os.path.join(out_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成回单图片")
+    parser.add_argument('out_dir')
+    parser.add_argument('--count', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    manifest = generate_corpus(args.out_dir, args.count, args.seed)
+    print(f"已生成 {len(manifest)} 张图片: {args.out_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,10 @@ import os
 import sys
 from pathlib import Path
 
+# 识别依赖由 core.engine.lazy_import 按名称延迟导入，PyInstaller 的静态分析找不到，需要显式打包
+# （tesserocr、fitz 为可选依赖，未安装时 PyInstaller 只给出警告）
+HIDDEN_IMPORTS = ['cv2', 'pytesseract', 'pyzbar.pyzbar', 'tesserocr', 'fitz']
+
 def main():
     # 获取绝对路径
     current_dir = Path.cwd()
@@ -26,6 +30,8 @@ def main():
         '--add-data', './dll;dll',
         '--add-binary', './dll/libzbar-64.dll;.',
     ]
+    for module in HIDDEN_IMPORTS:
+        opts.append(f'--hidden-import={module}')
     
     # 执行打包
     PyInstaller.__main__.run(opts)
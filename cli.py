@@ -0,0 +1,352 @@
+"""运单号识别命令行入口（无界面批处理，不依赖 PyQt6）
+
+示例:
+    python cli.py --source D:/回单 --target D:/回单/success --prefix YS --workers 8
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+# 只依赖标准库，可以在参数校验前导入
+from core.output import DUPLICATE_POLICIES, DEFAULT_DUPLICATE_POLICY, decision_settings
+from core.dryrun import DEFAULT_SAMPLE_SIZE
+
+# 字符集名称与 options 中开关的对应关系
+CHARSETS = {
+    'upper': 'uppercase',
+    'lower': 'lowercase',
+    'digits': 'digits',
+}
+
+# 监视模式下定期导出指标的间隔（秒）
+METRICS_INTERVAL = 10
+
+
+def parse_region(value):
+    """解析 x1,y1,x2,y2 形式的比例坐标"""
+    try:
+        x1, y1, x2, y2 = (float(v) for v in value.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError("区域格式应为 x1,y1,x2,y2（0-1 之间的比例）")
+    if not (0 <= x1 < x2 <= 1 and 0 <= y1 < y2 <= 1):
+        raise argparse.ArgumentTypeError("区域坐标必须满足 0 <= x1 < x2 <= 1, 0 <= y1 < y2 <= 1")
+    return {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2}
+
+
+def parse_charset(value):
+    """解析逗号分隔的字符集名称"""
+    names = [v.strip() for v in value.split(',') if v.strip()]
+    unknown = [n for n in names if n not in CHARSETS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"未知的字符集: {', '.join(unknown)}（可选 {', '.join(CHARSETS)}）")
+    return names
+
+
+def parse_carrier(value):
+    """解析 NAME=REGEX 形式的自定义运单号格式"""
+    name, sep, pattern = value.partition('=')
+    if not sep or not name or not pattern:
+        raise argparse.ArgumentTypeError("运单号格式应为 名称=正则，例如 sf=SF[0-9]{12}")
+    return name, pattern
+
+
+def parse_stage_order(value):
+    """解析逗号分隔的识别阶段顺序（阶段名在导入识别模块后校验）"""
+    stages = [v.strip() for v in value.split(',') if v.strip()]
+    if not stages:
+        raise argparse.ArgumentTypeError("阶段顺序不能为空")
+    if len(set(stages)) != len(stages):
+        raise argparse.ArgumentTypeError("阶段顺序中有重复的阶段")
+    return stages
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="运单号识别与重命名（命令行批处理）")
+    parser.add_argument('--source', help="待处理文件夹")
+    parser.add_argument('--target', help="成功文件夹")
+    parser.add_argument('--min-length', type=int, default=8, help="运单号最小长度")
+    parser.add_argument('--max-length', type=int, default=12, help="运单号最大长度")
+    parser.add_argument('--charset', type=parse_charset, default=['upper', 'digits'],
+                        help="运单号字符构成，逗号分隔: upper,lower,digits（默认 upper,digits）")
+    parser.add_argument('--custom-chars', default='', help="自定义允许字符")
+    parser.add_argument('--prefix', default='YS', help="起始字符")
+    parser.add_argument('--suffix', default='', help="结束字符")
+    parser.add_argument('--region', type=parse_region, default=None,
+                        help="识别区域比例坐标 x1,y1,x2,y2，默认全图")
+    parser.add_argument('--auto-region', action='store_true',
+                        help="从成功文件学习运单号位置，之后优先识别该区域（按配置方案保存）")
+    parser.add_argument('--workers', type=int, default=None, help="并行进程数，默认 CPU 核心数")
+    parser.add_argument('--ocr-batch', type=int, default=1, metavar='N',
+                        help="每 N 个文件（及每 N 行文字）合并为一次 tesseract 调用，"
+                             "未安装 tesserocr 时可减少进程启动开销（默认 1，不合并）")
+    parser.add_argument('--two-phase', action='store_true',
+                        help="两阶段调度：先用条码和快速 OCR 处理全部文件并立即移动成功的，"
+                             "未识别的再用更多 OCR 配置、额外预处理和放大依次重试（不能与 --watch 同时使用）")
+    parser.add_argument('--prefetch', type=int, default=None, metavar='N',
+                        help="后台预读（单进程时还解码）后续 N 个文件，0 不预读（默认 2）")
+    parser.add_argument('--prefetch-mb', type=float, default=None, metavar='MB',
+                        help="预读缓冲区的内存上限（默认 256MB）")
+    parser.add_argument('--carrier', type=parse_carrier, action='append', default=[],
+                        metavar='NAME=REGEX', help="注册额外的运单号格式，可重复指定")
+    parser.add_argument('--stage-order', type=parse_stage_order, default=None, metavar='STAGES',
+                        help="识别阶段顺序，逗号分隔，可省略阶段: barcode,ocr_lines,ocr_fast,ocr_full（默认）")
+    parser.add_argument('--pdf-dpi', type=int, default=None, metavar='DPI',
+                        help="PDF 页面渲染分辨率（默认 200，页面为整页扫描图片时直接使用图片）")
+    parser.add_argument('--preprocess', default='default',
+                        help="OCR 预处理预设: default, fast, binary, clean, scan（默认 default）")
+    parser.add_argument('--no-orient', action='store_true',
+                        help="文字识别前不检测方向和倾斜（回单摆放整齐时可略微加快）")
+    parser.add_argument('--no-barcode', action='store_true', help="不识别条形码")
+    parser.add_argument('--no-qrcode', action='store_true', help="不识别二维码")
+    parser.add_argument('--no-text', action='store_true', help="不进行文字识别")
+    parser.add_argument('--cache', nargs='?', const='default', default=None, metavar='PATH',
+                        help="启用候选缓存，可指定 SQLite 文件路径；修改过滤条件后重跑只需重新过滤")
+    parser.add_argument('--cache-size', type=float, default=None, metavar='MB',
+                        help="缓存大小上限（MB），超出后淘汰最久未使用的条目")
+    parser.add_argument('--profile', default='default',
+                        help="配置方案名称，用于记录各 OCR 配置的命中统计（默认 default）")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="按配置方案的历史命中率和耗时调整 OCR 配置顺序")
+    parser.add_argument('--show-stats', action='store_true',
+                        help="显示配置方案的 OCR 统计后退出")
+    parser.add_argument('--on-duplicate', choices=DUPLICATE_POLICIES, default=DEFAULT_DUPLICATE_POLICY,
+                        help="目标文件已存在时: suffix 加序号保存, skip 跳过, overwrite 覆盖（默认 suffix）")
+    parser.add_argument('--restart', action='store_true',
+                        help="忽略上次未完成的处理记录，重新识别所有文件")
+    parser.add_argument('--dry-run', type=int, nargs='?', const=DEFAULT_SAMPLE_SIZE, default=None, metavar='N',
+                        help=f"试运行：随机识别 N 个文件（默认 {DEFAULT_SAMPLE_SIZE}），不移动文件，"
+                             "输出识别率、各步骤耗时、预计总耗时和未识别的文件")
+    parser.add_argument('--seed', type=int, default=None, help="试运行抽样的随机种子，便于对比不同选项")
+    parser.add_argument('--watch', action='store_true',
+                        help="监视模式：持续处理新放入待处理文件夹的文件，Ctrl+C 停止")
+    parser.add_argument('--settle', type=float, default=None, metavar='SECONDS',
+                        help="监视模式下文件多久不再变化才认为写入完成（默认 1 秒）")
+    parser.add_argument('--queue-size', type=int, default=None,
+                        help="监视模式下待识别队列长度上限（默认 64）")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="导出各步骤耗时直方图和结果计数：.prom 为 Prometheus 文本格式，其他为 JSON")
+    parser.add_argument('--verbose', action='store_true', help="输出调试日志")
+    parser.add_argument('--output', default='-', help="JSON lines 结果输出文件，默认标准输出")
+    return parser
+
+
+def build_options(args):
+    """把命令行参数转换为与界面 start_process 相同的 options 字典"""
+    options = {
+        'scan_barcode': not args.no_barcode,
+        'scan_qrcode': not args.no_qrcode,
+        'scan_text': not args.no_text,
+        'min_length': args.min_length,
+        'max_length': args.max_length,
+        'custom_chars': args.custom_chars,
+        'prefix': args.prefix,
+        'suffix': args.suffix,
+        'region': args.region,
+        'workers': args.workers,
+        'ocr_batch_size': args.ocr_batch,
+        'two_phase': args.two_phase,
+        'prefetch_mb': args.prefetch_mb,
+        'preprocess': args.preprocess,
+        'orientation': not args.no_orient,
+        'carrier_patterns': dict(args.carrier),
+        'profile': args.profile,
+        'adaptive': args.adaptive,
+        'auto_region': args.auto_region,
+    }
+    for name, key in CHARSETS.items():
+        options[key] = name in args.charset
+    if args.stage_order:
+        options['stage_order'] = args.stage_order
+    if args.pdf_dpi is not None:
+        options['pdf_dpi'] = args.pdf_dpi
+    if args.prefetch is not None:
+        options['prefetch'] = args.prefetch
+    if args.cache:
+        from core.cache import DEFAULT_CACHE_PATH
+        options['cache_path'] = DEFAULT_CACHE_PATH if args.cache == 'default' else args.cache
+        if args.cache_size:
+            options['cache_max_mb'] = args.cache_size
+    return options
+
+
+def run_dry(args, options):
+    """试运行：识别随机样本，报告写入 --output（JSON），摘要输出到标准错误"""
+    from core.files import list_image_files
+    from core.dryrun import DryRun, format_report
+    dry_run = DryRun(list_image_files(args.source), options, args.dry_run, seed=args.seed)
+    print(f"试运行：从 {dry_run.total} 个文件中抽取 {len(dry_run.sample)} 个", file=sys.stderr)
+    try:
+        for _ in dry_run.run():
+            pass
+    except KeyboardInterrupt:
+        print("已停止，报告只包含已识别的样本", file=sys.stderr)
+    report = dry_run.report()
+    print(format_report(report), file=sys.stderr)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        out.write(json.dumps(report, ensure_ascii=False, indent=2) + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if args.metrics:
+        dry_run.runner.metrics.write(args.metrics)
+    return 0
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+    
+    if args.show_stats:
+        from core.profiles import ProfileStore, format_stats_table
+        print(format_stats_table(ProfileStore().stats_table(args.profile)))
+        return 0
+    
+    if not args.source or (not args.target and args.dry_run is None):
+        parser.error("必须指定 --source 和 --target")
+    if args.two_phase and args.watch:
+        parser.error("--two-phase 需要完整的文件列表，不能与 --watch 同时使用")
+    if args.dry_run is not None and (args.dry_run < 1 or args.watch):
+        parser.error("--dry-run 的样本数必须大于 0，且不能与 --watch 同时使用")
+    if not os.path.isdir(args.source):
+        parser.error(f"待处理文件夹不存在: {args.source}")
+    if args.min_length > args.max_length:
+        parser.error("最小长度不能大于最大长度")
+    if args.no_barcode and args.no_qrcode and args.no_text:
+        parser.error("请至少保留一种识别方式")
+    if args.dry_run is None:
+        os.makedirs(args.target, exist_ok=True)
+    
+    # 参数校验通过后再导入识别模块（cv2、tesseract 等）
+    from core.batch import BatchRunner
+    from core.files import list_image_files
+    from core.output import OutputStage
+    from core.preprocess import PRESETS
+    from core.extract import get_extractor
+    from core.scanner import STAGES
+    from core.pdf import MIN_PDF_DPI, MAX_PDF_DPI
+    if args.preprocess not in PRESETS:
+        parser.error(f"未知的预处理预设: {args.preprocess}（可选 {', '.join(PRESETS)}）")
+    unknown = [stage for stage in args.stage_order or [] if stage not in STAGES]
+    if unknown:
+        parser.error(f"未知的识别阶段: {', '.join(unknown)}（可选 {', '.join(STAGES)}）")
+    if args.pdf_dpi is not None and not MIN_PDF_DPI <= args.pdf_dpi <= MAX_PDF_DPI:
+        parser.error(f"--pdf-dpi 必须在 {MIN_PDF_DPI}-{MAX_PDF_DPI} 之间")
+    try:
+        get_extractor({'carrier_patterns': dict(args.carrier)})
+    except ValueError as e:
+        parser.error(str(e))
+    
+    options = build_options(args)
+    if args.dry_run is not None:
+        return run_dry(args, options)
+    watcher = None
+    if args.watch:
+        from core.watch import FolderWatcher, DEFAULT_SETTLE_TIME, DEFAULT_QUEUE_SIZE
+        watcher = FolderWatcher(
+            args.source,
+            settle_time=DEFAULT_SETTLE_TIME if args.settle is None else args.settle,
+            queue_size=args.queue_size or DEFAULT_QUEUE_SIZE
+        )
+        source = watcher.start()
+        print(f"正在监视 {args.source}，按 Ctrl+C 停止", file=sys.stderr)
+    else:
+        source = list_image_files(args.source)
+    # 上次处理中断时继续：已有决定的文件不再识别
+    output = OutputStage(args.target, args.on_duplicate, resume=not args.restart,
+                         settings=decision_settings(options))
+    if output.resumed:
+        print(f"继续上次未完成的处理，已完成 {output.resumed} 个文件", file=sys.stderr)
+    source = output.pending(source)
+    if watcher is None:
+        # 两阶段调度需要完整的文件列表
+        source = list(source)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    finished = False
+    processed = 0
+    success_count = 0
+    failed_count = 0
+    duplicate_count = 0
+    cache_hits = 0
+    last_metrics = time.monotonic()
+    
+    runner = BatchRunner(options)
+    results = runner.run(source)
+    try:
+        for result in results:
+            record = result.to_dict()
+            record['new_name'] = None
+            if result.number and not result.error:
+                try:
+                    record['new_name'] = output.commit(result.path, result.number)
+                    record['duplicate'] = record['new_name'] is None
+                except OSError as e:
+                    record['error'] = str(e)
+            if not result.number or record['error']:
+                output.fail(result.path, record['error'] or 'not recognized')
+            
+            if watcher is not None:
+                # 端到端延迟：文件写入完成被发现到重命名完成
+                arrival = watcher.arrival(result.path)
+                if arrival is not None:
+                    record['latency'] = time.monotonic() - arrival
+                    runner.metrics.observe_value('watch.latency', record['latency'])
+                record['queue_depth'] = watcher.depth()
+                runner.metrics.set_gauge('watch_queue_depth', record['queue_depth'])
+                runner.metrics.set_gauge('watch_queue_depth_max', watcher.max_depth)
+            
+            processed += 1
+            if result.cache == 'hit':
+                cache_hits += 1
+            if record['new_name']:
+                success_count += 1
+            elif record.get('duplicate'):
+                duplicate_count += 1
+            else:
+                failed_count += 1
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            out.flush()
+            
+            # 监视模式长时间运行，定期导出指标
+            if watcher is not None and args.metrics and time.monotonic() - last_metrics >= METRICS_INTERVAL:
+                runner.metrics.write(args.metrics)
+                last_metrics = time.monotonic()
+        finished = True
+    except KeyboardInterrupt:
+        print("已停止", file=sys.stderr)
+        # 监视模式由 Ctrl+C 正常停止
+        finished = watcher is not None
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        results.close()
+        # 中断时不标记结束，下次运行从中断处继续
+        output.close(finished)
+        if out is not sys.stdout:
+            out.close()
+        if args.metrics:
+            runner.metrics.write(args.metrics)
+    
+    print(f"处理完成！总数：{processed} 成功：{success_count} 失败：{failed_count} "
+          f"重复跳过：{duplicate_count}", file=sys.stderr)
+    if options.get('cache_path'):
+        print(f"缓存命中：{cache_hits}/{processed}", file=sys.stderr)
+    for name, phase in runner.metrics.phases.items():
+        print(f"阶段 {name}：{phase['files']} 个文件，识别 {phase['recognized']} 个"
+              f"（{phase['yield']:.0%}），耗时 {phase['seconds']:.1f}s", file=sys.stderr)
+    stall = runner.metrics.stall_summary()
+    if processed:
+        print(f"读取 {stall['read']:.1f}s 解码 {stall['decode']:.1f}s 识别 {stall['recognize']:.1f}s "
+              f"等待预读 {stall['wait']:.1f}s（{stall['wait_ratio']:.0%}，"
+              f"{'读盘' if stall['bound'] == 'io' else '识别'}为瓶颈）", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
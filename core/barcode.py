@@ -0,0 +1,142 @@
+import logging
+
+import numpy as np
+
+from core.preprocess import to_gray
+from core.engine import lazy_import
+
+cv2 = lazy_import('cv2')
+pyzbar = lazy_import('pyzbar.pyzbar')
+
+logger = logging.getLogger(__name__)
+
+# 定位时把图像缩小到该边长以内，加快梯度与形态学运算
+LOCATE_MAX_SIDE = 1000
+
+# 候选区域解码时尝试的缩放比例（小条码放大、高分辨率条码缩小）
+DECODE_SCALES = (1.0, 2.0, 0.5)
+
+# 最多解码的候选区域数
+MAX_REGIONS = 6
+
+# 候选区域最小面积（占缩小后图像面积的比例）和四周留白比例
+MIN_REGION_AREA = 0.002
+REGION_PADDING = 0.15
+
+
+def locate_barcodes(gray, max_regions=MAX_REGIONS):
+    """用梯度和形态学定位可能的条码/二维码区域
+    
+    返回原图坐标的 (x, y, w, h) 列表，按面积从大到小排列。
+    一维码的条纹方向梯度远大于垂直方向梯度，分别处理横向和竖向两种摆放。
+    """
+    height, width = gray.shape[:2]
+    scale = min(1.0, LOCATE_MAX_SIDE / max(height, width))
+    small = gray if scale == 1.0 else cv2.resize(
+        gray, (max(1, int(width * scale)), max(1, int(height * scale))),
+        interpolation=cv2.INTER_AREA)
+    
+    grad_x = cv2.convertScaleAbs(cv2.Sobel(small, cv2.CV_32F, 1, 0, ksize=-1))
+    grad_y = cv2.convertScaleAbs(cv2.Sobel(small, cv2.CV_32F, 0, 1, ksize=-1))
+    
+    boxes = []
+    # 竖条纹（横放条码）、横条纹（竖放条码）
+    for gradient, kernel_size in ((cv2.subtract(grad_x, grad_y), (21, 7)),
+                                  (cv2.subtract(grad_y, grad_x), (7, 21))):
+        boxes.extend(_gradient_regions(gradient, kernel_size))
+    boxes.extend(_qrcode_regions(small))
+    
+    min_area = MIN_REGION_AREA * small.shape[0] * small.shape[1]
+    regions = []
+    for x, y, w, h in sorted(boxes, key=lambda b: b[2] * b[3], reverse=True):
+        if w * h < min_area:
+            continue
+        # 留白并映射回原图坐标
+        pad_x, pad_y = int(w * REGION_PADDING), int(h * REGION_PADDING)
+        x1 = max(0, int((x - pad_x) / scale))
+        y1 = max(0, int((y - pad_y) / scale))
+        x2 = min(width, int((x + w + pad_x) / scale))
+        y2 = min(height, int((y + h + pad_y) / scale))
+        regions.append((x1, y1, x2 - x1, y2 - y1))
+        if len(regions) >= max_regions:
+            break
+    return regions
+
+
+def _gradient_regions(gradient, kernel_size):
+    """梯度图 -> 闭运算连接条纹 -> 轮廓外接矩形"""
+    blurred = cv2.blur(gradient, (9, 9))
+    _, binary = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, kernel_size)
+    closed = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+    closed = cv2.erode(closed, None, iterations=4)
+    closed = cv2.dilate(closed, None, iterations=4)
+    contours, _ = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return [cv2.boundingRect(c) for c in contours]
+
+
+def _qrcode_regions(gray):
+    """OpenCV 二维码检测器给出的区域"""
+    try:
+        found, points = cv2.QRCodeDetector().detect(gray)
+    except cv2.error:
+        return []
+    if not found or points is None:
+        return []
+    return [cv2.boundingRect(np.asarray(points, dtype=np.float32).reshape(-1, 2))]
+
+
+def decode_localized(image, accept=None):
+    """先定位再解码灰度小图，没有可用结果时再解码整图并合并
+    
+    accept(barcodes) 判断定位解出的条码中是否有可用的运单号（例如通过运单号过滤）；
+    面单上的商家二维码、商品条码等被定位解出时，定位漏掉的运单条码仍能由整图解码找到。
+    未指定 accept 时只在定位全部失败时回退。
+    返回 pyzbar 的 Decoded 列表，rect 和 polygon 已换算为输入图像坐标。
+    """
+    gray = to_gray(image)
+    results = []
+    for x, y, w, h in locate_barcodes(gray):
+        crop = gray[y:y + h, x:x + w]
+        for scale in DECODE_SCALES:
+            scaled = crop if scale == 1.0 else cv2.resize(
+                crop, None, fx=scale, fy=scale,
+                interpolation=cv2.INTER_CUBIC if scale > 1 else cv2.INTER_AREA)
+            found = pyzbar.decode(scaled)
+            if found:
+                results.extend(_to_image_coords(found, x, y, scale))
+                break
+    
+    results = _unique(results)
+    if results and (accept is None or accept(results)):
+        return results
+    logger.debug("条码定位未解出可用结果（%s 个条码），回退到整图解码", len(results))
+    return _unique(results + pyzbar.decode(gray))
+
+
+def _to_image_coords(found, offset_x, offset_y, scale):
+    """把裁剪小图上的 rect 和 polygon 换算回原图坐标"""
+    converted = []
+    for barcode in found:
+        left, top, w, h = barcode.rect
+        rect = type(barcode.rect)(
+            int(left / scale) + offset_x, int(top / scale) + offset_y,
+            int(w / scale), int(h / scale))
+        fields = {'rect': rect}
+        # 旧版 pyzbar 的结果没有 polygon
+        if getattr(barcode, 'polygon', None):
+            fields['polygon'] = [type(point)(int(point.x / scale) + offset_x, int(point.y / scale) + offset_y)
+                                 for point in barcode.polygon]
+        converted.append(barcode._replace(**fields))
+    return converted
+
+
+def _unique(results):
+    """同一条码可能在多个重叠区域中被解出，按内容去重"""
+    seen = set()
+    unique = []
+    for barcode in results:
+        if barcode.data not in seen:
+            seen.add(barcode.data)
+            unique.append(barcode)
+    return unique
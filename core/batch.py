@@ -0,0 +1,330 @@
+import os
+import sys
+import time
+import logging
+from multiprocessing import util
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from core.scanner import WaybillScanner, OCR_CONFIGS, STAGES, DEFAULT_STAGE_ORDER
+from core.profiles import ProfileStore, DEFAULT_PROFILES_PATH
+from core.region import RegionLearner
+from core.metrics import Metrics
+from core.output import move_file
+from core.prefetch import Prefetcher, preload, DEFAULT_PREFETCH_DEPTH, DEFAULT_PREFETCH_MB
+
+logger = logging.getLogger(__name__)
+
+# 持续输入（监视模式）时，等待在途任务的最长时间（秒）
+STREAM_POLL_INTERVAL = 0.2
+
+# 输入结束标记
+_END = object()
+
+# 两阶段调度的快速阶段：条码 + 一个快速 OCR 配置，成功的文件立即产出
+FAST_PASS_STAGES = ('barcode', 'ocr_fast')
+
+# 快速阶段和配置的其余阶段之后，仍未识别的文件依次用代价更高的策略重试
+RETRY_PASSES = (
+    # 额外预处理：纠偏、降噪后重新整页识别
+    ('retry_enhance', {'stage_order': ['ocr_fast', 'ocr_full'],
+                       'preprocess_steps': ['grayscale', 'deskew', 'denoise', 'clahe']}),
+    # 全分辨率解码并放大后重新识别条码和文字（小字、小条码）
+    ('retry_upscale', {'stage_order': ['barcode', 'ocr_lines', 'ocr_fast'],
+                       'preprocess_steps': ['grayscale', 'upscale', 'clahe'],
+                       'decode_max_side': 0, 'barcode_decode_max_side': 0}),
+)
+
+# 工作进程内常驻的扫描器（每个进程只初始化一次）
+_worker_scanner = None
+
+
+def move_to_target(file_path, number, target_folder):
+    """以运单号重命名并移动文件（已存在时覆盖），返回新文件名；批处理请使用 OutputStage"""
+    _, ext = os.path.splitext(file_path)
+    new_name = f"{number}{ext}"
+    move_file(file_path, os.path.join(target_folder, new_name))
+    return new_name
+
+
+def default_workers():
+    """默认工作进程数：CPU 核心数"""
+    return os.cpu_count() or 1
+
+
+def peak_rss():
+    """当前进程的峰值常驻内存（字节），无法获取时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        # Windows 没有 resource 模块，安装了 psutil 时使用峰值工作集
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset
+        except (ImportError, AttributeError):
+            return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def _init_worker(ocr_backend):
+    """工作进程初始化：创建常驻扫描器"""
+    global _worker_scanner
+    _worker_scanner = WaybillScanner(ocr_backend)
+    # 工作进程退出时关闭扫描器，写入缓存中尚未保存的计数（fork 出的进程不执行 atexit）
+    util.Finalize(_worker_scanner, _worker_scanner.close, exitpriority=10)
+
+
+def _scan_files(scanner, items, options):
+    """扫描一组 (路径, 预读内容, 预读耗时)（批量 OCR 时合并 tesseract 调用），
+    异常记录到各自的结果中而不是向上抛出"""
+    results = scanner.scan_many([item[0] for item in items], options, [item[1] for item in items])
+    worker = os.getpid()
+    rss = peak_rss()
+    for result, (_, _, timings) in zip(results, items):
+        result.worker = worker
+        result.peak_rss = rss
+        for name, seconds in timings.items():
+            result.add_timing(name, seconds)
+    return results
+
+
+def _scan_in_worker(items, options):
+    return _scan_files(_worker_scanner, items, options)
+
+
+def _chunks(items, size):
+    """按 size 个文件一组打包；持续输入暂时没有新文件（None）时先提交已收集的部分"""
+    chunk = []
+    for item in items:
+        if item is None:
+            if chunk:
+                yield chunk
+                chunk = []
+            yield None
+            continue
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class BatchRunner:
+    """批量识别：把文件分发到多个工作进程，按完成顺序流式返回 ScanResult"""
+    def __init__(self, options, workers=None, max_inflight=None, ocr_backend='auto', record=True):
+        self.options = dict(options)
+        self.workers = max(1, int(workers or options.get('workers') or default_workers()))
+        # 同时在途的任务数上限，避免一次性提交整个文件夹
+        self.max_inflight = max_inflight or self.workers * 2
+        self.ocr_backend = ocr_backend
+        # 每个任务包含的文件数：大于 1 时同一 OCR 配置的识别合并为一次调用
+        self.batch_size = max(1, int(options.get('ocr_batch_size') or 1))
+        # 预读的文件数（0 不预读）和预读缓冲区的内存上限
+        self.prefetch_depth = max(0, int(options.get('prefetch', DEFAULT_PREFETCH_DEPTH)))
+        self.prefetch_bytes = int(float(options.get('prefetch_mb') or DEFAULT_PREFETCH_MB) * 1024 * 1024)
+        self.prefetcher = None
+        # 两阶段调度（只用于有限的文件列表）及当前阶段覆盖的识别选项
+        self.two_phase = bool(options.get('two_phase'))
+        self.phase_options = {}
+        # 按步骤聚合的耗时直方图和结果计数
+        self.metrics = Metrics()
+        
+        # 配置方案：记录各 OCR 配置的命中统计，自适应模式下按统计调整执行顺序
+        self.profile = options.get('profile')
+        self.profiles = None
+        # 试运行等不应影响配置方案的运行：仍按统计调整顺序，但不记录命中和学到的区域
+        self.record = record
+        if self.profile:
+            self.profiles = ProfileStore(options.get('profiles_path') or DEFAULT_PROFILES_PATH)
+            if options.get('adaptive'):
+                stage_order, stage_configs = self.profiles.adaptive_plan(
+                    self.profile,
+                    options.get('stage_order') or DEFAULT_STAGE_ORDER,
+                    STAGES
+                )
+                self.options['stage_order'] = stage_order
+                self.options['stage_configs'] = stage_configs
+                logger.debug("自适应识别顺序: %s %s", stage_order, stage_configs)
+        
+        # 自动区域：从前几个成功文件学习热点区域，之后的文件优先在该区域内识别
+        self.region_learner = None
+        if options.get('auto_region'):
+            initial = self.profiles.learned_region(self.profile) if self.profiles else None
+            self.region_learner = RegionLearner(initial=initial)
+    
+    def run(self, paths):
+        """逐个产出识别结果（完成顺序，不保证与输入顺序一致）
+        
+        paths 可以是持续产出的迭代器（如 FolderWatcher），其中的 None 表示暂时没有新文件。
+        """
+        if self.two_phase and isinstance(paths, (list, tuple)):
+            results = self._run_phases(paths)
+        elif self.workers == 1:
+            results = self._run_local(paths)
+        else:
+            results = self._run_pool(paths)
+        try:
+            for result in results:
+                self.metrics.observe(result)
+                if self.prefetcher is not None:
+                    self.metrics.set_gauge('prefetch_buffer_peak_bytes', self.prefetcher.peak_bytes)
+                if not result.error:
+                    if self.profiles is not None and self.record:
+                        self.profiles.record_result(self.profile, result, OCR_CONFIGS)
+                    if self.region_learner is not None:
+                        self.region_learner.observe(result)
+                yield result
+        finally:
+            results.close()
+            if self.profiles is not None and self.record:
+                if self.region_learner is not None:
+                    self.profiles.save_region(self.profile, self.region_learner.bounds())
+                self.profiles.save()
+    
+    def task_options(self):
+        """提交任务时的识别选项（带上当前阶段的选项和学到的热点区域）"""
+        options = dict(self.options, **self.phase_options) if self.phase_options else self.options
+        if self.region_learner is None:
+            return options
+        return dict(options, hot_region=self.region_learner.region())
+    
+    def phase_plan(self):
+        """两阶段调度的各阶段: [(名称, 覆盖的识别选项)]"""
+        order = self.options.get('stage_order') or DEFAULT_STAGE_ORDER
+        fast = [stage for stage in order if stage in FAST_PASS_STAGES] or list(FAST_PASS_STAGES)
+        rest = [stage for stage in order if stage not in FAST_PASS_STAGES]
+        plan = [('fast', {'stage_order': fast})]
+        if rest:
+            # 更多 OCR 配置和 psm 模式
+            plan.append(('retry_full', {'stage_order': rest}))
+        plan.extend(RETRY_PASSES)
+        return plan
+    
+    def _run_phases(self, paths):
+        """两阶段调度：先对全部文件快速识别，成功的立即产出；未识别的进入重试队列，
+        依次用代价更高的策略重试，最后一个阶段仍未识别的按失败产出
+        
+        扫描器（或进程池）在各阶段间复用。每个阶段的耗时和识别数记录到 metrics.phases。
+        """
+        shared = WaybillScanner(self.ocr_backend) if self.workers == 1 else self._new_executor()
+        plan = self.phase_plan()
+        # 重试队列: path -> 上一阶段的结果
+        retry = {}
+        try:
+            for index, (name, overrides) in enumerate(plan):
+                inputs = paths if index == 0 else list(retry)
+                if not inputs:
+                    break
+                last = index == len(plan) - 1
+                self.phase_options = overrides
+                start = time.perf_counter()
+                processed = recognized = 0
+                pending = {}
+                if self.workers == 1:
+                    results = self._run_local(inputs, shared)
+                else:
+                    results = self._run_pool(inputs, shared)
+                try:
+                    for result in results:
+                        processed += 1
+                        previous = retry.get(result.path)
+                        if previous is not None:
+                            # 文件的耗时包括之前各阶段
+                            result.merge_timings(previous)
+                        result.phase = name
+                        if result.number and not result.error:
+                            recognized += 1
+                        if result.number or result.error or last:
+                            yield result
+                        else:
+                            pending[result.path] = result
+                finally:
+                    results.close()
+                retry = pending
+                seconds = time.perf_counter() - start
+                self.metrics.observe_phase(name, processed, recognized, seconds)
+                logger.info("阶段 %s: %d 个文件，识别 %d 个，耗时 %.1f 秒", name, processed, recognized, seconds)
+        finally:
+            self.phase_options = {}
+            if self.workers == 1:
+                shared.close()
+            else:
+                shared.shutdown(wait=True, cancel_futures=True)
+    
+    def _preloaded(self, paths, decode):
+        """在输入前加上预读阶段，产出 (路径, 预读内容, 预读耗时)；不预读时内容为 None"""
+        if not self.prefetch_depth:
+            return (None if path is None else (path, None, {}) for path in paths)
+        
+        def load(path, options, timings):
+            return preload(path, options, timings, decode)
+        
+        self.prefetcher = Prefetcher(paths, load, self.task_options, self.prefetch_depth, self.prefetch_bytes)
+        return iter(self.prefetcher)
+    
+    def _run_local(self, paths, scanner=None):
+        """单进程模式：在当前进程内顺序识别，后台线程预读并解码后续文件（scanner 由调用方传入时不关闭）"""
+        owned = scanner is None
+        if owned:
+            scanner = WaybillScanner(self.ocr_backend)
+        items = self._preloaded(paths, decode=True)
+        try:
+            for chunk in _chunks(items, self.batch_size):
+                if chunk is not None:
+                    yield from _scan_files(scanner, chunk, self.task_options())
+        finally:
+            items.close()
+            if owned:
+                scanner.close()
+    
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.ocr_backend,)
+        )
+    
+    def _run_pool(self, paths, executor=None):
+        """多进程模式：有界在途队列，完成一个补交一个（executor 由调用方传入时不关闭）
+        
+        预读只读取文件内容随任务发送（解码后的像素比压缩文件大得多，由工作进程解码）。
+        """
+        items = self._preloaded(paths, decode=False)
+        chunks = _chunks(items, self.batch_size)
+        owned = executor is None
+        if owned:
+            executor = self._new_executor()
+        pending = set()
+        try:
+            while True:
+                exhausted = self._fill(executor, pending, chunks)
+                if not pending:
+                    if exhausted:
+                        break
+                    continue
+                # 输入还可能有新文件且在途未满时限时等待，及时提交新到达的文件
+                timeout = None if exhausted or len(pending) >= self.max_inflight else STREAM_POLL_INTERVAL
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+        finally:
+            items.close()
+            if owned:
+                executor.shutdown(wait=True, cancel_futures=True)
+            else:
+                for future in pending:
+                    future.cancel()
+    
+    def _fill(self, executor, pending, chunks):
+        """补充在途任务直到达到上限，输入结束时返回 True"""
+        while len(pending) < self.max_inflight:
+            chunk = next(chunks, _END)
+            if chunk is _END:
+                return True
+            if chunk is None:
+                # 持续输入暂时没有新文件
+                return False
+            pending.add(executor.submit(_scan_in_worker, chunk, self.task_options()))
+        return False
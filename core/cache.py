@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 缓存格式版本，识别流程的输出发生变化时递增以使旧缓存失效
+CACHE_VERSION = 2
+
+# 默认缓存位置与大小上限
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.waybill_scanner', 'candidates.sqlite')
+DEFAULT_CACHE_MAX_MB = 256
+
+# 超出上限时淘汰到上限的该比例，避免每次写入都触发淘汰；每次查询待淘汰条目的数量
+EVICT_LOW_WATER = 0.9
+EVICT_BATCH = 256
+
+# 命中时最近访问时间的最小更新间隔（秒），LRU 只需要粗略的访问顺序
+ACCESS_UPDATE_INTERVAL = 60
+# 内存中的计数和访问时间最长多久（秒）或积累多少条写入一次数据库
+FLUSH_INTERVAL = 10
+MAX_PENDING_TOUCHES = 256
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def data_digest(data):
+    """计算已读入内存的文件内容的 SHA-256（与 file_digest 结果相同）"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_cache_key(content_hash, settings):
+    """由文件内容哈希和识别设置生成缓存键"""
+    payload = json.dumps([CACHE_VERSION, content_hash, settings],
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class CandidateCache:
+    """基于 SQLite 的原始候选缓存
+    
+    值为 {阶段/OCR配置: [候选...]}，总大小超过上限时按最近访问时间淘汰（LRU）。
+    多个工作进程共享同一个 WAL 数据库，读取不写库：命中/未命中计数先在内存中累计，
+    最近访问时间每个条目最多每 ACCESS_UPDATE_INTERVAL 秒更新一次，二者随写入或每隔
+    FLUSH_INTERVAL 秒合并到数据库（close 时也会写入）。总大小保存在 stats 表中随写入增减，不再每次求和。
+    """
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_CACHE_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # 尚未写入数据库的计数和访问时间
+        self._counts = {}
+        self._touched = {}
+        self._last_flush = time.monotonic()
+        
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.conn:
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, candidates TEXT NOT NULL, '
+                'size INTEGER NOT NULL, last_access REAL NOT NULL)'
+            )
+            self.conn.execute(
+                'CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access)'
+            )
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS counters ('
+                'name TEXT PRIMARY KEY, value INTEGER NOT NULL)'
+            )
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS stats ('
+                'name TEXT PRIMARY KEY, value INTEGER NOT NULL)'
+            )
+            # 旧版本创建的数据库没有总大小，求和一次
+            self.conn.execute(
+                "INSERT OR IGNORE INTO stats (name, value) "
+                "SELECT 'bytes', COALESCE(SUM(size), 0) FROM entries"
+            )
+    
+    def get(self, key):
+        """读取候选，未命中返回 None"""
+        row = self.conn.execute(
+            'SELECT candidates, last_access FROM entries WHERE key = ?', (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None:
+            self._count('misses')
+        else:
+            self._count('hits')
+            if now - row[1] >= ACCESS_UPDATE_INTERVAL:
+                self._touched[key] = now
+        if time.monotonic() - self._last_flush >= FLUSH_INTERVAL or len(self._touched) >= MAX_PENDING_TOUCHES:
+            with self.conn:
+                self._flush()
+        return None if row is None else json.loads(row[0])
+    
+    def put(self, key, candidates):
+        """写入候选并在超出大小上限时淘汰最久未访问的条目"""
+        data = json.dumps(candidates, ensure_ascii=False)
+        size = len(data.encode('utf-8'))
+        with self.conn:
+            # 先写 stats 取得写锁，再按替换前后的大小差更新总大小
+            self.conn.execute(
+                "UPDATE stats SET value = value + ? - "
+                "COALESCE((SELECT size FROM entries WHERE key = ?), 0) WHERE name = 'bytes'",
+                (size, key)
+            )
+            self.conn.execute(
+                'INSERT OR REPLACE INTO entries (key, candidates, size, last_access) '
+                'VALUES (?, ?, ?, ?)',
+                (key, data, size, time.time())
+            )
+            self._touched.pop(key, None)
+            self._flush()
+            self._evict()
+    
+    def _count(self, name, amount=1):
+        self._counts[name] = self._counts.get(name, 0) + amount
+    
+    def _flush(self):
+        """把内存中的计数和访问时间写入数据库（在调用方的事务中执行）"""
+        for name, amount in self._counts.items():
+            self._increment(name, amount)
+        if self._touched:
+            self.conn.executemany(
+                'UPDATE entries SET last_access = MAX(last_access, ?) WHERE key = ?',
+                [(when, key) for key, when in self._touched.items()]
+            )
+        self._counts.clear()
+        self._touched.clear()
+        self._last_flush = time.monotonic()
+    
+    def _total_bytes(self):
+        return self.conn.execute("SELECT value FROM stats WHERE name = 'bytes'").fetchone()[0]
+    
+    def _evict(self):
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICT_LOW_WATER
+        evicted = freed = 0
+        while total - freed > target:
+            rows = self.conn.execute(
+                'SELECT key, size FROM entries ORDER BY last_access LIMIT ?', (EVICT_BATCH,)
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if total - freed <= target:
+                    break
+                self.conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                freed += size
+                evicted += 1
+        self.conn.execute("UPDATE stats SET value = value - ? WHERE name = 'bytes'", (freed,))
+        self._increment('evictions', evicted)
+        logger.debug("缓存淘汰 %s 条", evicted)
+    
+    def _increment(self, name, amount=1):
+        self.conn.execute(
+            'INSERT INTO counters (name, value) VALUES (?, ?) '
+            'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+            (name, amount)
+        )
+    
+    def stats(self):
+        """缓存统计：命中、未命中、淘汰次数，当前条目数和大小"""
+        with self.conn:
+            self._flush()
+        counters = dict(self.conn.execute('SELECT name, value FROM counters').fetchall())
+        entries = self.conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        return {
+            'hits': counters.get('hits', 0),
+            'misses': counters.get('misses', 0),
+            'evictions': counters.get('evictions', 0),
+            'entries': entries,
+            'bytes': self._total_bytes(),
+        }
+    
+    def clear(self):
+        """清空缓存和计数"""
+        with self.conn:
+            self.conn.execute('DELETE FROM entries')
+            self.conn.execute('DELETE FROM counters')
+            self.conn.execute("UPDATE stats SET value = 0 WHERE name = 'bytes'")
+        self._counts.clear()
+        self._touched.clear()
+    
+    def close(self):
+        """写入尚未保存的计数和访问时间并关闭数据库"""
+        try:
+            with self.conn:
+                self._flush()
+        except sqlite3.Error as e:
+            logger.warning("保存缓存统计失败: %s", e)
+        self.conn.close()
@@ -0,0 +1,128 @@
+import os
+import time
+import random
+
+from core.metrics import percentile
+
+# 默认抽样的文件数
+DEFAULT_SAMPLE_SIZE = 30
+
+
+def sample_files(paths, size, seed=None):
+    """随机抽取 size 个文件（保持原顺序），文件数不足时全部返回"""
+    if size >= len(paths):
+        return list(paths)
+    chosen = set(random.Random(seed).sample(range(len(paths)), size))
+    return [path for index, path in enumerate(paths) if index in chosen]
+
+
+class DryRun:
+    """试运行：识别随机抽取的样本文件，不移动文件、不写处理日志，也不更新配置方案的统计
+    
+    用于在处理整个文件夹之前评估识别率和耗时，调整识别选项。
+    """
+    def __init__(self, paths, options, sample_size=DEFAULT_SAMPLE_SIZE, seed=None, workers=None):
+        # 模块本身只依赖标准库，命令行可以在参数校验前导入
+        from core.batch import BatchRunner
+        self.total = len(paths)
+        self.sample = sample_files(paths, sample_size, seed)
+        self.runner = BatchRunner(options, workers=workers, record=False)
+        self.results = []
+        self.elapsed = 0.0
+    
+    def run(self):
+        """逐个产出样本文件的识别结果"""
+        start = time.perf_counter()
+        results = self.runner.run(self.sample)
+        try:
+            for result in results:
+                self.results.append(result)
+                yield result
+        finally:
+            results.close()
+            self.elapsed = time.perf_counter() - start
+    
+    def report(self):
+        """汇总识别率、各步骤耗时、按工作进程数估算的整批耗时和失败的文件"""
+        recognized = [r for r in self.results if r.number and not r.error]
+        failed = [r for r in self.results if not r.number or r.error]
+        processed = len(self.results)
+        
+        steps = {}
+        for result in self.results:
+            for name, seconds in result.timings.items():
+                steps.setdefault(name, []).append(seconds)
+        
+        # 估算只用实际识别的文件（缓存命中的文件几乎不耗时）
+        measured = [r.timings['total'] for r in self.results if 'total' in r.timings and r.cache != 'hit']
+        if not measured:
+            measured = [r.timings['total'] for r in self.results if 'total' in r.timings]
+        per_file = sum(measured) / len(measured) if measured else 0.0
+        workers = self.runner.workers
+        
+        stages = {}
+        for result in recognized:
+            stages[result.stage] = stages.get(result.stage, 0) + 1
+        return {
+            'total_files': self.total,
+            'sample_size': len(self.sample),
+            'processed': processed,
+            'recognized': len(recognized),
+            'failed': len(failed),
+            'recognition_rate': len(recognized) / processed if processed else 0.0,
+            'stages': stages,
+            'steps': {
+                name: {
+                    'count': len(values),
+                    'mean_ms': sum(values) / len(values) * 1000,
+                    'p90_ms': percentile(values, 90) * 1000,
+                }
+                for name, values in sorted(steps.items())
+            },
+            'cache_hits': sum(1 for r in self.results if r.cache == 'hit'),
+            'workers': workers,
+            'elapsed_seconds': self.elapsed,
+            'per_file_seconds': per_file,
+            'projected_seconds': per_file * self.total / workers,
+            # 两阶段调度时各阶段的产出
+            'phases': dict(self.runner.metrics.phases),
+            'failed_files': [
+                {'path': r.path, 'reason': r.error or 'not recognized'} for r in failed
+            ],
+        }
+
+
+def format_duration(seconds):
+    """把秒数格式化为 时:分:秒"""
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def format_report(report):
+    """把试运行报告格式化为文本"""
+    lines = [
+        f"样本：{report['processed']}/{report['total_files']} 个文件",
+        f"识别率：{report['recognition_rate']:.1%}（{report['recognized']}/{report['processed']}）",
+        f"平均每个文件：{report['per_file_seconds']:.2f} 秒",
+        f"预计处理全部文件：{format_duration(report['projected_seconds'])}（{report['workers']} 个进程）",
+    ]
+    if report['cache_hits']:
+        lines.append(f"缓存命中：{report['cache_hits']}")
+    if report['stages']:
+        lines.append("识别阶段：" + "，".join(f"{stage} {count}" for stage, count in sorted(report['stages'].items())))
+    
+    for name, phase in report.get('phases', {}).items():
+        lines.append(f"阶段 {name}：{phase['files']} 个文件，识别 {phase['recognized']} 个（{phase['yield']:.0%}），"
+                     f"耗时 {phase['seconds']:.1f} 秒")
+    
+    lines.append("")
+    lines.append(f"{'步骤':<20}{'次数':>8}{'平均':>12}{'P90':>12}")
+    for name, step in report['steps'].items():
+        lines.append(f"{name:<20}{step['count']:>8}{step['mean_ms']:>10.1f}ms{step['p90_ms']:>10.1f}ms")
+    
+    if report['failed_files']:
+        lines.append("")
+        lines.append("未识别的文件：")
+        for item in report['failed_files']:
+            lines.append(f"  {os.path.basename(item['path'])}  {item['reason']}")
+    return '\n'.join(lines)
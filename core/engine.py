@@ -0,0 +1,208 @@
+import os
+import sys
+import time
+import types
+import shutil
+import atexit
+import logging
+import threading
+import importlib
+import importlib.util
+import ctypes.util
+
+logger = logging.getLogger(__name__)
+
+# 各依赖模块首次导入的耗时（秒），用于统计冷启动
+IMPORT_TIMINGS = {}
+
+# Windows 下 zbar 依赖的 DLL 复制到该临时目录（打包后的 _MEIPASS 每次启动都会变化）
+DLL_TEMP_NAME = 'waybill_scanner_dll'
+
+# Windows 下 Tesseract 的默认安装位置
+WINDOWS_TESSERACT_PATHS = (
+    r'C:\Program Files\Tesseract-OCR\tesseract.exe',
+    r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe',
+)
+
+# add_dll_directory 返回的句柄被回收时目录会被移除，需要一直持有
+_dll_handles = []
+
+
+class LazyModule(types.ModuleType):
+    """延迟导入的模块：首次访问属性时才真正导入，并记录导入耗时"""
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_lazy_name'] = name
+    
+    def __getattr__(self, attr):
+        return getattr(_load(self), attr)
+
+
+def _load(lazy):
+    """真正导入延迟模块，记录导入耗时"""
+    name = lazy.__dict__['_lazy_name']
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    if name not in IMPORT_TIMINGS:
+        IMPORT_TIMINGS[name] = time.perf_counter() - start
+        logger.debug("导入 %s 耗时 %.3f 秒", name, IMPORT_TIMINGS[name])
+    # 之后的属性访问直接命中，不再经过 __getattr__
+    lazy.__dict__.update(vars(module))
+    lazy.__dict__['_lazy_loaded'] = True
+    return module
+
+
+def lazy_import(name, optional=False):
+    """返回延迟导入的模块；optional 时未安装返回 None（只查找不导入，
+    安装了但无法导入的情况由 module_available 判断）"""
+    if name in sys.modules:
+        return sys.modules[name]
+    if optional and importlib.util.find_spec(name.split('.')[0]) is None:
+        return None
+    return LazyModule(name)
+
+
+# 已确认无法导入的可选依赖: 模块名 -> 错误信息
+_failed_imports = {}
+
+
+def module_available(module):
+    """可选依赖是否真正可用：首次调用时导入一次
+    
+    安装了但导入失败（例如 Windows 上 DLL 缺失或与 Tesseract 版本不匹配）也视为不可用，
+    调用方据此回退，而不是等到每次使用时才出错。
+    """
+    if module is None:
+        return False
+    if not isinstance(module, LazyModule) or module.__dict__.get('_lazy_loaded'):
+        return True
+    name = module.__dict__['_lazy_name']
+    if name in _failed_imports:
+        return False
+    try:
+        _load(module)
+    except Exception as e:
+        logger.warning("可选依赖 %s 无法导入，将不使用: %s", name, e)
+        _failed_imports[name] = str(e)
+        return False
+    return True
+
+
+def application_base_path():
+    """Tesseract-OCR 和 dll 目录所在位置：打包后为 PyInstaller 临时目录，否则为项目根目录"""
+    if getattr(sys, 'frozen', False):
+        return sys._MEIPASS
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def find_tesseract(base_path):
+    """查找 tesseract 可执行文件：随程序附带的优先，其次 PATH 和默认安装位置"""
+    bundled_dir = os.path.join(base_path, 'Tesseract-OCR')
+    exe_name = 'tesseract.exe' if os.name == 'nt' else 'tesseract'
+    bundled = os.path.join(bundled_dir, exe_name)
+    if os.path.isfile(bundled):
+        return bundled, os.path.join(bundled_dir, 'tessdata')
+    
+    candidates = [os.environ.get('TESSERACT_CMD'), shutil.which('tesseract')]
+    if os.name == 'nt':
+        candidates.extend(WINDOWS_TESSERACT_PATHS)
+    for path in candidates:
+        if path and os.path.isfile(path):
+            # 系统安装的 tesseract 使用自己的 tessdata（或 TESSDATA_PREFIX）
+            return path, None
+    raise FileNotFoundError(f"找不到 Tesseract: {bundled}，系统 PATH 中也没有 tesseract")
+
+
+def _same_file(src, dst):
+    """大小和修改时间相同则认为已复制过"""
+    try:
+        a, b = os.stat(src), os.stat(dst)
+    except OSError:
+        return False
+    return a.st_size == b.st_size and int(a.st_mtime) == int(b.st_mtime)
+
+
+def prepare_zbar(base_path):
+    """让 pyzbar 能加载 zbar：Windows 复制附带的 DLL 并加入 PATH，其他平台使用系统 libzbar"""
+    if os.name != 'nt':
+        library = ctypes.util.find_library('zbar')
+        if library is None:
+            logger.warning("未找到系统 libzbar（如 apt install libzbar0），条码识别将不可用")
+        return None
+    
+    dll_path = os.path.join(base_path, 'dll')
+    if not os.path.isdir(dll_path):
+        return None
+    temp_root = os.environ.get('TEMP') or os.environ.get('TMP') or os.path.expanduser('~')
+    temp_dir = os.path.join(temp_root, DLL_TEMP_NAME)
+    os.makedirs(temp_dir, exist_ok=True)
+    
+    for name in os.listdir(dll_path):
+        if not name.lower().endswith('.dll'):
+            continue
+        src = os.path.join(dll_path, name)
+        dst = os.path.join(temp_dir, name)
+        # 未变化的 DLL 不再复制（已被其他进程加载时复制会失败）
+        if not _same_file(src, dst):
+            shutil.copy2(src, dst)
+    
+    # 添加 DLL 路径到环境变量（Python 3.8+ 加载依赖 DLL 时还需要 add_dll_directory）
+    if temp_dir not in os.environ['PATH'].split(os.pathsep):
+        os.environ['PATH'] = temp_dir + os.pathsep + os.environ['PATH']
+    if hasattr(os, 'add_dll_directory'):
+        _dll_handles.append(os.add_dll_directory(temp_dir))
+    return temp_dir
+
+
+class Engine:
+    """进程内共享的识别环境：二进制查找、DLL 准备和 OCR 后端只初始化一次"""
+    def __init__(self):
+        self.timings = {}
+        start = time.perf_counter()
+        self.base_path = application_base_path()
+        self.dll_dir = prepare_zbar(self.base_path)
+        self.tesseract_cmd, self.tessdata_path = find_tesseract(self.base_path)
+        self.timings['resolve'] = time.perf_counter() - start
+        logger.debug("Tesseract 路径: %s，tessdata: %s", self.tesseract_cmd, self.tessdata_path)
+        self._backends = {}
+        self._lock = threading.Lock()
+    
+    def ocr_backend(self, name='auto'):
+        """返回共享的 OCR 后端（进程内引擎的模型只加载一次）"""
+        # 避免循环导入：scanner 模块导入时会用到本模块
+        from core.scanner import create_ocr_backend
+        with self._lock:
+            backend = self._backends.get(name)
+            if backend is None:
+                start = time.perf_counter()
+                backend = create_ocr_backend(name, self.tesseract_cmd, self.tessdata_path)
+                self.timings[f'backend.{backend.name}'] = time.perf_counter() - start
+                self._backends[name] = backend
+            return backend
+    
+    def startup_timings(self):
+        """冷启动耗时：二进制查找、后端创建以及各依赖模块的导入"""
+        timings = dict(self.timings)
+        for name, seconds in IMPORT_TIMINGS.items():
+            timings[f'import.{name}'] = seconds
+        return timings
+    
+    def close(self):
+        with self._lock:
+            for backend in self._backends.values():
+                backend.close()
+            self._backends.clear()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """进程内唯一的 Engine，首次调用时初始化"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = Engine()
+            atexit.register(_engine.close)
+        return _engine
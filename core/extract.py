@@ -0,0 +1,130 @@
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 运单号相关的关键词
+KEYWORDS = [
+    '运单', '单号', '快递单', '货运单', '订单号',
+    'NO', 'Number', '#', '编号', '号码',
+    '运输单', '提货单', '发货单'
+]
+
+# 内置的运单号格式：(名称, 正则, 是否为兜底格式)
+# 兜底格式在关键词行中排在冒号/等号后提取的内容之后
+DEFAULT_CARRIERS = [
+    ('ys_yt', r'(?i:[YT][ST])[0-9]{8,10}', False),   # YS/YT开头的运单号
+    ('generic', r'[A-Z]{2}[0-9]{8,10}', True),       # 其他可能的运单号格式
+]
+
+# 提取冒号或等号后面的数字字母组合
+_AFTER_SEPARATOR = re.compile(r'[:：=](.*?)(?=\s|$)')
+_NON_ALNUM = re.compile(r'[^A-Z0-9]')
+_CARRIER_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# 关键词行中冒号后内容的最小长度（假设运单号至少8位）
+MIN_SEPARATOR_LENGTH = 8
+
+
+class CandidateExtractor:
+    """预编译的候选提取器
+
+    关键词用一个多模式正则一次扫描整行；所有运单号格式合并为一个带命名分组的正则，
+    每行只扫描一次，按匹配到的分组归属到对应格式。
+    """
+    def __init__(self, carriers=None):
+        self._carriers = []
+        for name, pattern, fallback in (carriers if carriers is not None else DEFAULT_CARRIERS):
+            self._add(name, pattern, fallback)
+        self._keywords = re.compile('|'.join(
+            re.escape(k) for k in sorted(KEYWORDS, key=len, reverse=True)))
+        self._compile()
+    
+    def _add(self, name, pattern, fallback):
+        if not _CARRIER_NAME.match(name):
+            raise ValueError(f"运单号格式名称不合法: {name}")
+        if any(existing == name for existing, _, _ in self._carriers):
+            raise ValueError(f"运单号格式已存在: {name}")
+        try:
+            compiled = re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"运单号格式 {name} 的正则无效: {e}")
+        if compiled.groupindex:
+            raise ValueError(f"运单号格式 {name} 不能包含命名分组")
+        self._carriers.append((name, pattern, fallback))
+    
+    def _compile(self):
+        # 同一位置多个格式都能匹配时，具体格式优先于兜底格式
+        ordered = sorted(self._carriers, key=lambda c: c[2])
+        self._pattern = re.compile('|'.join(
+            f'(?P<{name}>{pattern})' for name, pattern, _ in ordered))
+        self._primary = [name for name, _, fallback in self._carriers if not fallback]
+        self._fallback = [name for name, _, fallback in self._carriers if fallback]
+    
+    def register(self, name, pattern, fallback=False):
+        """注册自定义运单号格式（排在已有的同类格式之后）"""
+        self._add(name, pattern, fallback)
+        try:
+            self._compile()
+        except re.error as e:
+            # 例如 (?i) 这类全局标志无法放进合并正则，应改用 (?i:...)
+            self._carriers.pop()
+            self._compile()
+            raise ValueError(f"运单号格式 {name} 无法合并: {e}")
+    
+    @property
+    def carriers(self):
+        """当前的运单号格式列表（用于缓存键）"""
+        return [list(c) for c in self._carriers]
+    
+    def has_keyword(self, text):
+        """文本中是否包含运单号关键词"""
+        return self._keywords.search(text) is not None
+    
+    def extract(self, text):
+        """从 OCR 文本中提取、标准化并去重运单号候选"""
+        results = []
+        for line in text.split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            
+            matches = {}
+            for match in self._pattern.finditer(line):
+                matches.setdefault(match.lastgroup, []).append(match.group())
+            
+            for name in self._primary:
+                results.extend(matches.get(name, ()))
+            
+            if self._keywords.search(line):
+                for match in _AFTER_SEPARATOR.findall(line):
+                    cleaned = _NON_ALNUM.sub('', match.upper())
+                    if len(cleaned) >= MIN_SEPARATOR_LENGTH:
+                        results.append(cleaned)
+            
+            for name in self._fallback:
+                results.extend(matches.get(name, ()))
+        
+        return normalize_candidates(results)
+
+
+def normalize_candidates(results):
+    """转换为大写、移除空白和特殊字符并去重"""
+    cleaned = (_NON_ALNUM.sub('', r.upper()) for r in results)
+    return list(dict.fromkeys(r for r in cleaned if r))
+
+
+_extractors = {}
+
+
+def get_extractor(options):
+    """按 options['carrier_patterns']（{名称: 正则}）获取提取器，相同配置复用同一实例"""
+    extra = options.get('carrier_patterns') or {}
+    key = tuple(sorted(extra.items()))
+    extractor = _extractors.get(key)
+    if extractor is None:
+        extractor = CandidateExtractor()
+        for name, pattern in key:
+            extractor.register(name, pattern)
+        _extractors[key] = extractor
+    return extractor
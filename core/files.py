@@ -0,0 +1,10 @@
+import os
+
+# 支持的文件类型
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.pdf')
+
+
+def list_image_files(folder):
+    """获取文件夹中所有待处理的图片文件（完整路径）"""
+    return [os.path.join(folder, f) for f in sorted(os.listdir(folder))
+            if f.lower().endswith(IMAGE_EXTENSIONS)]
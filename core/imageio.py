@@ -0,0 +1,118 @@
+import io
+import os
+import logging
+
+import numpy as np
+from PIL import Image
+
+from core.engine import lazy_import
+from core.preprocess import MAX_OCR_SIDE
+
+cv2 = lazy_import('cv2')
+
+logger = logging.getLogger(__name__)
+
+# 解码后识别区域的长边不小于该值时才缩小解码（与 OCR 预处理的缩放上限一致，不损失识别精度）
+DEFAULT_DECODE_MAX_SIDE = MAX_OCR_SIDE
+
+# 要识别条码时首次解码的长边下限：一维码的细条纹缩小后容易无法解码，只有很大的图像才缩小解码，
+# 文字识别使用按 DEFAULT_DECODE_MAX_SIDE 缩小的副本
+DEFAULT_BARCODE_DECODE_MAX_SIDE = 2 * MAX_OCR_SIDE
+
+# JPEG 可以在解码时按 1/2、1/4、1/8 缩小（libjpeg 的 DCT 缩放），比解码后再缩放更快、更省内存
+REDUCED_GRAYSCALE_FLAGS = (
+    (8, 'IMREAD_REDUCED_GRAYSCALE_8'),
+    (4, 'IMREAD_REDUCED_GRAYSCALE_4'),
+    (2, 'IMREAD_REDUCED_GRAYSCALE_2'),
+)
+REDUCED_COLOR_FLAGS = (
+    (8, 'IMREAD_REDUCED_COLOR_8'),
+    (4, 'IMREAD_REDUCED_COLOR_4'),
+    (2, 'IMREAD_REDUCED_COLOR_2'),
+)
+
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+
+# EXIF 方向标签；5-8 表示图像需要旋转 90 度显示（解码时 OpenCV 会按方向旋转）
+EXIF_ORIENTATION = 0x0112
+ROTATED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def crop_ratio(image, region):
+    """按比例坐标裁剪（返回视图，不复制像素）
+    
+    坐标四舍五入到最近的像素：由原图整数像素换算的比例（如区域选择对话框）可以精确还原。
+    """
+    height, width = image.shape[:2]
+    x1 = round(region['x1'] * width)
+    y1 = round(region['y1'] * height)
+    x2 = round(region['x2'] * width)
+    y2 = round(region['y2'] * height)
+    return image[y1:y2, x1:x2]
+
+
+def image_size(path):
+    """只读取文件头获得 (宽, 高)（已按 EXIF 方向旋转），读取失败返回 None；path 也可以是文件对象"""
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            if img.getexif().get(EXIF_ORIENTATION) in ROTATED_ORIENTATIONS:
+                width, height = height, width
+            return width, height
+    except (OSError, ValueError):
+        return None
+
+
+def reduce_factor(size, region=None, max_side=DEFAULT_DECODE_MAX_SIDE):
+    """在识别区域长边仍不小于 max_side 的前提下，可用的最大缩小倍数（1、2、4、8）"""
+    if not size or not max_side:
+        return 1
+    width, height = size
+    if region:
+        width *= region['x2'] - region['x1']
+        height *= region['y2'] - region['y1']
+    long_side = max(width, height)
+    for factor, _ in REDUCED_GRAYSCALE_FLAGS:
+        if long_side / factor >= max_side:
+            return factor
+    return 1
+
+
+def reduce_image(image, max_side=DEFAULT_DECODE_MAX_SIDE):
+    """按与 reduce_factor 相同的规则缩小已解码的图像（用较高分辨率解码后，给文字识别用的副本）"""
+    height, width = image.shape[:2]
+    factor = reduce_factor((width, height), None, max_side)
+    if factor == 1:
+        return image
+    return cv2.resize(image, (max(1, width // factor), max(1, height // factor)),
+                      interpolation=cv2.INTER_AREA)
+
+
+def read_image(path, region=None, max_side=DEFAULT_DECODE_MAX_SIDE, gray=True, data=None):
+    """解码图片，返回 (图像, 缩小倍数)，无法读取时图像为 None
+    
+    gray 时直接解码为灰度；JPEG 在 region（只用于计算尺寸，不裁剪）长边允许时缩小解码。
+    用 np.fromfile + imdecode 读取，支持 Windows 下的中文路径；data 为已读入的文件内容时不再读取文件。
+    """
+    factor = 1
+    flags = cv2.IMREAD_GRAYSCALE if gray else cv2.IMREAD_COLOR
+    if path.lower().endswith(JPEG_EXTENSIONS):
+        size = image_size(path if data is None else io.BytesIO(data))
+        factor = reduce_factor(size, region, max_side)
+        if factor > 1:
+            names = dict(REDUCED_GRAYSCALE_FLAGS if gray else REDUCED_COLOR_FLAGS)
+            flags = getattr(cv2, names[factor])
+    
+    if data is None:
+        try:
+            buffer = np.fromfile(path, dtype=np.uint8)
+        except OSError as e:
+            logger.error("无法读取文件 %s: %s", os.path.basename(path), e)
+            return None, factor
+    else:
+        buffer = np.frombuffer(data, dtype=np.uint8)
+    image = cv2.imdecode(buffer, flags)
+    if image is not None and factor > 1:
+        logger.debug("缩小 %s 倍解码: %s -> %sx%s", factor, os.path.basename(path),
+                     image.shape[1], image.shape[0])
+    return image, factor
@@ -0,0 +1,188 @@
+import os
+import json
+import math
+
+# 直方图桶上界（秒），与 Prometheus 的累计桶语义一致
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 等待预读的时间占比超过该值时认为批处理受读盘限制
+IO_BOUND_RATIO = 0.2
+
+METRIC_PREFIX = 'waybill'
+
+
+def percentile(values, q):
+    """最近秩分位数：排序后第 ceil(q/100 * n) 个值，没有数据时返回 0"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[max(0, math.ceil(q * len(values) / 100) - 1)]
+
+
+class Histogram:
+    """固定桶直方图"""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+    
+    def cumulative(self):
+        """每个桶上界对应的累计计数"""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+    
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'buckets': {str(bound): total for bound, total in self.cumulative()},
+        }
+
+
+class Metrics:
+    """批处理指标：按步骤聚合每个文件的耗时直方图，并统计结果数量"""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.steps = {}
+        self.files = {'recognized': 0, 'failed': 0, 'error': 0}
+        self.stages = {}
+        self.cache = {'hit': 0, 'miss': 0}
+        self.gauges = {}
+        # 两阶段调度各阶段的文件数、识别数和耗时
+        self.phases = {}
+    
+    def observe_value(self, name, seconds):
+        """记录不属于单个 ScanResult 的耗时（如监视模式的端到端延迟）"""
+        histogram = self.steps.get(name)
+        if histogram is None:
+            histogram = self.steps[name] = Histogram(self.buckets)
+        histogram.observe(seconds)
+    
+    def observe_phase(self, name, files, recognized, seconds):
+        """记录两阶段调度中一个阶段的产出"""
+        self.phases[name] = {
+            'files': files,
+            'recognized': recognized,
+            'yield': recognized / files if files else 0.0,
+            'seconds': seconds,
+        }
+    
+    def set_gauge(self, name, value):
+        """记录当前值（如队列深度）"""
+        self.gauges[name] = value
+    
+    def observe(self, result):
+        """记录一个文件的 ScanResult"""
+        for name, seconds in result.timings.items():
+            self.observe_value(name, seconds)
+        
+        if result.error:
+            self.files['error'] += 1
+        elif result.number:
+            self.files['recognized'] += 1
+            self.stages[result.stage] = self.stages.get(result.stage, 0) + 1
+        else:
+            self.files['failed'] += 1
+        if result.cache in self.cache:
+            self.cache[result.cache] += 1
+        if result.peak_rss:
+            # 各工作进程峰值内存中的最大值
+            self.gauges['worker_peak_rss_bytes'] = max(self.gauges.get('worker_peak_rss_bytes', 0), result.peak_rss)
+    
+    def total(self, name):
+        """某个步骤的累计耗时（秒）"""
+        histogram = self.steps.get(name)
+        return histogram.sum if histogram else 0.0
+    
+    def stall_summary(self):
+        """各阶段累计耗时及等待预读的占比，判断批处理受读盘（io）还是识别（cpu）限制"""
+        wait = self.total('prefetch.wait')
+        recognize = self.total('total')
+        ratio = wait / (wait + recognize) if wait + recognize else 0.0
+        return {
+            'read': self.total('prefetch.read'),
+            'decode': self.total('prefetch.decode') + self.total('imread'),
+            'wait': wait,
+            'recognize': recognize,
+            'wait_ratio': ratio,
+            'bound': 'io' if ratio >= IO_BOUND_RATIO else 'cpu',
+        }
+    
+    def to_json(self):
+        return {
+            'files': dict(self.files),
+            'stages': dict(self.stages),
+            'cache': dict(self.cache),
+            'gauges': dict(self.gauges),
+            'stall': self.stall_summary(),
+            'phases': dict(self.phases),
+            'steps': {name: h.to_dict() for name, h in sorted(self.steps.items())},
+        }
+    
+    def to_prometheus(self):
+        """Prometheus 文本格式（可供 node_exporter textfile 采集）"""
+        lines = [
+            f'# HELP {METRIC_PREFIX}_step_seconds 每个文件各识别步骤的耗时',
+            f'# TYPE {METRIC_PREFIX}_step_seconds histogram',
+        ]
+        for name, histogram in sorted(self.steps.items()):
+            for bound, total in histogram.cumulative():
+                lines.append(f'{METRIC_PREFIX}_step_seconds_bucket{{step="{name}",le="{bound}"}} {total}')
+            lines.append(f'{METRIC_PREFIX}_step_seconds_bucket{{step="{name}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{METRIC_PREFIX}_step_seconds_sum{{step="{name}"}} {histogram.sum}')
+            lines.append(f'{METRIC_PREFIX}_step_seconds_count{{step="{name}"}} {histogram.count}')
+        
+        lines.append(f'# HELP {METRIC_PREFIX}_files_total 处理的文件数')
+        lines.append(f'# TYPE {METRIC_PREFIX}_files_total counter')
+        for outcome, count in self.files.items():
+            lines.append(f'{METRIC_PREFIX}_files_total{{result="{outcome}"}} {count}')
+        
+        lines.append(f'# HELP {METRIC_PREFIX}_stage_hits_total 各阶段识别出运单号的次数')
+        lines.append(f'# TYPE {METRIC_PREFIX}_stage_hits_total counter')
+        for stage, count in sorted(self.stages.items()):
+            lines.append(f'{METRIC_PREFIX}_stage_hits_total{{stage="{stage}"}} {count}')
+        
+        lines.append(f'# HELP {METRIC_PREFIX}_cache_lookups_total 候选缓存查询次数')
+        lines.append(f'# TYPE {METRIC_PREFIX}_cache_lookups_total counter')
+        for outcome, count in self.cache.items():
+            lines.append(f'{METRIC_PREFIX}_cache_lookups_total{{result="{outcome}"}} {count}')
+        
+        if self.phases:
+            lines.append(f'# HELP {METRIC_PREFIX}_phase_files 两阶段调度各阶段处理和识别的文件数')
+            lines.append(f'# TYPE {METRIC_PREFIX}_phase_files gauge')
+            for name, phase in self.phases.items():
+                lines.append(f'{METRIC_PREFIX}_phase_files{{phase="{name}",result="processed"}} {phase["files"]}')
+                lines.append(f'{METRIC_PREFIX}_phase_files{{phase="{name}",result="recognized"}} {phase["recognized"]}')
+            lines.append(f'# TYPE {METRIC_PREFIX}_phase_seconds gauge')
+            for name, phase in self.phases.items():
+                lines.append(f'{METRIC_PREFIX}_phase_seconds{{phase="{name}"}} {phase["seconds"]}')
+        
+        for name, value in sorted(self.gauges.items()):
+            lines.append(f'# TYPE {METRIC_PREFIX}_{name} gauge')
+            lines.append(f'{METRIC_PREFIX}_{name} {value}')
+        return '\n'.join(lines) + '\n'
+    
+    def write(self, path):
+        """按扩展名导出：.prom 为 Prometheus 文本格式，其他为 JSON；原子写入"""
+        if path.endswith('.prom'):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.to_json(), ensure_ascii=False, indent=2)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
@@ -0,0 +1,150 @@
+import logging
+from collections import deque
+
+import numpy as np
+
+from core.engine import lazy_import
+from core.preprocess import to_gray, estimate_skew, rotate
+
+cv2 = lazy_import('cv2')
+
+logger = logging.getLogger(__name__)
+
+# 方向检测在缩小到该边长以内的副本上进行
+ORIENT_MAX_SIDE = 1000
+
+# 列投影比行投影尖锐该倍数以上时认为文字行是竖的（图像转了 90 度）；
+# 没有条码和 OSD 佐证、只凭投影旋转时要求更明显（表格竖线也会让列投影起伏）
+VERTICAL_MARGIN = 1.5
+PROJECTION_MARGIN = 3.0
+
+# 同一模板最近这么多次检测（条码或 OSD）结果一致时才复用，之后每复用这么多次重新检测一次
+TEMPLATE_CONFIRM = 3
+TEMPLATE_RECHECK = 20
+
+# zbar 报告的条码方向 -> 顺时针旋转多少度才能摆正
+BARCODE_ROTATIONS = {
+    'UP': 0,
+    'RIGHT': 270,
+    'DOWN': 180,
+    'LEFT': 90,
+}
+
+# 顺时针旋转角度 -> cv2.rotate 的参数名
+ROTATE_CODES = {
+    90: 'ROTATE_90_CLOCKWISE',
+    180: 'ROTATE_180',
+    270: 'ROTATE_90_COUNTERCLOCKWISE',
+}
+
+
+def downscale(gray, max_side=ORIENT_MAX_SIDE):
+    height, width = gray.shape[:2]
+    scale = min(1.0, max_side / max(height, width))
+    if scale == 1.0:
+        return gray
+    return cv2.resize(gray, (max(1, int(width * scale)), max(1, int(height * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+
+def rotate90(image, rotation):
+    """顺时针旋转 90 的整数倍（无插值）"""
+    if not rotation:
+        return image
+    return cv2.rotate(image, getattr(cv2, ROTATE_CODES[rotation]))
+
+
+def projection_ratio(small):
+    """列投影与行投影起伏程度之比：横排文字的行投影起伏明显，转 90 度后列投影起伏明显"""
+    _, binary = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    rows = binary.sum(axis=1, dtype=np.float64)
+    cols = binary.sum(axis=0, dtype=np.float64)
+    # 按投影长度归一化，避免图像长宽比影响比较
+    row_score = float(np.sum(np.diff(rows) ** 2)) / max(1, len(rows))
+    col_score = float(np.sum(np.diff(cols) ** 2)) / max(1, len(cols))
+    return col_score / max(row_score, 1e-6)
+
+
+def barcode_rotation(barcode):
+    """pyzbar 结果中的条码方向换算为摆正所需的顺时针旋转角度，未知时返回 None"""
+    return BARCODE_ROTATIONS.get(getattr(barcode, 'orientation', None))
+
+
+def unrotate_box(box, rotation):
+    """把旋转后图像上的比例坐标换算回旋转前的图像（忽略小角度倾斜）"""
+    if not rotation:
+        return box
+    corners = []
+    for x, y in ((box['x1'], box['y1']), (box['x2'], box['y2'])):
+        if rotation == 90:
+            corners.append((y, 1.0 - x))
+        elif rotation == 180:
+            corners.append((1.0 - x, 1.0 - y))
+        else:
+            corners.append((1.0 - y, x))
+    (ax, ay), (bx, by) = corners
+    return {'x1': min(ax, bx), 'y1': min(ay, by), 'x2': max(ax, bx), 'y2': max(ay, by)}
+
+
+class OrientationDetector:
+    """识别前的方向与倾斜检测，结果按批次模板（配置方案 + 识别区域）缓存
+    
+    方向（0/90/180/270）依次参考：条码方向、同一模板已确认的方向（最近几次检测一致且文字行方向相符时
+    直接复用，省去 OSD）、缩小副本上的 Tesseract OSD；都没有时只能由投影轮廓判断是否转了 90 度。
+    倾斜角每个文件单独估计（缩小的二值图上搜索，耗时很短）。
+    """
+    def __init__(self, osd=None):
+        # osd(image) 返回摆正所需的顺时针旋转角度，无法判断时返回 None
+        self.osd = osd
+        # 模板 -> [最近几次检测结果, 复用次数]
+        self._templates = {}
+    
+    def _confirmed(self, template, vertical):
+        """模板已确认且与当前文字行方向相符的旋转角度，需要重新检测时返回 None"""
+        entry = self._templates.get(template)
+        if entry is None:
+            return None
+        history, uses = entry
+        if len(history) < TEMPLATE_CONFIRM or len(set(history)) != 1 or uses >= TEMPLATE_RECHECK:
+            return None
+        rotation = history[0]
+        if (rotation in (90, 270)) != vertical:
+            return None
+        entry[1] += 1
+        return rotation
+    
+    def _remember(self, template, rotation):
+        entry = self._templates.setdefault(template, [deque(maxlen=TEMPLATE_CONFIRM), 0])
+        entry[0].append(rotation)
+        entry[1] = 0
+    
+    def detect(self, image, template=None, hint=None):
+        """返回 (顺时针旋转角度, 倾斜角, 判断依据)"""
+        small = downscale(to_gray(image))
+        ratio = projection_ratio(small)
+        vertical = ratio > VERTICAL_MARGIN
+        cached = self._confirmed(template, vertical)
+        
+        if hint is not None and (hint in (90, 270)) == vertical:
+            rotation, source = hint, 'barcode'
+            self._remember(template, rotation)
+        elif cached is not None:
+            rotation, source = cached, 'cache'
+        else:
+            rotation = self.osd(small) if self.osd is not None else None
+            source = 'osd'
+            if rotation is None:
+                # 没有 OSD 时无法区分 180 度，只纠正竖排
+                rotation, source = (90 if ratio > PROJECTION_MARGIN else 0), 'projection'
+            self._remember(template, rotation)
+        
+        skew = estimate_skew(rotate90(small, rotation))
+        if rotation or skew:
+            logger.debug("方向纠正: 旋转 %s 度，倾斜 %.1f 度（%s）", rotation, skew, source)
+        return rotation, skew, source
+    
+    def normalize(self, image, template=None, hint=None):
+        """摆正图像，返回 (图像, {'rotate', 'skew', 'source'})"""
+        rotation, skew, source = self.detect(image, template, hint)
+        image = rotate(rotate90(image, rotation), skew)
+        return image, {'rotate': rotation, 'skew': skew, 'source': source}
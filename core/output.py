@@ -0,0 +1,227 @@
+import os
+import json
+import errno
+import shutil
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# 日志文件名，保存在成功文件夹中
+JOURNAL_NAME = '.waybill_journal.jsonl'
+
+# 运单号重复（目标文件已存在）时的处理方式
+DUPLICATE_POLICIES = ('suffix', 'skip', 'overwrite')
+DUPLICATE_LABELS = {
+    'suffix': '加序号保存',
+    'skip': '跳过（保留原文件）',
+    'overwrite': '覆盖已有文件',
+}
+DEFAULT_DUPLICATE_POLICY = 'suffix'
+
+# 跨设备复制时的临时文件后缀
+PARTIAL_SUFFIX = '.part'
+
+# 影响识别成败的选项：与上次处理记录中的不同时，上次判定失败的文件重新识别
+# （包括取消后为挽救失败文件最常调整的预处理、识别阶段、方向纠正和分辨率）
+DECISION_OPTIONS = (
+    'scan_barcode', 'scan_qrcode', 'scan_text',
+    'min_length', 'max_length', 'uppercase', 'lowercase', 'digits', 'custom_chars',
+    'prefix', 'suffix', 'region', 'carrier_patterns',
+    'preprocess', 'preprocess_steps', 'stage_order', 'orientation', 'two_phase',
+    'pdf_dpi', 'decode_max_side', 'barcode_decode_max_side', 'barcode_localize',
+)
+
+
+def move_file(src, dst):
+    """移动文件：同一文件系统内用 os.replace 原子完成，跨设备时先复制到临时文件再替换"""
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        partial = dst + PARTIAL_SUFFIX
+        shutil.copy2(src, partial)
+        os.replace(partial, dst)
+        os.remove(src)
+
+
+def decision_settings(options):
+    """取出 options 中影响识别成败的部分（JSON 往返后的形式，便于与日志中的记录比较）"""
+    settings = {name: options.get(name) for name in DECISION_OPTIONS}
+    return json.loads(json.dumps(settings, sort_keys=True, ensure_ascii=False))
+
+
+def _file_state(path):
+    """用大小和修改时间判断文件是否被替换过"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class OutputStage:
+    """带日志的重命名输出：每个文件的处理决定在移动前后写入日志，崩溃后可以继续
+    
+    日志为 JSON lines，每条记录 flush 到文件，进程崩溃不会丢失已写入的决定。
+    上次处理未正常结束（最后一条不是 end）时自动继续：已移动的文件不在待处理文件夹中，
+    已判定失败或跳过的文件如果没有变化也不再识别；只写了 plan 的移动按计划补做。
+    settings（decision_settings 的结果）与当时记录的不同时，失败的文件重新识别；
+    重复处理方式不同时，跳过的文件重新处理。
+    """
+    def __init__(self, target_folder, duplicate_policy=DEFAULT_DUPLICATE_POLICY,
+                 journal_path=None, resume=True, settings=None):
+        if duplicate_policy not in DUPLICATE_POLICIES:
+            raise ValueError(f"未知的重复处理方式: {duplicate_policy}")
+        self.target_folder = target_folder
+        self.duplicate_policy = duplicate_policy
+        self.settings = settings
+        self.journal_path = journal_path or os.path.join(target_folder, JOURNAL_NAME)
+        # 本次处理（包括继续的上次处理）中已有决定的源文件: path -> [size, mtime_ns]
+        self._decided = {}
+        # 上次处理中完成的文件数，0 表示全新开始
+        self.resumed = 0
+        
+        records = self._read_journal() if resume else []
+        if records and records[-1].get('op') != 'end':
+            self._journal = open(self.journal_path, 'a', encoding='utf-8')
+            if self._torn:
+                # 写了一半的最后一行单独成行，不影响之后追加的记录
+                self._journal.write('\n')
+            self._replay(records)
+        else:
+            self._journal = open(self.journal_path, 'w', encoding='utf-8')
+        self._write({'op': 'start', 'time': datetime.now().isoformat(timespec='seconds'),
+                     'policy': duplicate_policy, 'settings': settings})
+    
+    def _read_journal(self):
+        self._torn = False
+        if not os.path.exists(self.journal_path):
+            return []
+        records = []
+        with open(self.journal_path, encoding='utf-8') as f:
+            for line in f:
+                self._torn = not line.endswith('\n')
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # 崩溃时写了一半的最后一行
+                    logger.warning("忽略损坏的日志记录: %r", line[:80])
+        return records
+    
+    def _replay(self, records):
+        """恢复上次未完成的处理"""
+        planned = {}
+        # 之后的记录是在哪组设置和重复处理方式下写入的
+        settings = policy = None
+        for record in records:
+            op = record.get('op')
+            if op == 'start':
+                settings, policy = record.get('settings'), record.get('policy')
+            elif op == 'plan':
+                planned[record['src']] = record
+            elif op == 'done':
+                planned.pop(record['src'], None)
+                self.resumed += 1
+            elif op == 'aborted':
+                # 移动失败，文件仍在原处，之后会有 failed 记录
+                planned.pop(record['src'], None)
+            elif op in ('failed', 'skipped'):
+                planned.pop(record['src'], None)
+                if self._still_decided(op, settings, policy):
+                    self._decided[record['src']] = record.get('state')
+                else:
+                    self._decided.pop(record['src'], None)
+        self.resumed += len(self._decided)
+        
+        # 只写了 plan 的移动：崩溃发生在移动过程中
+        for src, record in planned.items():
+            dst = os.path.join(self.target_folder, record['dst'])
+            if os.path.exists(src):
+                logger.info("补做中断的移动: %s -> %s", src, record['dst'])
+                move_file(src, dst)
+            elif not os.path.exists(dst):
+                logger.warning("中断的移动找不到文件: %s", src)
+                continue
+            if os.path.exists(dst + PARTIAL_SUFFIX):
+                os.remove(dst + PARTIAL_SUFFIX)
+            self._write({'op': 'done', 'src': src, 'dst': record['dst']})
+            self.resumed += 1
+        logger.info("继续上次未完成的处理，已完成 %d 个文件", self.resumed)
+    
+    def _still_decided(self, op, settings, policy):
+        """上次的失败或跳过决定在当前设置下是否仍然成立"""
+        if op == 'skipped':
+            return policy == self.duplicate_policy
+        return self.settings is None or settings == self.settings
+    
+    def _write(self, record):
+        self._journal.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._journal.flush()
+    
+    def is_decided(self, path):
+        """文件是否已在本次（或继续的上次）处理中有了决定且之后没有变化"""
+        state = self._decided.get(path)
+        if state is None:
+            return False
+        try:
+            return _file_state(path) == state
+        except OSError:
+            return False
+    
+    def pending(self, paths):
+        """过滤掉已有决定的文件；持续输入中的 None 原样传递"""
+        for path in paths:
+            if path is None or not self.is_decided(path):
+                yield path
+    
+    def _target_name(self, number, ext):
+        """按重复处理方式确定目标文件名，跳过时返回 None"""
+        name = f"{number}{ext}"
+        if not os.path.exists(os.path.join(self.target_folder, name)):
+            return name
+        if self.duplicate_policy == 'overwrite':
+            return name
+        if self.duplicate_policy == 'skip':
+            return None
+        index = 2
+        while True:
+            name = f"{number}_{index}{ext}"
+            if not os.path.exists(os.path.join(self.target_folder, name)):
+                return name
+            index += 1
+    
+    def commit(self, path, number):
+        """以运单号重命名并移动文件，返回新文件名；按重复处理方式跳过时返回 None"""
+        _, ext = os.path.splitext(path)
+        name = self._target_name(number, ext)
+        if name is None:
+            self._decided[path] = _file_state(path)
+            self._write({'op': 'skipped', 'src': path, 'number': number,
+                         'reason': 'duplicate', 'state': self._decided[path]})
+            return None
+        
+        self._write({'op': 'plan', 'src': path, 'dst': name, 'number': number})
+        try:
+            move_file(path, os.path.join(self.target_folder, name))
+        except OSError as e:
+            # 放弃这次移动，继续时不再补做（调用方随后记录 failed）
+            self._write({'op': 'aborted', 'src': path, 'dst': name, 'error': str(e)})
+            raise
+        self._write({'op': 'done', 'src': path, 'dst': name})
+        return name
+    
+    def fail(self, path, reason):
+        """记录识别失败的文件（保留在原文件夹，继续时不再识别）"""
+        try:
+            state = _file_state(path)
+        except OSError:
+            return
+        self._decided[path] = state
+        self._write({'op': 'failed', 'src': path, 'reason': reason, 'state': state})
+    
+    def close(self, finished=True):
+        """结束处理：finished 时写入 end，下次全新开始；取消或中断时不写，下次继续"""
+        if self._journal.closed:
+            return
+        if finished:
+            self._write({'op': 'end', 'time': datetime.now().isoformat(timespec='seconds')})
+        self._journal.close()
@@ -0,0 +1,106 @@
+import functools
+import logging
+
+import numpy as np
+
+from core.engine import lazy_import, module_available
+from core.imageio import crop_ratio, reduce_factor
+
+cv2 = lazy_import('cv2')
+# PyMuPDF，PDF 支持为可选依赖
+fitz = lazy_import('fitz', optional=True)
+
+logger = logging.getLogger(__name__)
+
+# 默认渲染分辨率
+DEFAULT_PDF_DPI = 200
+
+# 命令行和界面允许的渲染分辨率范围
+MIN_PDF_DPI = 72
+MAX_PDF_DPI = 600
+
+# 内嵌图片覆盖页面面积的比例达到该值时，视为整页扫描件
+FULL_PAGE_COVERAGE = 0.9
+
+
+def is_pdf(path):
+    """判断文件是否为 PDF"""
+    return path.lower().endswith('.pdf')
+
+
+def iter_pdf_pages(path, dpi=DEFAULT_PDF_DPI, region=None, gray=False, max_side=0):
+    """逐页产出页面加载函数，调用后才解码/渲染该页，任意时刻只有一页的像素在内存中
+    
+    页面仅为一张扫描图片时直接解码内嵌图片（与 read_image 相同，region 长边不小于 max_side 时
+    按 1/2、1/4、1/8 缩小，0 表示不缩小），否则按 dpi 渲染。
+    加载函数返回已裁剪到 region 的图像；渲染时只光栅化 region 内的部分。
+    未调用的加载函数不产生任何开销（例如该页的识别候选已缓存）。
+    """
+    if not module_available(fitz):
+        raise ImportError("未安装 PyMuPDF 或无法导入，无法识别 PDF 文件")
+    
+    with fitz.open(path) as doc:
+        for page in doc:
+            yield functools.partial(_load_page, doc, page, dpi, region, gray, max_side)
+
+
+def _load_page(doc, page, dpi, region=None, gray=False, max_side=0):
+    """解码或渲染单页，返回裁剪到 region 的 BGR/灰度图像"""
+    image = _embedded_page_image(doc, page, gray, region, max_side)
+    if image is None:
+        logger.debug("渲染 PDF 第 %s 页 (%s DPI)", page.number + 1, dpi)
+        clip = None
+        if region:
+            rect = page.rect
+            clip = fitz.Rect(rect.x0 + region['x1'] * rect.width, rect.y0 + region['y1'] * rect.height,
+                             rect.x0 + region['x2'] * rect.width, rect.y0 + region['y2'] * rect.height)
+        colorspace = fitz.csGRAY if gray else fitz.csRGB
+        pix = page.get_pixmap(dpi=dpi, colorspace=colorspace, alpha=False, clip=clip)
+        return _pixmap_to_bgr(pix)
+    
+    logger.debug("使用 PDF 第 %s 页的内嵌图片", page.number + 1)
+    if region:
+        # 复制裁剪结果，整页像素随即释放
+        image = crop_ratio(image, region).copy()
+    return image
+
+
+def _embedded_page_image(doc, page, gray=False, region=None, max_side=0):
+    """页面只有一张铺满的扫描图片且没有文字时，返回该图片（按 max_side 缩小），否则返回 None"""
+    if page.rotation:
+        return None
+    images = page.get_images(full=True)
+    if len(images) != 1 or page.get_text().strip():
+        return None
+    
+    xref = images[0][0]
+    rects = page.get_image_rects(xref)
+    if len(rects) != 1:
+        return None
+    page_area = abs(page.rect)
+    if not page_area or abs(rects[0] & page.rect) / page_area < FULL_PAGE_COVERAGE:
+        return None
+    
+    pix = fitz.Pixmap(doc, xref)
+    factor = reduce_factor((pix.width, pix.height), region, max_side)
+    if factor > 1:
+        # 在转换颜色空间前缩小，之后的转换和复制都只处理缩小后的像素
+        pix.shrink(factor.bit_length() - 1)
+        logger.debug("内嵌图片缩小 %s 倍: %sx%s", factor, pix.width, pix.height)
+    if pix.alpha:
+        # 先去掉透明通道（灰度 + 透明转换颜色空间后仍是两个通道）
+        pix = fitz.Pixmap(pix, 0)
+    if gray and pix.n != 1:
+        pix = fitz.Pixmap(fitz.csGRAY, pix)
+    elif not gray and pix.n not in (1, 3):
+        # CMYK 等统一转为 RGB
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    return _pixmap_to_bgr(pix)
+
+
+def _pixmap_to_bgr(pix):
+    """PyMuPDF Pixmap 转为 OpenCV 使用的 BGR/灰度数组"""
+    image = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    if pix.n == 1:
+        return image[:, :, 0].copy()
+    return cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
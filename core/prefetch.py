@@ -0,0 +1,144 @@
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from core.pdf import is_pdf
+from core.imageio import read_image
+from core.scanner import source_max_side
+from core.cache import data_digest
+
+logger = logging.getLogger(__name__)
+
+# 默认预读的文件数（0 表示不预读）与预读缓冲区的内存上限
+DEFAULT_PREFETCH_DEPTH = 2
+DEFAULT_PREFETCH_MB = 256
+
+# 输入结束标记
+_END = object()
+
+
+class Preloaded:
+    """预读的文件：原始字节或已解码的图像，启用缓存时还有内容哈希"""
+    def __init__(self, data=None, image=None, digest=None):
+        self.data = data
+        self.image = image
+        self.digest = digest
+    
+    @property
+    def nbytes(self):
+        size = len(self.data) if self.data is not None else 0
+        if self.image is not None:
+            size += self.image.nbytes
+        return size
+    
+    def take(self):
+        """取出 (图像, 字节) 并释放引用，识别期间不再保留整图"""
+        image, data = self.image, self.data
+        self.image = self.data = None
+        return image, data
+
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def preload(path, options, timings, decode=True):
+    """在后台线程中读取文件（decode 时解码为识别用的灰度图），PDF 不预读返回 None
+    
+    解码分辨率按热点区域（没有时按识别区域）计算，与识别时首次解码一致。
+    """
+    if is_pdf(path):
+        return None
+    start = time.perf_counter()
+    data = read_bytes(path)
+    timings['prefetch.read'] = time.perf_counter() - start
+    # 内容哈希也在后台计算，识别时不再重新读取文件
+    digest = data_digest(data) if options.get('cache_path') else None
+    if not decode:
+        return Preloaded(data=data, digest=digest)
+    
+    start = time.perf_counter()
+    region = options.get('hot_region') or options.get('region')
+    image, _ = read_image(path, region, source_max_side(options), data=data)
+    timings['prefetch.decode'] = time.perf_counter() - start
+    if image is None:
+        # 解码失败时保留字节，由识别流程重新解码并记录错误
+        return Preloaded(data=data, digest=digest)
+    return Preloaded(image=image, digest=digest)
+
+
+class Prefetcher:
+    """预读阶段：后台线程读取（并解码）后续文件，与识别重叠进行
+    
+    按输入顺序产出 (path, Preloaded 或 None, 耗时)；持续输入中的 None 在缓冲区为空时原样传递。
+    耗时包括后台的 prefetch.read、prefetch.decode，以及取用时等待预读完成的 prefetch.wait：
+    wait 占比高说明批处理受读盘限制，接近 0 说明受识别（CPU）限制。
+    缓冲区中已完成未取用的数据超过 budget_bytes 时暂停预读（至少预读一个文件）。
+    """
+    def __init__(self, paths, load, options, depth=DEFAULT_PREFETCH_DEPTH,
+                 budget_bytes=DEFAULT_PREFETCH_MB * 1024 * 1024):
+        self.paths = paths
+        # load(path, options, timings) 在后台线程中执行
+        self.load = load
+        # 识别选项在提交预读时取得（热点区域随学习更新）
+        self.options = options
+        self.depth = max(1, int(depth))
+        self.budget_bytes = budget_bytes
+        # 缓冲区数据量的峰值（字节）
+        self.peak_bytes = 0
+    
+    def _load(self, path, options, timings):
+        try:
+            return self.load(path, options, timings)
+        except Exception as e:
+            # 预读失败时由识别流程自己读取文件并记录错误
+            logger.warning("预读失败 %s: %s", path, e)
+            return None
+    
+    def _buffered_bytes(self, buffer):
+        total = 0
+        for _, future, _ in buffer:
+            if future.done() and future.result() is not None:
+                total += future.result().nbytes
+        return total
+    
+    def __iter__(self):
+        source = iter(self.paths)
+        buffer = deque()
+        executor = ThreadPoolExecutor(max_workers=self.depth, thread_name_prefix='prefetch')
+        exhausted = False
+        try:
+            while True:
+                idle = False
+                # 当前文件之外再预读 depth 个
+                while not exhausted and len(buffer) <= self.depth:
+                    buffered = self._buffered_bytes(buffer)
+                    self.peak_bytes = max(self.peak_bytes, buffered)
+                    if buffer and buffered >= self.budget_bytes:
+                        break
+                    path = next(source, _END)
+                    if path is _END:
+                        exhausted = True
+                    elif path is None:
+                        idle = True
+                        break
+                    else:
+                        timings = {}
+                        future = executor.submit(self._load, path, self.options(), timings)
+                        buffer.append((path, future, timings))
+                
+                if not buffer:
+                    if exhausted:
+                        return
+                    if idle:
+                        yield None
+                    continue
+                path, future, timings = buffer.popleft()
+                start = time.perf_counter()
+                payload = future.result()
+                timings['prefetch.wait'] = time.perf_counter() - start
+                yield path, payload, timings
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,172 @@
+import time
+import logging
+
+import numpy as np
+
+from core.engine import lazy_import
+
+cv2 = lazy_import('cv2')
+
+logger = logging.getLogger(__name__)
+
+# 超过该边长的图像在 resize 步骤中缩小（OCR 对 300 DPI 左右的图像效果最好）
+MAX_OCR_SIDE = 2500
+
+# upscale 步骤的放大倍数及放大后长边上限
+UPSCALE_FACTOR = 2.0
+UPSCALE_MAX_SIDE = 5000
+
+# 倾斜校正的搜索范围（度）和步长
+DESKEW_MAX_ANGLE = 5.0
+DESKEW_STEP = 0.5
+
+
+def to_gray(image):
+    """转换为灰度图（已是单通道时原样返回）"""
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def clahe(image):
+    """限制对比度的自适应直方图均衡"""
+    return cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(image)
+
+
+def threshold(image):
+    """自适应阈值二值化"""
+    return cv2.adaptiveThreshold(
+        image,
+        255,
+        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY,
+        11,  # 邻域大小
+        2    # 常数差值
+    )
+
+
+def denoise(image):
+    """非局部均值降噪（整页扫描件上耗时较长）"""
+    return cv2.fastNlMeansDenoising(image)
+
+
+def resize(image):
+    """过大的图像按比例缩小到 MAX_OCR_SIDE"""
+    height, width = image.shape[:2]
+    scale = MAX_OCR_SIDE / max(height, width)
+    if scale >= 1:
+        return image
+    return cv2.resize(image, (int(width * scale), int(height * scale)),
+                      interpolation=cv2.INTER_AREA)
+
+
+def upscale(image):
+    """放大图像（小字、低分辨率扫描件），长边不超过 UPSCALE_MAX_SIDE"""
+    height, width = image.shape[:2]
+    scale = min(UPSCALE_FACTOR, UPSCALE_MAX_SIDE / max(height, width))
+    if scale <= 1:
+        return image
+    return cv2.resize(image, (int(width * scale), int(height * scale)),
+                      interpolation=cv2.INTER_CUBIC)
+
+
+def estimate_skew(gray, max_angle=DESKEW_MAX_ANGLE, step=DESKEW_STEP):
+    """投影轮廓法估计文字行倾斜角（度），在缩小的二值图上搜索行投影最尖锐的角度"""
+    height, width = gray.shape[:2]
+    scale = min(1.0, 800 / max(height, width))
+    small = cv2.resize(gray, (max(1, int(width * scale)), max(1, int(height * scale))),
+                       interpolation=cv2.INTER_AREA)
+    _, binary = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    center = (binary.shape[1] / 2, binary.shape[0] / 2)
+    
+    best_angle = 0.0
+    best_score = -1.0
+    for angle in np.arange(-max_angle, max_angle + step / 2, step):
+        matrix = cv2.getRotationMatrix2D(center, float(angle), 1.0)
+        rotated = cv2.warpAffine(binary, matrix, (binary.shape[1], binary.shape[0]),
+                                 flags=cv2.INTER_NEAREST)
+        profile = rotated.sum(axis=1, dtype=np.float64)
+        score = float(np.sum(np.diff(profile) ** 2))
+        if score > best_score:
+            best_score = score
+            best_angle = float(angle)
+    return best_angle
+
+
+def rotate(image, angle):
+    """绕中心旋转图像，边缘用近邻像素填充"""
+    if not angle:
+        return image
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(image, matrix, (width, height),
+                          flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+def deskew(image):
+    """校正小角度倾斜"""
+    return rotate(image, estimate_skew(image))
+
+
+# 可用的预处理步骤（输入输出均为灰度图，grayscale 除外）
+STEPS = {
+    'grayscale': to_gray,
+    'clahe': clahe,
+    'threshold': threshold,
+    'denoise': denoise,
+    'deskew': deskew,
+    'resize': resize,
+    'upscale': upscale,
+}
+
+# 预设：只计算真正送入 OCR 的步骤
+PRESETS = {
+    'default': ['grayscale', 'clahe'],                       # 增强对比度（原有效果）
+    'fast': ['grayscale'],                                   # 仅灰度，最快
+    'binary': ['grayscale', 'threshold'],                    # 背景复杂、光照不均
+    'clean': ['grayscale', 'denoise', 'clahe'],              # 噪点多的低质量扫描件
+    'scan': ['grayscale', 'resize', 'deskew', 'clahe'],      # 高分辨率、略有倾斜的扫描件
+}
+
+# 预设在界面中的显示名称
+PRESET_LABELS = {
+    'default': '标准（对比度增强）',
+    'fast': '快速（仅灰度）',
+    'binary': '二值化',
+    'clean': '降噪（较慢）',
+    'scan': '高清扫描件（缩放+纠偏）',
+}
+
+DEFAULT_PRESET = 'default'
+
+
+class PreprocessPipeline:
+    """按声明顺序执行的预处理步骤链，每一步单独计时"""
+    def __init__(self, steps):
+        unknown = [s for s in steps if s not in STEPS]
+        if unknown:
+            raise ValueError(f"未知的预处理步骤: {', '.join(unknown)}")
+        self.steps = list(steps)
+        # OCR 需要灰度输入，未声明时自动在最前面补上
+        if 'grayscale' not in self.steps:
+            self.steps.insert(0, 'grayscale')
+    
+    def run(self, image, on_timing=None):
+        """执行步骤链；on_timing(name, seconds) 用于记录每一步耗时"""
+        for step in self.steps:
+            start = time.perf_counter()
+            image = STEPS[step](image)
+            if on_timing is not None:
+                on_timing(f'preprocess.{step}', time.perf_counter() - start)
+        return image
+
+
+def get_pipeline(options):
+    """根据 options 获取预处理链：preprocess_steps（自定义步骤）优先，其次 preprocess（预设名）"""
+    steps = options.get('preprocess_steps')
+    if not steps:
+        preset = options.get('preprocess') or DEFAULT_PRESET
+        if preset not in PRESETS:
+            raise ValueError(f"未知的预处理预设: {preset}")
+        steps = PRESETS[preset]
+    return PreprocessPipeline(steps)
@@ -0,0 +1,131 @@
+import os
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 配置方案数据（OCR 统计等）的默认保存位置
+DEFAULT_PROFILES_PATH = os.path.join(os.path.expanduser('~'), '.waybill_scanner', 'profiles.json')
+
+DEFAULT_PROFILE = 'default'
+
+# 某个 OCR 配置的尝试次数达到该值后才参与自适应排序
+MIN_ATTEMPTS = 5
+
+
+class ProfileStore:
+    """按配置方案（profile）持久化的识别数据
+
+    结构: {方案名: {'ocr_stats': {OCR配置: {'attempts', 'hits', 'seconds'}},
+                    'region': 自动学习的运单号位置外接矩形（比例坐标）}}
+    """
+    def __init__(self, path=DEFAULT_PROFILES_PATH):
+        self.path = path
+        self.data = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error("读取配置方案数据失败: %s", e)
+    
+    def profile(self, name):
+        return self.data.setdefault(name or DEFAULT_PROFILE, {})
+    
+    def save(self):
+        """原子写入，避免中途退出损坏文件"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+    
+    # === 自动学习的热点区域 ===
+    
+    def learned_region(self, name):
+        return self.profile(name).get('region')
+    
+    def save_region(self, name, region):
+        if region:
+            self.profile(name)['region'] = region
+    
+    # === OCR 配置统计 ===
+    
+    def record_result(self, name, result, config_names):
+        """记录一次识别中实际执行过的 OCR 配置（缓存重放的不计入）
+
+        同一配置在 PDF 多页、热点区域回退和两阶段重试中可能执行多次，
+        耗时是这些执行的总和，尝试次数也按执行次数计，平均耗时才是单次执行的耗时。
+        """
+        stats = self.profile(name).setdefault('ocr_stats', {})
+        for key, seconds in result.timings.items():
+            if key not in config_names:
+                continue
+            entry = stats.setdefault(key, {'attempts': 0, 'hits': 0, 'seconds': 0.0})
+            entry['attempts'] += result.counts.get(key, 1)
+            entry['seconds'] += seconds
+            if result.config == key:
+                entry['hits'] += 1
+    
+    def config_score(self, name, config):
+        """每秒期望命中数（平滑后的命中率 / 平均耗时）；样本不足时返回 None"""
+        entry = self.profile(name).get('ocr_stats', {}).get(config)
+        if not entry or entry['attempts'] < MIN_ATTEMPTS:
+            return None
+        hit_rate = (entry['hits'] + 1) / (entry['attempts'] + 2)
+        mean_seconds = max(entry['seconds'] / entry['attempts'], 1e-3)
+        return hit_rate / mean_seconds
+    
+    def order_configs(self, name, configs):
+        """按得分从高到低排序；样本不足的配置保持原有相对顺序并排在最后"""
+        scored = [(self.config_score(name, c), i, c) for i, c in enumerate(configs)]
+        known = sorted((s for s in scored if s[0] is not None), key=lambda s: (-s[0], s[1]))
+        unknown = [s for s in scored if s[0] is None]
+        return [c for _, _, c in known + unknown]
+    
+    def adaptive_plan(self, name, stage_order, stages):
+        """根据历史统计生成阶段顺序和各阶段内的 OCR 配置顺序
+
+        阶段内按配置得分排序；文字阶段之间按各自最佳配置得分排序，
+        条码等非文字阶段保持原位置。
+        """
+        stage_configs = {stage: self.order_configs(name, stages[stage])
+                         for stage in stage_order if stages.get(stage)}
+        
+        def stage_score(stage):
+            scores = [self.config_score(name, c) for c in stage_configs[stage]]
+            scores = [s for s in scores if s is not None]
+            return max(scores) if scores else None
+        
+        text_stages = [s for s in stage_order if s in stage_configs]
+        known = sorted((s for s in text_stages if stage_score(s) is not None),
+                       key=lambda s: -stage_score(s))
+        unknown = [s for s in text_stages if stage_score(s) is None]
+        reordered = iter(known + unknown)
+        new_order = [next(reordered) if s in stage_configs else s for s in stage_order]
+        return new_order, stage_configs
+    
+    def stats_table(self, name):
+        """OCR 配置统计表：[(配置, 尝试, 命中, 命中率, 平均耗时秒, 得分)]"""
+        rows = []
+        for config, entry in self.profile(name).get('ocr_stats', {}).items():
+            attempts = entry['attempts']
+            rows.append((
+                config,
+                attempts,
+                entry['hits'],
+                entry['hits'] / attempts if attempts else 0.0,
+                entry['seconds'] / attempts if attempts else 0.0,
+                self.config_score(name, config),
+            ))
+        rows.sort(key=lambda r: -(r[5] or 0))
+        return rows
+
+
+def format_stats_table(rows):
+    """把统计表格式化为文本"""
+    lines = [f"{'OCR配置':<12}{'尝试':>8}{'命中':>8}{'命中率':>10}{'平均耗时':>12}{'得分':>10}"]
+    for config, attempts, hits, rate, seconds, score in rows:
+        score_text = f"{score:.2f}" if score is not None else '-'
+        lines.append(f"{config:<12}{attempts:>8}{hits:>8}{rate:>10.1%}{seconds:>11.3f}s{score_text:>10}")
+    return '\n'.join(lines)
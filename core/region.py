@@ -0,0 +1,96 @@
+import logging
+from collections import deque
+from statistics import median
+
+logger = logging.getLogger(__name__)
+
+# 至少观察到多少个运单号位置后才启用热点区域
+DEFAULT_WARMUP = 5
+
+# 热点区域四周的留白（占整图的比例）
+DEFAULT_PADDING = 0.05
+
+# 只按最近这么多个位置学习（版式变化后逐渐跟上，计算量也有上限）
+MAX_BOXES = 200
+
+# 位置中心偏离中位数超过 OUTLIER_MAD 倍绝对中位差（且超过 MIN_SPREAD）时视为离群，不参与外接矩形
+OUTLIER_MAD = 3.0
+MIN_SPREAD = 0.1
+
+
+class RegionLearner:
+    """从批次中识别成功的文件学习运单号所在的热点区域
+    
+    记录每个运单号的位置（条码矩形或文字行框，整图比例坐标），
+    观察数达到 warmup 后去掉中心明显偏离其余位置的离群框（例如误识别到页脚的号码），
+    取剩余位置的外接矩形并留白，作为后续文件优先识别的区域。
+    """
+    def __init__(self, warmup=DEFAULT_WARMUP, padding=DEFAULT_PADDING, initial=None):
+        self.warmup = warmup
+        self.padding = padding
+        self.boxes = deque(maxlen=MAX_BOXES)
+        # 已保存的位置外接矩形（例如上次批处理学到的），可以直接使用
+        self.initial = initial
+        # 位置没有变化时复用上次计算的外接矩形（每个任务提交时都会查询）
+        self._bounds = None
+        self._dirty = True
+    
+    def observe(self, result):
+        """记录一次识别结果中运单号的位置"""
+        if result.number and result.box:
+            self.boxes.append(result.box)
+            self._dirty = True
+    
+    @property
+    def ready(self):
+        return self.initial is not None or len(self.boxes) >= self.warmup
+    
+    def bounds(self):
+        """去掉离群位置后的外接矩形（不含留白），尚未学到时返回 None"""
+        if not self.ready:
+            return None
+        if self._dirty:
+            boxes = list(self.boxes)
+            if self.initial is not None:
+                boxes.append(self.initial)
+            self._bounds = _union(_inliers(boxes))
+            self._dirty = False
+        return self._bounds
+    
+    def region(self):
+        """当前学到的热点区域（外接矩形留白后的比例坐标），尚未学到时返回 None"""
+        bounds = self.bounds()
+        if bounds is None:
+            return None
+        return {
+            'x1': max(0.0, bounds['x1'] - self.padding),
+            'y1': max(0.0, bounds['y1'] - self.padding),
+            'x2': min(1.0, bounds['x2'] + self.padding),
+            'y2': min(1.0, bounds['y2'] + self.padding),
+        }
+
+
+def _inliers(boxes):
+    """按中心坐标的中位数和绝对中位差去掉离群框（少于 3 个时无法判断，全部保留）"""
+    if len(boxes) < 3:
+        return boxes
+    keep = set(range(len(boxes)))
+    for low, high in (('x1', 'x2'), ('y1', 'y2')):
+        centers = [(b[low] + b[high]) / 2 for b in boxes]
+        middle = median(centers)
+        spread = max(OUTLIER_MAD * median(abs(c - middle) for c in centers), MIN_SPREAD)
+        keep &= {i for i, c in enumerate(centers) if abs(c - middle) <= spread}
+    if not keep:
+        return boxes
+    if len(keep) < len(boxes):
+        logger.debug("热点区域忽略 %d 个离群位置", len(boxes) - len(keep))
+    return [boxes[i] for i in sorted(keep)]
+
+
+def _union(boxes):
+    return {
+        'x1': min(b['x1'] for b in boxes),
+        'y1': min(b['y1'] for b in boxes),
+        'x2': max(b['x2'] for b in boxes),
+        'y2': max(b['y2'] for b in boxes),
+    }
@@ -1,201 +1,883 @@
-import cv2
 import numpy as np
-import pytesseract
 from PIL import Image
-import re
 import os
-import sys
 import logging
-from pyzbar.pyzbar import decode
-import shutil
+import time
+import tempfile
+import subprocess
+import functools
+from contextlib import contextmanager
 
-# 设置日志
-logging.basicConfig(level=logging.DEBUG)
+from core.pdf import is_pdf, iter_pdf_pages, DEFAULT_PDF_DPI
+from core.imageio import (read_image, crop_ratio, reduce_image, DEFAULT_DECODE_MAX_SIDE,
+                          DEFAULT_BARCODE_DECODE_MAX_SIDE)
+from core.preprocess import get_pipeline
+from core.barcode import decode_localized
+from core.extract import get_extractor, normalize_candidates
+from core.textlines import detect_text_lines, rank_lines, neighbours, crop_line, DEFAULT_MAX_LINES
+from core.cache import CandidateCache, file_digest, make_cache_key, DEFAULT_CACHE_MAX_MB
+from core.engine import get_engine, lazy_import, module_available
+from core.orientation import OrientationDetector, barcode_rotation, unrotate_box
+
+# 重量级依赖在首次使用时才导入，缩短界面和命令行的启动时间
+cv2 = lazy_import('cv2')
+pytesseract = lazy_import('pytesseract')
+pyzbar = lazy_import('pyzbar.pyzbar')
+# 进程内引擎为可选依赖，缺失时回退到 pytesseract
+tesserocr = lazy_import('tesserocr', optional=True)
+
+# 日志由入口程序配置，默认不输出调试信息
 logger = logging.getLogger(__name__)
 
+# tesseract 文本输出中的分页符（批量识别时用于拆分各图像的文本）
+PAGE_SEPARATOR = '\f'
+
+# OSD 方向判断的最低置信度，低于该值时不旋转
+OSD_MIN_CONFIDENCE = 2.0
+
+# Windows 下启动 tesseract 时不弹出控制台窗口
+NO_WINDOW = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+
+# OCR配置
+OCR_CONFIGS = {
+    'chi_psm3': {
+        'lang': 'chi_sim+eng',  # 中文+英文
+        'psm': 3                # 自动页面分割
+    },
+    'chi_psm6': {
+        'lang': 'chi_sim+eng',
+        'psm': 6                # 假设统一的文本块
+    },
+    'eng_psm11': {
+        'lang': 'eng',          # 仅英文模式可能对数字字母组合更准确
+        'psm': 11               # 稀疏文本
+    },
+    'chi_psm7': {
+        'lang': 'chi_sim+eng',
+        'psm': 7                # 单行文本（用于逐行识别）
+    }
+}
+
+# 识别阶段：条码阶段不使用 OCR，文字阶段按顺序执行其中的 OCR 配置
+STAGES = {
+    'barcode': [],
+    'ocr_lines': ['chi_psm7'],             # 检测文字行，逐行识别关键词附近的行
+    'ocr_fast': ['eng_psm11'],             # 单语言稀疏文本，速度快
+    'ocr_full': ['chi_psm3', 'chi_psm6'],  # 中英文整页识别，耗时长
+}
+
+# 默认阶段顺序：条码 -> 逐行 OCR -> 快速整页 OCR -> 完整整页 OCR，可通过 options['stage_order'] 调整
+DEFAULT_STAGE_ORDER = ['barcode', 'ocr_lines', 'ocr_fast', 'ocr_full']
+
+# 只有定位解码结果（整图解码因已有通过过滤的条码而跳过）的条码候选，缓存时在键后加该后缀
+LOCALIZED_SUFFIX = '@localized'
+
+
+def source_max_side(options):
+    """首次解码的长边下限（0 表示不缩小）：要识别条码时取条码的下限，文字识别再缩小到 decode_max_side"""
+    ocr_side = int(options.get('decode_max_side', DEFAULT_DECODE_MAX_SIDE))
+    stage_order = options.get('stage_order') or DEFAULT_STAGE_ORDER
+    if 'barcode' not in stage_order or not (options.get('scan_barcode') or options.get('scan_qrcode')):
+        return ocr_side
+    barcode_side = int(options.get('barcode_decode_max_side', DEFAULT_BARCODE_DECODE_MAX_SIDE))
+    if not ocr_side or not barcode_side:
+        return 0
+    return max(ocr_side, barcode_side)
+
+
+def candidate_key(stage, config_name=None, page=None):
+    """候选结果的键：条码阶段为阶段名，OCR 为配置名，PDF 非首页加页码前缀"""
+    key = config_name or stage
+    return key if not page else f"p{page}/{key}"
+
+
+def box_to_ratio(box, shape):
+    """像素矩形 (x, y, w, h) 转为相对于图像尺寸的比例坐标"""
+    x, y, w, h = box
+    height, width = shape[:2]
+    return {
+        'x1': x / width,
+        'y1': y / height,
+        'x2': min(1.0, (x + w) / width),
+        'y2': min(1.0, (y + h) / height),
+    }
+
+
+def region_to_image(box, region):
+    """识别区域内的比例坐标换算为整张图片的比例坐标"""
+    if not region:
+        return box
+    width = region['x2'] - region['x1']
+    height = region['y2'] - region['y1']
+    return {
+        'x1': region['x1'] + box['x1'] * width,
+        'y1': region['y1'] + box['y1'] * height,
+        'x2': region['x1'] + box['x2'] * width,
+        'y2': region['y1'] + box['y2'] * height,
+    }
+
+
+class LazyImage:
+    """延迟加载的图像：第一次 get() 时才解码，之后复用"""
+    def __init__(self, loader):
+        self._loader = loader
+        self._loaded = False
+        self._image = None
+
+    def get(self):
+        if not self._loaded:
+            self._image = self._loader()
+            self._loaded = True
+        return self._image
+
+
+class ScanResult:
+    """单张图片的识别结果"""
+    def __init__(self, path=None):
+        self.path = path        # 图片路径
+        self.error = None       # 处理出错时的错误信息
+        self.number = None      # 通过过滤的运单号
+        self.stage = None       # 产生运单号的阶段
+        self.config = None      # 产生运单号的 OCR 配置（条码阶段为 None）
+        self.page = None        # PDF 中产生运单号的页码（从 0 开始）
+        self.cache = None       # 候选缓存状态：'hit'、'miss'，未启用缓存为 None
+        self.box = None         # 运单号在整张图片中的位置（比例坐标），未知时为 None
+        self.region_pass = None # 使用热点区域时：'hot' 热点区域命中，'full' 回退到完整区域
+        self.phase = None       # 两阶段调度时产生该结果的阶段
+        self.orientation = None # 文字识别前的方向纠正：{'rotate': 顺时针旋转角度, 'skew': 倾斜角, 'source': 判断依据}
+        self.candidates = {}    # 各阶段/OCR 配置的原始候选
+        self.partial = set()    # 提前结束、候选不完整的键（不写入缓存）
+        self.timings = {}       # 各步骤耗时（秒）
+        self.counts = {}        # 各步骤执行次数（PDF 多页、热点区域回退、两阶段重试时同一步骤会执行多次）
+        self.worker = None      # 处理该文件的进程号
+        self.peak_rss = None    # 该进程到目前为止的峰值常驻内存（字节），无法获取时为 None
+
+    def to_dict(self):
+        return {
+            'path': self.path,
+            'error': self.error,
+            'number': self.number,
+            'stage': self.stage,
+            'config': self.config,
+            'page': self.page,
+            'cache': self.cache,
+            'box': self.box,
+            'region_pass': self.region_pass,
+            'phase': self.phase,
+            'orientation': self.orientation,
+            'candidates': self.candidates,
+            'timings': self.timings,
+            'worker': self.worker,
+            'peak_rss': self.peak_rss,
+        }
+
+    def add_timing(self, name, seconds, count=1):
+        """累加步骤耗时和执行次数（PDF 多页时同一步骤会执行多次）"""
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + count
+
+    def merge_timings(self, other):
+        """并入同一文件之前一次识别（热点区域、前一调度阶段）的耗时和执行次数"""
+        for name, seconds in other.timings.items():
+            self.add_timing(name, seconds, other.counts.get(name, 1))
+
+    @contextmanager
+    def span(self, name):
+        """计时区间：with result.span('imread'): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_timing(name, time.perf_counter() - start)
+
+
+class OcrRequest:
+    """识别步骤发出的 OCR 请求：用同一配置识别一组图像，执行方送回同样顺序的文本列表"""
+    def __init__(self, result, config_name, images):
+        self.result = result
+        self.config_name = config_name
+        self.images = images
+
+
+class OcrBackend:
+    """OCR 后端基类"""
+    name = 'base'
+
+    def image_to_string(self, image, lang, psm, oem=3):
+        """识别图像中的文字，返回原始文本"""
+        raise NotImplementedError
+
+    def images_to_strings(self, images, lang, psm, oem=3):
+        """识别多张图像，返回文本列表（默认逐张识别）"""
+        return [self.image_to_string(image, lang, psm, oem) for image in images]
+
+    def detect_orientation(self, image):
+        """Tesseract OSD：返回摆正图像所需的顺时针旋转角度，无法判断时返回 None"""
+        return None
+
+    def close(self):
+        """释放后端持有的资源"""
+        pass
+
+
+class PytesseractBackend(OcrBackend):
+    """子进程后端：每次识别都会写临时图片并启动一个 tesseract 进程"""
+    name = 'pytesseract'
+
+    def __init__(self, tesseract_cmd=None):
+        if tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+        # 缺少 osd.traineddata 时不再尝试
+        self.osd_available = True
+
+    def image_to_string(self, image, lang, psm, oem=3):
+        return pytesseract.image_to_string(
+            image,
+            lang=lang,
+            config=f'--oem {oem} --psm {psm}'
+        )
+
+    def detect_orientation(self, image):
+        if not self.osd_available:
+            return None
+        try:
+            osd = pytesseract.image_to_osd(image, output_type=pytesseract.Output.DICT)
+        except pytesseract.TesseractError as e:
+            if 'Failed loading language' in str(e):
+                logger.warning("缺少 osd.traineddata，方向检测只能纠正竖排: %s", e)
+                self.osd_available = False
+            else:
+                # 文字太少等情况
+                logger.debug("OSD 未能判断方向: %s", e)
+            return None
+        if osd.get('orientation_conf', 0) < OSD_MIN_CONFIDENCE:
+            return None
+        return int(osd['rotate']) % 360
+
+    def images_to_strings(self, images, lang, psm, oem=3):
+        """把多张图像写入列表文件，一个 tesseract 进程依次识别，按分页符拆回各图像的文本"""
+        if len(images) == 1:
+            return [self.image_to_string(images[0], lang, psm, oem)]
+        with tempfile.TemporaryDirectory(prefix='waybill_ocr_') as tmp:
+            paths = []
+            for i, image in enumerate(images):
+                path = os.path.join(tmp, f'{i}.png')
+                cv2.imencode('.png', image)[1].tofile(path)
+                paths.append(path)
+            list_path = os.path.join(tmp, 'list.txt')
+            with open(list_path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(paths) + '\n')
+            
+            output_base = os.path.join(tmp, 'out')
+            command = [pytesseract.pytesseract.tesseract_cmd, list_path, output_base,
+                       '-l', lang, '--oem', str(oem), '--psm', str(psm)]
+            try:
+                subprocess.run(command, check=True, capture_output=True, creationflags=NO_WINDOW)
+                with open(output_base + '.txt', encoding='utf-8') as f:
+                    pages = f.read().split(PAGE_SEPARATOR)
+            except (OSError, subprocess.CalledProcessError) as e:
+                logger.warning("批量 OCR 失败，改为逐张识别: %s", e)
+                return super().images_to_strings(images, lang, psm, oem)
+        
+        # 每页文本后都有分页符，最后会多出一个空串
+        if len(pages) == len(images) + 1 and not pages[-1].strip():
+            pages.pop()
+        if len(pages) != len(images):
+            logger.warning("批量 OCR 输出 %s 页，与图像数 %s 不符，改为逐张识别", len(pages), len(images))
+            return super().images_to_strings(images, lang, psm, oem)
+        return pages
+
+
+class TesserocrBackend(OcrBackend):
+    """进程内后端：每种语言只加载一次模型，直接接收 numpy 数组"""
+    name = 'tesserocr'
+
+    def __init__(self, tessdata_path=None):
+        if not module_available(tesserocr):
+            raise ImportError("未安装 tesserocr 或无法导入，无法使用进程内 OCR 引擎")
+        self.tessdata_path = tessdata_path
+        self._apis = {}
+        self.osd_available = True
+
+    def _get_api(self, lang, oem):
+        """按 (语言, 引擎模式) 缓存已初始化的 API 实例"""
+        key = (lang, oem)
+        api = self._apis.get(key)
+        if api is None:
+            kwargs = {'lang': lang, 'oem': oem}
+            if self.tessdata_path:
+                kwargs['path'] = self.tessdata_path
+            logger.debug("加载 Tesseract 模型: %s", lang)
+            api = tesserocr.PyTessBaseAPI(**kwargs)
+            self._apis[key] = api
+        return api
+
+    def image_to_string(self, image, lang, psm, oem=3):
+        api = self._get_api(lang, oem)
+        api.SetPageSegMode(psm)
+        self._set_image(api, image)
+        return api.GetUTF8Text()
+
+    def detect_orientation(self, image):
+        if not self.osd_available:
+            return None
+        try:
+            # OSD 模型只有传统引擎
+            api = self._get_api('osd', 0)
+        except RuntimeError as e:
+            logger.warning("缺少 osd.traineddata，方向检测只能纠正竖排: %s", e)
+            self.osd_available = False
+            return None
+        api.SetPageSegMode(tesserocr.PSM.OSD_ONLY)
+        self._set_image(api, image)
+        osd = api.DetectOrientationScript()
+        if not osd or osd['orient_conf'] < OSD_MIN_CONFIDENCE:
+            return None
+        # orient_deg 为文字的逆时针方向，摆正需要顺时针转回
+        return (360 - int(osd['orient_deg'])) % 360
+
+    def _set_image(self, api, image):
+        image = np.ascontiguousarray(image)
+        if image.ndim == 3:
+            # OpenCV 为 BGR 顺序，Tesseract 需要 RGB
+            image = np.ascontiguousarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+            bytes_per_pixel = 3
+        else:
+            bytes_per_pixel = 1
+        height, width = image.shape[:2]
+        api.SetImageBytes(image.tobytes(), width, height,
+                          bytes_per_pixel, bytes_per_pixel * width)
+
+    def close(self):
+        for api in self._apis.values():
+            api.End()
+        self._apis.clear()
+
+
+def create_ocr_backend(name='auto', tesseract_cmd=None, tessdata_path=None):
+    """创建 OCR 后端
+
+    name 可选 'auto'、'tesserocr'、'pytesseract'；'auto' 优先使用进程内引擎，
+    未安装 tesserocr 或导入失败时回退到 pytesseract。
+    """
+    if name == 'auto':
+        name = 'tesserocr' if module_available(tesserocr) else 'pytesseract'
+    if name == 'tesserocr':
+        return TesserocrBackend(tessdata_path)
+    if name == 'pytesseract':
+        return PytesseractBackend(tesseract_cmd)
+    raise ValueError(f"未知的 OCR 后端: {name}")
+
+
 class WaybillScanner:
-    def __init__(self):
+    def __init__(self, ocr_backend='auto'):
         logger.debug("初始化 WaybillScanner...")
+        start = time.perf_counter()
+        self._caches = {}
         
         try:
-            # 获取应用程序路径
-            if getattr(sys, 'frozen', False):
-                # 如果是打包后的可执行文件
-                application_path = os.path.dirname(sys.executable)
-                base_path = sys._MEIPASS  # PyInstaller 的临时目录
-            else:
-                # 如果是 Python 脚本
-                application_path = os.path.dirname(os.path.abspath(__file__))
-                base_path = os.path.dirname(os.path.dirname(application_path))
-            
-            # 确保 DLL 文件在正确的位置
-            dll_path = os.path.join(base_path, 'dll')
-            os.makedirs(dll_path, exist_ok=True)
-            
-            # 复制 DLL 文件到系统临时目录
-            temp_dir = os.path.join(os.environ['TEMP'], 'waybill_scanner_dll')
-            os.makedirs(temp_dir, exist_ok=True)
-            
-            dlls = ['libiconv.dll', 'libzbar64.dll']
-            for dll in dlls:
-                src = os.path.join(dll_path, dll)
-                dst = os.path.join(temp_dir, dll)
-                if os.path.exists(src):
-                    shutil.copy2(src, dst)
-            
-            # 添加 DLL 路径到环境变量
-            if temp_dir not in os.environ['PATH']:
-                os.environ['PATH'] = temp_dir + os.pathsep + os.environ['PATH']
-                
-            # 设置Tesseract路径
-            tesseract_path = os.path.join(base_path, 'Tesseract-OCR', 'tesseract.exe')
-            logger.debug(f"Tesseract 路径: {tesseract_path}")
-            
-            if not os.path.exists(tesseract_path):
-                logger.error(f"Tesseract 执行文件不存在: {tesseract_path}")
-                raise FileNotFoundError(f"找不到 Tesseract: {tesseract_path}")
-                
-            pytesseract.pytesseract.tesseract_cmd = tesseract_path
-            logger.debug("初始化完成")
-            
+            # 二进制查找、DLL 准备和 OCR 模型加载每个进程只做一次
+            engine = get_engine()
+            self.ocr = engine.ocr_backend(ocr_backend)
+            logger.debug("OCR 后端: %s", self.ocr.name)
+            # 方向检测结果按批次模板缓存，扫描器（进程）内共享
+            self.orienter = OrientationDetector(self.ocr.detect_orientation)
         except Exception as e:
-            logger.error(f"初始化失败: {str(e)}")
+            logger.error("初始化失败: %s", e)
             raise
+        
+        # 构造耗时（首个扫描器包含引擎初始化，之后的只有几微秒）
+        self.init_seconds = time.perf_counter() - start
+        logger.debug("初始化完成，耗时 %.3f 秒", self.init_seconds)
+    
+    def close(self):
+        """释放缓存资源（OCR 后端由进程内的 Engine 共享，退出时释放）"""
+        for cache in self._caches.values():
+            cache.close()
+        self._caches.clear()
     
     def scan_image(self, image_path, options):
         """扫描图片识别运单号"""
-        logger.debug(f"开始扫描图片: {image_path}")
-        logger.debug(f"扫描选项: {options}")
+        return self.scan(image_path, options).number
+    
+    def scan(self, image_path, options, preloaded=None):
+        """扫描图片，返回包含运单号及其来源阶段的 ScanResult
+
+        指定 options['hot_region']（自动学习的热点区域）时先在该区域内识别，
+        未找到再按 options['region'] 或全图识别，两次识别共用同一次解码。
+        preloaded 为预读阶段读取（或解码）好的 Preloaded，不再读取文件。
+        """
+        logger.debug("开始扫描图片: %s", image_path)
+        logger.debug("扫描选项: %s", options)
         
-        results = []
+        start = time.perf_counter()
+        try:
+            result = self._drive(self._scan_steps(image_path, options, preloaded))
+            result.add_timing('total', time.perf_counter() - start)
+            return result
+        except Exception as e:
+            logger.error("扫描过程出错: %s", e)
+            raise
+    
+    def scan_many(self, image_paths, options, preloaded=None):
+        """批量识别多个文件，返回与 image_paths 顺序一致的 ScanResult 列表
+
+        各文件的识别步骤同步推进，每一轮把所有文件发出的同一 OCR 配置的请求合并为一次调用，
+        子进程后端由此把 tesseract 的启动开销摊到多个文件上。单个文件出错只记录在其结果中。
+        preloaded 为与 image_paths 对应的预读内容（元素可以为 None）。
+        """
+        start = time.perf_counter()
+        results = [None] * len(image_paths)
+        active = {}
+        preloaded = preloaded or [None] * len(image_paths)
+        for index, (image_path, loaded) in enumerate(zip(image_paths, preloaded)):
+            self._advance(index, image_path, self._scan_steps(image_path, options, loaded), None,
+                          active, results, start)
         
+        while active:
+            # 按 OCR 配置分组，每组一次调用
+            groups = {}
+            for index, (_, _, request) in active.items():
+                groups.setdefault(request.config_name, []).append(index)
+            replies = {}
+            for config_name, indexes in groups.items():
+                requests = [active[index][2] for index in indexes]
+                images = [image for request in requests for image in request.images]
+                batch_start = time.perf_counter()
+                try:
+                    texts = self.ocr_images(images, OCR_CONFIGS[config_name])
+                except Exception as e:
+                    # 合并调用失败时这一组文件都记为出错
+                    for index in indexes:
+                        replies[index] = e
+                    continue
+                elapsed = time.perf_counter() - batch_start
+                offset = 0
+                for index, request in zip(indexes, requests):
+                    count = len(request.images)
+                    # 合并调用的耗时按图像数分摊到各文件
+                    request.result.add_timing(config_name, elapsed * count / len(images))
+                    replies[index] = texts[offset:offset + count]
+                    offset += count
+            for index, texts in replies.items():
+                image_path, steps, _ = active[index]
+                self._advance(index, image_path, steps, texts, active, results, start)
+        return results
+    
+    def _advance(self, index, image_path, steps, texts, active, results, start):
+        """把 OCR 结果（或 OCR 异常）送回文件的识别步骤，得到下一个请求或最终结果"""
         try:
-            # 读取图片
-            image = cv2.imread(image_path)
-            if image is None:
-                logger.error(f"无法读取图片: {image_path}")
-                return None
-            
-            # 如果指定了识别区域，裁剪图片
-            if options.get('region'):
-                height, width = image.shape[:2]
-                region = options['region']
-                x1 = int(region['x1'] * width)
-                y1 = int(region['y1'] * height)
-                x2 = int(region['x2'] * width)
-                y2 = int(region['y2'] * height)
-                image = image[y1:y2, x1:x2]
+            if isinstance(texts, Exception):
+                request = steps.throw(texts)
+            else:
+                request = steps.send(texts)
+        except StopIteration as stop:
+            active.pop(index, None)
+            results[index] = stop.value
+            stop.value.add_timing('total', time.perf_counter() - start)
+        except Exception as e:
+            logger.error("扫描过程出错: %s", e)
+            active.pop(index, None)
+            results[index] = ScanResult(image_path)
+            results[index].error = str(e)
+        else:
+            active[index] = (image_path, steps, request)
+    
+    def _drive(self, steps):
+        """执行单个文件的识别步骤，逐个完成其中的 OCR 请求"""
+        try:
+            request = next(steps)
+            while True:
+                with request.result.span(request.config_name):
+                    texts = self.ocr_images(request.images, OCR_CONFIGS[request.config_name])
+                request = steps.send(texts)
+        except StopIteration as stop:
+            return stop.value
+    
+    def _scan_steps(self, image_path, options, preloaded=None):
+        """单个文件的识别步骤（生成器）：产出 OcrRequest，接收文本列表，最终返回 ScanResult"""
+        if options.get('hot_region') and not is_pdf(image_path):
+            return (yield from self._scan_hot_first(image_path, options, preloaded))
+        return (yield from self._scan_once(image_path, options, preloaded=preloaded))
+    
+    def _scan_hot_first(self, image_path, options, preloaded=None):
+        """先扫描热点区域，失败后回退到完整区域"""
+        digest = self._digest(image_path, preloaded) if options.get('cache_path') else None
+        hot = ScanResult(image_path)
+        # 热点区域随学习扩大，缓存按用户设置的区域加识别轮次区分，区域变化后已有的缓存仍然可用
+        hot_options = dict(options, region=options['hot_region'], hot_region=None,
+                           cache_region=options.get('region'), cache_pass='hot')
+        # 两次识别共用整图，按较小的热点区域决定解码分辨率
+        source = LazyImage(lambda: self._read_image(image_path, hot, hot_options, preloaded))
+        yield from self._scan_once(image_path, hot_options, hot, source, digest)
+        hot.region_pass = 'hot'
+        if hot.number:
+            return hot
+        
+        logger.debug("热点区域未识别到运单号，回退到完整区域")
+        result = ScanResult(image_path)
+        yield from self._scan_once(image_path, dict(options, hot_region=None), result, source, digest)
+        result.merge_timings(hot)
+        result.region_pass = 'full'
+        return result
+    
+    def _scan_once(self, image_path, options, result=None, source=None, digest=None, preloaded=None):
+        """在 options['region']（或全图）内执行一次完整的阶段识别"""
+        result = result or ScanResult(image_path)
+        
+        # 查询候选缓存：命中的阶段直接重新过滤，不再解码和识别
+        cache = self._get_cache(options)
+        cached = {}
+        if cache is not None:
+            cache_key = make_cache_key(digest or self._digest(image_path, preloaded), self.cache_settings(options))
+            cached = cache.get(cache_key) or {}
+            result.cache = 'hit' if cached else 'miss'
+        
+        if is_pdf(image_path):
+            yield from self.scan_pdf(image_path, options, result, cached)
+        else:
+            if source is None:
+                # 只有裁剪后的区域在识别期间保留在内存中
+                image = LazyImage(lambda: self._crop_source(
+                    self._read_image(image_path, result, options, preloaded), options, result))
+            else:
+                image = LazyImage(lambda: self._crop_source(source.get(), options, result))
+            yield from self.run_stages(image, options, result, cached=cached)
+        logger.debug("识别结果: %s (阶段: %s)", result.number, result.stage)
+        
+        # 保存新计算出的完整候选
+        fresh = {k: v for k, v in result.candidates.items()
+                 if k not in cached and k not in result.partial}
+        if cache is not None and fresh:
+            cache.put(cache_key, {**cached, **fresh})
+        return result
+    
+    def cache_settings(self, options):
+        """影响原始候选的设置（过滤条件不在其中，修改后可直接复用缓存）
+
+        热点区域识别（cache_pass 为 'hot'）按用户设置的区域（cache_region）而不是当前热点区域记录。
+        """
+        return {
+            'region': options.get('cache_region', options.get('region')),
+            'pass': options.get('cache_pass'),
+            'pdf_dpi': int(options.get('pdf_dpi', DEFAULT_PDF_DPI)),
+            'decode_max_side': self._decode_max_side(options),
+            'source_max_side': source_max_side(options),
+            'ocr_configs': OCR_CONFIGS,
+            'preprocess': get_pipeline(options).steps,
+            'barcode_localize': bool(options.get('barcode_localize', True)),
+            'max_lines': int(options.get('max_lines', DEFAULT_MAX_LINES)),
+            # 批量逐行识别时处理到的行可能不同
+            'ocr_batch_size': max(1, int(options.get('ocr_batch_size') or 1)),
+            'carriers': get_extractor(options).carriers,
+            'orientation': bool(options.get('orientation', True)),
+        }
+    
+    def _get_cache(self, options):
+        """按 options['cache_path'] 打开（并复用）候选缓存"""
+        path = options.get('cache_path')
+        if not path:
+            return None
+        cache = self._caches.get(path)
+        if cache is None:
+            max_bytes = int(float(options.get('cache_max_mb', DEFAULT_CACHE_MAX_MB)) * 1024 * 1024)
+            cache = CandidateCache(path, max_bytes)
+            self._caches[path] = cache
+        return cache
+    
+    def _digest(self, image_path, preloaded=None):
+        """文件内容哈希：预读时已计算的直接使用"""
+        if preloaded is not None and preloaded.digest:
+            return preloaded.digest
+        return file_digest(image_path)
+    
+    def _read_image(self, image_path, result, options, preloaded=None):
+        """直接解码为灰度整图（JPEG 在识别区域足够大时缩小解码），无法读取时返回 None
+
+        要识别条码时按 source_max_side 的较高分辨率解码，文字识别的副本由 _ocr_view 缩小。
+        """
+        image, data = preloaded.take() if preloaded is not None else (None, None)
+        if image is not None:
+            return image
+        with result.span('imread'):
+            image, _ = read_image(image_path, options.get('region'), source_max_side(options), data=data)
+        if image is None:
+            logger.error("无法读取图片: %s", image_path)
+        return image
+    
+    def _decode_max_side(self, options):
+        return int(options.get('decode_max_side', DEFAULT_DECODE_MAX_SIDE))
+    
+    def _ocr_view(self, image, options, result):
+        """文字识别使用的图像：为条码按较高分辨率解码时，缩小到 decode_max_side 对应的分辨率"""
+        max_side = self._decode_max_side(options)
+        if image is None or source_max_side(options) == max_side:
+            return image
+        with result.span('ocr_resize'):
+            return reduce_image(image, max_side)
+    
+    def _crop_source(self, image, options, result):
+        """如果指定了识别区域，裁剪图片（复制区域像素，不再引用整图）"""
+        if image is None or not options.get('region'):
+            return image
+        with result.span('crop'):
+            return self.crop_region(image, options['region']).copy()
+    
+    def _read_pdf_page(self, load_page, options, result):
+        """解码/渲染 PDF 单页（加载函数已裁剪识别区域）"""
+        with result.span('imread'):
+            return load_page()
+    
+    def scan_pdf(self, pdf_path, options, result, cached=None):
+        """逐页光栅化 PDF 并识别，找到运单号的页即停止（生成器，OCR 请求由调用方完成）"""
+        dpi = int(options.get('pdf_dpi', DEFAULT_PDF_DPI))
+        pages = iter_pdf_pages(pdf_path, dpi, options.get('region'), gray=True, max_side=source_max_side(options))
+        try:
+            for page_no, load_page in enumerate(pages):
+                image = LazyImage(functools.partial(self._read_pdf_page, load_page, options, result))
+                yield from self.run_stages(image, options, result, page=page_no, cached=cached)
+                if result.number:
+                    result.page = page_no
+                    logger.debug("识别结果: %s (第 %s 页, 阶段: %s)", result.number, page_no + 1, result.stage)
+                    break
+        finally:
+            pages.close()
+        return result
+    
+    def crop_region(self, image, region):
+        """按比例坐标裁剪识别区域"""
+        return crop_ratio(image, region)
+    
+    def run_stages(self, image, options, result, page=None, cached=None):
+        """按阶段顺序识别，每个阶段的候选立即过滤，命中即停止
+
+        image 为 LazyImage，只有缓存中缺少某阶段的候选时才会真正解码。
+        这是生成器：OCR 以 OcrRequest 的形式产出，由 scan()/scan_many() 执行后送回文本。
+        """
+        stage_order = options.get('stage_order') or DEFAULT_STAGE_ORDER
+        # 各阶段内的 OCR 配置顺序（自适应调度时由批处理层按历史统计给出）
+        stage_configs = options.get('stage_configs') or {}
+        cached = cached or {}
+        # 条码阶段使用解码的原图，文字识别使用（可能）缩小的副本
+        ocr_image = LazyImage(lambda: self._ocr_view(image.get(), options, result))
+        processed_image = None
+        # 条码给出的方向（摆正所需的顺时针旋转角度）
+        rotations = []
+        
+        for stage in stage_order:
+            if stage not in STAGES:
+                raise ValueError(f"未知的识别阶段: {stage}")
             
-            # 条形码/二维码识别
-            if options['scan_barcode'] or options['scan_qrcode']:
-                logger.debug("进行条码识别...")
-                barcodes = decode(image)
-                for barcode in barcodes:
-                    data = barcode.data.decode('utf-8')
-                    logger.debug(f"条码识别结果: {data}")
-                    results.append(data)
+            if stage == 'barcode':
+                # 条形码/二维码识别
+                if not (options['scan_barcode'] or options['scan_qrcode']):
+                    continue
+                key = candidate_key(stage, None, page)
+                boxes = None
+                if key in cached:
+                    candidates = cached[key]
+                elif key + LOCALIZED_SUFFIX in cached and self.filter_results(cached[key + LOCALIZED_SUFFIX], options):
+                    # 只有定位结果的缓存在当前过滤条件下仍可用，否则重新解码（包括整图）
+                    candidates = cached[key + LOCALIZED_SUFFIX]
+                    result.partial.add(key)
+                else:
+                    if image.get() is None:
+                        return result
+                    logger.debug("进行条码识别...")
+                    with result.span(stage):
+                        candidates, boxes, complete = self._decode_barcodes(image.get(), options, rotations)
+                    if not complete:
+                        # 跳过了整图解码，候选只对当前过滤条件完整，另存为定位结果
+                        result.candidates[key + LOCALIZED_SUFFIX] = candidates
+                        result.partial.add(key)
+                if self._accept(candidates, options, result, stage, None, page, boxes):
+                    return result
+                continue
             
             # 文字识别
-            if options['scan_text']:
-                logger.debug("进行文字识别...")
-                
-                # 预处理图像
-                processed_image = self.preprocess_image(image)
-                
-                # OCR配置列表
-                ocr_configs = [
-                    {
-                        'lang': 'chi_sim+eng',  # 中文+英文
-                        'config': '--oem 3 --psm 3'  # 自动页面分割
-                    },
-                    {
-                        'lang': 'chi_sim+eng',
-                        'config': '--oem 3 --psm 6'  # 假设统一的文本块
-                    },
-                    {
-                        'lang': 'eng',  # 仅英文模式可能对数字字母组合更准确
-                        'config': '--oem 3 --psm 11'  # 稀疏文本
-                    }
-                ]
-                
-                # 运单号相关的关键词
-                keywords = [
-                    '运单', '单号', '快递单', '货运单', '订单号',
-                    'NO', 'Number', '#', '编号', '号码',
-                    '运输单', '提货单', '发货单'
-                ]
-                
-                # 使用不同配置进行识别
-                for config in ocr_configs:
-                    text = pytesseract.image_to_string(
-                        processed_image,
-                        lang=config['lang'],
-                        config=config['config']
-                    )
-                    
-                    # 分行处理
-                    lines = text.split('\n')
-                    logger.debug(f"OCR配置 {config} 识别结果: {lines}")
-                    
-                    for line in lines:
-                        line = line.strip()
-                        if not line:
-                            continue
-                        
-                        # 1. 检查是否包含关键词
-                        for keyword in keywords:
-                            if keyword in line:
-                                # 提取可能的运单号
-                                # YS/YT开头的运单号
-                                matches = re.findall(r'[YT][ST][0-9]{8,10}', line, re.IGNORECASE)
-                                results.extend(matches)
-                                
-                                # 提取冒号或等号后面的数字字母组合
-                                matches = re.findall(r'[:：=](.*?)(?=\s|$)', line)
-                                for match in matches:
-                                    # 清理提取的文本
-                                    cleaned = re.sub(r'[^A-Z0-9]', '', match.upper())
-                                    if cleaned and len(cleaned) >= 8:  # 假设运单号至少8位
-                                        results.append(cleaned)
-                        
-                        # 2. 直接匹配可能的运单号格式（即使没有关键词）
-                        # YS/YT开头的运单号
-                        matches = re.findall(r'[YT][ST][0-9]{8,10}', line, re.IGNORECASE)
-                        results.extend(matches)
-                        
-                        # 其他可能的运单号格式
-                        matches = re.findall(r'[A-Z]{2}[0-9]{8,10}', line)
-                        results.extend(matches)
+            if not options['scan_text']:
+                continue
+            
+            for config_name in stage_configs.get(stage, STAGES[stage]):
+                key = candidate_key(stage, config_name, page)
+                if key in cached:
+                    if self._accept(cached[key], options, result, stage, config_name, page):
+                        return result
+                    continue
                 
-                # 清理和标准化结果
-                cleaned_results = []
-                for result in results:
-                    # 转换为大写
-                    result = result.upper()
-                    # 移除空白字符
-                    result = ''.join(result.split())
-                    # 移除特殊字符
-                    result = re.sub(r'[^A-Z0-9]', '', result)
-                    if result:
-                        cleaned_results.append(result)
+                if processed_image is None:
+                    if ocr_image.get() is None:
+                        return result
+                    source = ocr_image.get()
+                    if options.get('orientation', True):
+                        # 横放或倒置的回单先摆正，所有 OCR 阶段共用
+                        with result.span('orient'):
+                            source = self.normalize_orientation(source, options, result, rotations)
+                    # 预处理图像（所有 OCR 阶段共用）
+                    with result.span('preprocess'):
+                        processed_image = self.preprocess_image(source, options, result.add_timing)
                 
-                # 去重
-                results = list(dict.fromkeys(cleaned_results))
-                logger.debug(f"文字识别最终结果: {results}")
-            
-            # 过滤结果
-            filtered_results = self.filter_results(results, options)
-            logger.debug(f"过滤后的结果: {filtered_results}")
-            
-            return filtered_results[0] if filtered_results else None
+                if stage == 'ocr_lines':
+                    found = yield from self.scan_text_lines(processed_image, options, result, config_name, page)
+                else:
+                    logger.debug("进行文字识别: %s", config_name)
+                    text, = yield OcrRequest(result, config_name, [processed_image])
+                    with result.span('extract'):
+                        candidates = self.extract_candidates(text, options)
+                    found = self._accept(candidates, options, result, stage, config_name, page)
+                if found:
+                    return result
+        
+        return result
+    
+    def scan_text_lines(self, processed_image, options, result, config_name, page=None):
+        """检测文字行并逐行识别，关键词行附近的行优先，找到运单号即停止"""
+        with result.span('ocr_lines.detect'):
+            boxes = detect_text_lines(processed_image)
+        
+        max_lines = int(options.get('max_lines', DEFAULT_MAX_LINES))
+        # 每次 OCR 请求包含的行数（批量模式下子进程后端一次识别多行）
+        batch_size = max(1, int(options.get('ocr_batch_size') or 1))
+        queue = rank_lines(boxes)
+        done = set()
+        candidates = []
+        key = candidate_key('ocr_lines', config_name, page)
+        extractor = get_extractor(options)
+        
+        while queue and len(done) < max_lines:
+            batch = []
+            while queue and len(batch) < batch_size and len(done) + len(batch) < max_lines:
+                box = queue.pop(0)
+                if box not in done and box not in batch:
+                    batch.append(box)
+            if not batch:
+                break
             
-        except Exception as e:
-            logger.error(f"扫描过程出错: {str(e)}")
-            raise
+            texts = yield OcrRequest(result, config_name, [crop_line(processed_image, box) for box in batch])
+            for box, text in zip(batch, texts):
+                done.add(box)
+                with result.span('extract'):
+                    line_candidates = extractor.extract(text)
+                candidates.extend(c for c in line_candidates if c not in candidates)
+                if line_candidates and self.filter_results(line_candidates, options):
+                    # 候选只覆盖到当前行，不完整，不写入缓存
+                    result.partial.add(key)
+                    line_box = box_to_ratio(box, processed_image.shape)
+                    if result.orientation:
+                        # 行位置换算回摆正前的图像
+                        line_box = unrotate_box(line_box, result.orientation['rotate'])
+                    boxes = {c: line_box for c in line_candidates}
+                    return self._accept(candidates, options, result, 'ocr_lines', config_name, page, boxes)
+                
+                # 关键词行：把同行右侧和下方紧邻的行提到队首
+                if extractor.has_keyword(text):
+                    queue = [b for b in neighbours(box, boxes) if b not in done and b not in batch] + queue
+        
+        logger.debug("逐行识别 %s 行未找到运单号", len(done))
+        return self._accept(candidates, options, result, 'ocr_lines', config_name, page)
+    
+    def _accept(self, candidates, options, result, stage, config_name, page=None, boxes=None):
+        """记录阶段候选并过滤，有通过过滤的结果时写入 result
+
+        boxes 为 {候选: 比例坐标}（相对于当前识别区域），用于记录运单号在整张图片中的位置。
+        """
+        result.candidates[candidate_key(stage, config_name, page)] = candidates
+        with result.span('filter'):
+            filtered = self.filter_results(candidates, options)
+        logger.debug("过滤后的结果: %s", filtered)
+        if not filtered:
+            return False
+        result.number = filtered[0]
+        result.stage = stage
+        result.config = config_name
+        if boxes and result.number in boxes:
+            result.box = region_to_image(boxes[result.number], options.get('region'))
+        return True
+    
+    def decode_barcodes(self, image, options=None):
+        """识别条形码/二维码，返回标准化后的候选"""
+        return self.decode_barcode_boxes(image, options)[0]
+    
+    def decode_barcode_boxes(self, image, options=None, rotations=None):
+        """识别条形码/二维码，返回 (标准化后的候选, {候选: 比例坐标})
+
+        默认先定位条码区域再解码灰度小图（options['barcode_localize'] 为 False 时直接整图解码），
+        定位解出的条码都通不过运单号过滤时再解码整图。
+        传入列表 rotations 时追加各条码给出的摆正角度（用于文字识别前的方向纠正）。
+        """
+        return self._decode_barcodes(image, options, rotations)[:2]
+    
+    def _decode_barcodes(self, image, options=None, rotations=None):
+        """decode_barcode_boxes 的实现，另外返回候选是否完整（False 表示跳过了整图解码）"""
+        verdicts = []
+        if (options or {}).get('barcode_localize', True):
+            accept = self._barcode_verdict(options, verdicts) if options is not None else None
+            barcodes = decode_localized(image, accept)
+        else:
+            barcodes = pyzbar.decode(image)
+        results = []
+        boxes = {}
+        for barcode in barcodes:
+            data = barcode.data.decode('utf-8')
+            logger.debug("条码识别结果: %s", data)
+            results.append(data)
+            if rotations is not None and barcode_rotation(barcode) is not None:
+                rotations.append(barcode_rotation(barcode))
+            for candidate in self.normalize_candidates([data]):
+                boxes.setdefault(candidate, box_to_ratio(barcode.rect, image.shape))
+        return self.normalize_candidates(results), boxes, not verdicts or not verdicts[-1]
+    
+    def _barcode_verdict(self, options, verdicts):
+        """定位解码结果的判定函数：有通过过滤的条码时跳过整图解码，每次判定追加到 verdicts"""
+        def accept(found):
+            candidates = self.normalize_candidates([b.data.decode('utf-8', 'replace') for b in found])
+            verdicts.append(bool(self.filter_results(candidates, options)))
+            return verdicts[-1]
+        return accept
+    
+    def normalize_orientation(self, image, options, result, rotations=None):
+        """检测方向和倾斜并摆正图像，检测结果按配置方案和识别区域（批次模板）缓存"""
+        region = options.get('region')
+        template = (options.get('profile'), tuple(sorted(region.items())) if region else None)
+        hint = rotations[0] if rotations else None
+        image, result.orientation = self.orienter.normalize(image, template, hint)
+        return image
+    
+    def recognize_text(self, processed_image, config, options=None):
+        """使用指定 OCR 配置识别文字并提取运单号候选"""
+        return self.extract_candidates(self.ocr_text(processed_image, config), options)
+    
+    def ocr_images(self, images, config):
+        """用同一 OCR 配置识别多张图像，返回文本列表（子进程后端合并为一次 tesseract 调用）"""
+        if len(images) == 1:
+            return [self.ocr_text(images[0], config)]
+        texts = self.ocr.images_to_strings(images, lang=config['lang'], psm=config['psm'])
+        logger.debug("OCR配置 %s 批量识别 %s 张图像", config, len(images))
+        return texts
+    
+    def ocr_text(self, image, config):
+        """使用指定 OCR 配置识别文字，返回原始文本"""
+        text = self.ocr.image_to_string(
+            image,
+            lang=config['lang'],
+            psm=config['psm']
+        )
+        logger.debug("OCR配置 %s 识别结果: %r", config, text)
+        return text
+    
+    def extract_candidates(self, text, options=None):
+        """从 OCR 文本中提取运单号候选（options['carrier_patterns'] 可注册额外格式）"""
+        results = get_extractor(options or {}).extract(text)
+        logger.debug("文字识别结果: %s", results)
+        return results
+    
+    def normalize_candidates(self, results):
+        """清理和标准化结果"""
+        return normalize_candidates(results)
     
     def filter_results(self, results, options):
         """过滤识别结果"""
-        logger.debug(f"开始过滤结果: {results}")
+        logger.debug("开始过滤结果: %s", results)
         
         filtered = []
         min_length = int(options.get('min_length', 1))
@@ -219,58 +901,38 @@ class WaybillScanner:
                 continue
             
             result = result.strip()
-            logger.debug(f"处理结果: {result}")
+            logger.debug("处理结果: %s", result)
             
             # 检查长度
             if len(result) < min_length or len(result) > max_length:
-                logger.debug(f"长度不在范围内: {len(result)} 不在 {min_length}-{max_length} 之间")
+                logger.debug("长度不在范围内: %s 不在 %s-%s 之间", len(result), min_length, max_length)
                 continue
             
             # 检查字符构成
             if allowed_chars and not all(c in allowed_chars for c in result):
-                logger.debug(f"包含不允许的字符")
+                logger.debug("包含不允许的字符")
                 continue
             
             # 检查前缀
             if prefix and not result.startswith(prefix):
-                logger.debug(f"前缀不匹配: {result} 不是以 {prefix} 开头")
+                logger.debug("前缀不匹配: %s 不是以 %s 开头", result, prefix)
                 continue
             
             # 检查后缀
             if suffix and not result.endswith(suffix):
-                logger.debug(f"后缀不匹配: {result} 不是以 {suffix} 结尾")
+                logger.debug("后缀不匹配: %s 不是以 %s 结尾", result, suffix)
                 continue
             
-            logger.debug(f"找到匹配结果: {result}")
+            logger.debug("找到匹配结果: %s", result)
             filtered.append(result)
         
         return filtered
     
-    def preprocess_image(self, image):
-        """图像预处理以提高文字识别率"""
+    def preprocess_image(self, image, options=None, on_timing=None):
+        """图像预处理以提高文字识别率（步骤由 options 中的预设或自定义步骤决定）"""
+        pipeline = get_pipeline(options or {})
         try:
-            # 转换为灰度图
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # 自适应阈值处理
-            binary = cv2.adaptiveThreshold(
-                gray,
-                255,
-                cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                cv2.THRESH_BINARY,
-                11,  # 邻域大小
-                2    # 常数差值
-            )
-            
-            # 降噪
-            denoised = cv2.fastNlMeansDenoising(binary)
-            
-            # 增强对比度
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-            enhanced = clahe.apply(gray)
-            
-            return enhanced
-            
-        except Exception as e:
-            logger.error(f"图像预处理失败: {str(e)}")
-            return image
\ No newline at end of file
+            return pipeline.run(image, on_timing)
+        except cv2.error as e:
+            logger.error("图像预处理失败: %s", e)
+            return image
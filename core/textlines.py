@@ -0,0 +1,88 @@
+import math
+import logging
+
+from core.engine import lazy_import
+
+cv2 = lazy_import('cv2')
+
+logger = logging.getLogger(__name__)
+
+# 检测时把图像缩小到该边长以内
+DETECT_MAX_SIDE = 1600
+
+# 默认最多逐行识别的文字行数
+DEFAULT_MAX_LINES = 15
+
+# 运单号行的典型宽高比（约 10 个字符）
+TYPICAL_ASPECT = 10.0
+
+# 行裁剪时四周留白（像素）
+LINE_PADDING = 4
+
+
+def detect_text_lines(gray):
+    """形态学行分割：形态学梯度 -> 二值化 -> 横向闭运算把字符连成行
+
+    返回原图坐标的 (x, y, w, h) 列表，按阅读顺序（自上而下、自左而右）排列。
+    """
+    height, width = gray.shape[:2]
+    scale = min(1.0, DETECT_MAX_SIDE / max(height, width))
+    small = gray if scale == 1.0 else cv2.resize(
+        gray, (max(1, int(width * scale)), max(1, int(height * scale))),
+        interpolation=cv2.INTER_AREA)
+    small_h, small_w = small.shape[:2]
+    
+    gradient = cv2.morphologyEx(small, cv2.MORPH_GRADIENT,
+                                cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, binary = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(9, small_w // 60), 1))
+    connected = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+    contours, _ = cv2.findContours(connected, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    
+    boxes = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        # 过滤噪点、大块图形和竖线
+        if h < 8 or h > small_h * 0.1 or w < h * 2:
+            continue
+        # 行内应有足够的笔画像素
+        if cv2.countNonZero(binary[y:y + h, x:x + w]) < 0.2 * w * h:
+            continue
+        boxes.append((int(x / scale), int(y / scale), int(w / scale), int(h / scale)))
+    
+    boxes.sort(key=lambda b: (b[1], b[0]))
+    return boxes
+
+
+def rank_lines(boxes):
+    """按形状先验排序：宽高比越接近一行运单号越靠前，同分保持阅读顺序"""
+    def score(box):
+        _, _, w, h = box
+        return abs(math.log((w / h) / TYPICAL_ASPECT))
+    return sorted(boxes, key=score)
+
+
+def neighbours(anchor, boxes):
+    """关键词行附近的行：同一行右侧的在前，其次是下方紧邻的行"""
+    ax, ay, aw, ah = anchor
+    right, below = [], []
+    for box in boxes:
+        if box == anchor:
+            continue
+        x, y, w, h = box
+        center_y = y + h / 2
+        if ay <= center_y <= ay + ah and x >= ax + aw * 0.5:
+            right.append(box)
+        elif ay + ah <= y <= ay + ah * 3 and x < ax + aw and x + w > ax:
+            below.append(box)
+    right.sort(key=lambda b: b[0])
+    below.sort(key=lambda b: b[1])
+    return right + below
+
+
+def crop_line(gray, box, padding=LINE_PADDING):
+    """裁剪文字行并留白"""
+    x, y, w, h = box
+    height, width = gray.shape[:2]
+    return gray[max(0, y - padding):min(height, y + h + padding),
+                max(0, x - padding):min(width, x + w + padding)]
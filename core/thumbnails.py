@@ -0,0 +1,116 @@
+import os
+import hashlib
+import logging
+
+from PIL import Image, ImageOps
+
+from core.cache import file_digest
+from core.imageio import image_size
+
+logger = logging.getLogger(__name__)
+
+# 缩略图缓存格式版本，生成方式变化时递增以使旧缩略图失效
+THUMBNAIL_VERSION = 1
+
+# 默认缓存目录、缩略图长边和保留的缩略图数量
+DEFAULT_THUMBNAIL_DIR = os.path.join(os.path.expanduser('~'), '.waybill_scanner', 'thumbnails')
+DEFAULT_THUMBNAIL_SIDE = 1280
+DEFAULT_MAX_THUMBNAILS = 200
+
+THUMBNAIL_EXT = '.jpg'
+
+
+class ThumbnailCache:
+    """磁盘缩略图缓存：按文件内容哈希和修改时间保存缩小后的预览图
+    
+    JPEG 用 draft 在解码时按 DCT 缩小，几千万像素的扫描件也只需解码一小部分数据。
+    缩略图已按 EXIF 方向旋转，与识别时 OpenCV 解码的方向一致。
+    """
+    def __init__(self, folder=DEFAULT_THUMBNAIL_DIR, max_side=DEFAULT_THUMBNAIL_SIDE,
+                 max_files=DEFAULT_MAX_THUMBNAILS):
+        self.folder = folder
+        self.max_side = max_side
+        self.max_files = max_files
+    
+    def _key(self, path):
+        stat = os.stat(path)
+        payload = f'{THUMBNAIL_VERSION}:{file_digest(path)}:{stat.st_mtime_ns}:{self.max_side}'
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def get(self, path):
+        """返回 (缩略图路径, 原图 (宽, 高))，无法读取时返回 None"""
+        size = image_size(path)
+        if size is None:
+            logger.error("无法读取图片尺寸: %s", path)
+            return None
+        try:
+            thumb_path = os.path.join(self.folder, self._key(path) + THUMBNAIL_EXT)
+            if os.path.exists(thumb_path):
+                # 更新修改时间，淘汰时保留最近使用的缩略图
+                os.utime(thumb_path)
+                return thumb_path, size
+            self._create(path, thumb_path)
+        except OSError as e:
+            logger.error("生成缩略图失败 %s: %s", path, e)
+            return None
+        self._prune()
+        return thumb_path, size
+    
+    def _create(self, path, thumb_path):
+        os.makedirs(self.folder, exist_ok=True)
+        with Image.open(path) as img:
+            img.draft('RGB', (self.max_side, self.max_side))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((self.max_side, self.max_side))
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            # 先写临时文件再替换，避免中断后留下不完整的缩略图
+            tmp_path = thumb_path + '.tmp'
+            img.save(tmp_path, 'JPEG', quality=90)
+        os.replace(tmp_path, thumb_path)
+        logger.debug("生成缩略图: %s -> %sx%s", os.path.basename(path), img.width, img.height)
+    
+    def _prune(self):
+        """缩略图超过 max_files 个时删除最久未使用的"""
+        try:
+            entries = [entry for entry in os.scandir(self.folder) if entry.name.endswith(THUMBNAIL_EXT)]
+        except OSError:
+            return
+        if len(entries) <= self.max_files:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_files]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def full_pixel(position, display_length, full_length):
+    """把预览图上的坐标换算为原图上的整数像素坐标"""
+    pixel = round(position * full_length / display_length)
+    return min(max(pixel, 0), full_length)
+
+
+def display_to_region(rect, display_size, full_size):
+    """把预览图上的矩形 (x1, y1, x2, y2) 换算为比例坐标
+    
+    先对齐到原图的整数像素，比例由原图像素换算，crop_ratio 在原图上可以精确还原这些像素。
+    """
+    display_width, display_height = display_size
+    full_width, full_height = full_size
+    x1, y1, x2, y2 = rect
+    return {
+        'x1': full_pixel(x1, display_width, full_width) / full_width,
+        'y1': full_pixel(y1, display_height, full_height) / full_height,
+        'x2': full_pixel(x2, display_width, full_width) / full_width,
+        'y2': full_pixel(y2, display_height, full_height) / full_height,
+    }
+
+
+def region_to_display(region, display_size):
+    """把比例坐标换算为预览图上的矩形 (x, y, 宽, 高)"""
+    display_width, display_height = display_size
+    x1 = round(region['x1'] * display_width)
+    y1 = round(region['y1'] * display_height)
+    return (x1, y1, round(region['x2'] * display_width) - x1, round(region['y2'] * display_height) - y1)
@@ -0,0 +1,132 @@
+import os
+import time
+import queue
+import logging
+import threading
+
+from core.files import IMAGE_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# 轮询间隔（秒）
+DEFAULT_POLL_INTERVAL = 0.5
+# 文件大小和修改时间保持不变多久才认为写入完成（秒）
+DEFAULT_SETTLE_TIME = 1.0
+# 待处理队列长度上限，队列满时暂停入队，由识别速度反压
+DEFAULT_QUEUE_SIZE = 64
+# 没有新文件时，迭代器最长等待多久产出一次 None
+IDLE_TIMEOUT = 0.2
+
+
+class FolderWatcher:
+    """监视文件夹：新文件写入完成后放入有界队列，记录到达时间用于统计端到端延迟
+    
+    使用 os.scandir 轮询（Windows 上目录项自带 stat，不额外访问文件），
+    文件大小和修改时间在 settle_time 内保持不变才认为扫描仪已写完。
+    """
+    def __init__(self, folder, poll_interval=DEFAULT_POLL_INTERVAL,
+                 settle_time=DEFAULT_SETTLE_TIME, queue_size=DEFAULT_QUEUE_SIZE):
+        self.folder = folder
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+        # 正在写入的文件: path -> (size, mtime_ns, 首次发现时间, 状态稳定起始时间)
+        self._pending = {}
+        # 已入队的文件（仍在文件夹中的失败文件不会重复入队）
+        self._queued = set()
+        # 到达时间: path -> time.monotonic()
+        self._arrivals = {}
+        self._lock = threading.Lock()
+        self.max_depth = 0
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._poll_loop, name='folder-watcher', daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        """停止监视，迭代器在队列取空后结束"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+    
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+    
+    def depth(self):
+        """当前队列中等待识别的文件数"""
+        return self.queue.qsize()
+    
+    def arrival(self, path):
+        """取出文件的到达时间（time.monotonic），未知时返回 None"""
+        with self._lock:
+            return self._arrivals.pop(path, None)
+    
+    def __iter__(self):
+        """产出写入完成的文件路径；暂时没有新文件时产出 None，便于调用方处理已完成的结果"""
+        while True:
+            try:
+                yield self.queue.get(timeout=IDLE_TIMEOUT)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                yield None
+    
+    def _poll_loop(self):
+        while not self._stop.is_set():
+            try:
+                for path in self.scan():
+                    self._enqueue(path)
+            except OSError as e:
+                logger.warning("监视文件夹失败: %s", e)
+            self._stop.wait(self.poll_interval)
+    
+    def _enqueue(self, path):
+        # 队列满时等待，停止监视时放弃
+        while not self._stop.is_set():
+            try:
+                self.queue.put(path, timeout=IDLE_TIMEOUT)
+            except queue.Full:
+                continue
+            self.max_depth = max(self.max_depth, self.queue.qsize())
+            return
+    
+    def scan(self):
+        """扫描一次文件夹，返回本次确认写入完成的新文件"""
+        now = time.monotonic()
+        present = set()
+        ready = []
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith(IMAGE_EXTENSIONS) or not entry.is_file():
+                    continue
+                path = entry.path
+                present.add(path)
+                if path in self._queued:
+                    continue
+                stat = entry.stat()
+                state = self._pending.get(path)
+                if state is None or state[:2] != (stat.st_size, stat.st_mtime_ns):
+                    # 新文件或仍在写入：重新计时
+                    first_seen = state[2] if state else now
+                    self._pending[path] = (stat.st_size, stat.st_mtime_ns, first_seen, now)
+                    continue
+                if stat.st_size == 0 or now - state[3] < self.settle_time:
+                    continue
+                del self._pending[path]
+                self._queued.add(path)
+                with self._lock:
+                    self._arrivals[path] = state[2]
+                ready.append(path)
+        
+        # 已移走或删除的文件不再跟踪，同名新文件可以再次处理
+        self._queued &= present
+        for path in list(self._pending):
+            if path not in present:
+                del self._pending[path]
+        if ready:
+            logger.debug("新文件 %d 个，队列 %d", len(ready), self.queue.qsize())
+        return sorted(ready)
@@ -0,0 +1,82 @@
+import pytest
+
+
+class FakeOcrBackend:
+    """按图像宽度和 psm 返回预设文本的 OCR 后端，记录每次调用识别的图像宽度"""
+    name = 'fake'
+    
+    def __init__(self):
+        self.texts = {}
+        self.calls = []
+        self.fail_psm = None
+    
+    def image_to_string(self, image, lang, psm, oem=3):
+        return self.images_to_strings([image], lang, psm, oem)[0]
+    
+    def images_to_strings(self, images, lang, psm, oem=3):
+        self.calls.append((psm, [image.shape[1] for image in images]))
+        if psm == self.fail_psm:
+            raise RuntimeError("tesseract failed")
+        return [self.texts.get((image.shape[1], psm), '') for image in images]
+    
+    def detect_orientation(self, image):
+        return None
+    
+    def close(self):
+        pass
+
+
+class FakeEngine:
+    def __init__(self, backend):
+        self.backend = backend
+    
+    def ocr_backend(self, name='auto'):
+        return self.backend
+
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    """用 FakeOcrBackend 替换进程内引擎（不需要安装 tesseract）"""
+    pytest.importorskip('cv2')
+    from core import scanner
+    backend = FakeOcrBackend()
+    monkeypatch.setattr(scanner, 'get_engine', lambda: FakeEngine(backend))
+    return backend
+
+
+@pytest.fixture
+def make_image(tmp_path):
+    """生成指定宽度的 PNG 回单，宽度用于让 FakeOcrBackend 区分文件"""
+    import cv2
+    import numpy as np
+    
+    def make(name, width):
+        image = np.full((120, width), 255, dtype=np.uint8)
+        cv2.rectangle(image, (20, 40), (width - 20, 70), 0, -1)
+        path = str(tmp_path / name)
+        cv2.imwrite(path, image)
+        return path
+    return make
+
+
+# 只做文字识别、不纠正方向的识别选项
+TEXT_OPTIONS = {
+    'scan_barcode': False,
+    'scan_qrcode': False,
+    'scan_text': True,
+    'min_length': 10,
+    'max_length': 10,
+    'uppercase': True,
+    'lowercase': False,
+    'digits': True,
+    'prefix': 'YS',
+    'suffix': '',
+    'preprocess': 'fast',
+    'orientation': False,
+    'stage_order': ['ocr_fast', 'ocr_full'],
+}
+
+
+@pytest.fixture
+def text_options():
+    return dict(TEXT_OPTIONS)
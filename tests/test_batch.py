@@ -0,0 +1,51 @@
+from core.batch import BatchRunner
+
+
+def runner_options(text_options, **overrides):
+    return dict(text_options, workers=1, prefetch=0, **overrides)
+
+
+def test_local_run_yields_results_in_input_order(fake_ocr, make_image, text_options):
+    paths = [make_image('a.png', 300), make_image('b.png', 310), make_image('c.png', 320)]
+    fake_ocr.texts[(310, 11)] = "YS22222222"
+    fake_ocr.texts[(320, 6)] = "YS33333333"
+    runner = BatchRunner(runner_options(text_options))
+    results = list(runner.run(paths))
+    
+    assert [r.path for r in results] == paths
+    assert [r.number for r in results] == [None, 'YS22222222', 'YS33333333']
+    assert runner.metrics.files == {'recognized': 2, 'failed': 1, 'error': 0}
+    assert runner.metrics.stages == {'ocr_fast': 1, 'ocr_full': 1}
+
+
+def test_batched_tasks_merge_ocr_calls(fake_ocr, make_image, text_options):
+    paths = [make_image(f'{i}.png', 300 + 10 * i) for i in range(5)]
+    runner = BatchRunner(runner_options(text_options, ocr_batch_size=2, stage_order=['ocr_fast']))
+    results = list(runner.run(paths))
+    
+    assert [r.path for r in results] == paths
+    assert [len(widths) for _, widths in fake_ocr.calls] == [2, 2, 1]
+
+
+def test_two_phase_retries_unrecognized_files(fake_ocr, make_image, text_options):
+    fast = make_image('fast.png', 300)
+    full = make_image('full.png', 310)
+    never = make_image('never.png', 320)
+    fake_ocr.texts[(300, 11)] = "YS11111111"
+    fake_ocr.texts[(310, 3)] = "YS22222222"
+    runner = BatchRunner(runner_options(text_options, two_phase=True))
+    results = list(runner.run([never, full, fast]))
+    
+    # 快速阶段识别的文件先产出，其余进入重试队列，最后一个阶段仍未识别的按失败产出
+    assert [(r.path, r.phase, r.number) for r in results] == [
+        (fast, 'fast', 'YS11111111'),
+        (full, 'retry_full', 'YS22222222'),
+        (never, 'retry_upscale', None),
+    ]
+    phases = runner.metrics.phases
+    assert list(phases) == ['fast', 'retry_full', 'retry_enhance', 'retry_upscale']
+    assert [(p['files'], p['recognized']) for p in phases.values()] == [(3, 1), (2, 1), (1, 0), (1, 0)]
+    # 失败文件的耗时和执行次数包括之前各阶段
+    assert results[2].counts['eng_psm11'] == 3
+    assert results[2].counts['chi_psm3'] == 2
+    assert runner.phase_options == {}
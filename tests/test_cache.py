@@ -0,0 +1,119 @@
+import json
+import time
+
+import pytest
+
+from core import cache as cache_module
+from core.cache import CandidateCache, make_cache_key
+
+
+def entry_size(candidates):
+    return len(json.dumps(candidates, ensure_ascii=False).encode('utf-8'))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = CandidateCache(str(tmp_path / 'cache.sqlite'), max_bytes=10 ** 6)
+    yield cache
+    cache.close()
+
+
+def test_get_returns_stored_candidates(cache):
+    assert cache.get('missing') is None
+    cache.put('a', {'barcode': ['YS12345678']})
+    assert cache.get('a') == {'barcode': ['YS12345678']}
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_cache_key_depends_on_settings():
+    assert make_cache_key('digest', {'region': None}) != make_cache_key('digest', {'region': {'x1': 0.5}})
+    assert make_cache_key('digest', {'a': 1, 'b': 2}) == make_cache_key('digest', {'b': 2, 'a': 1})
+
+
+def test_total_size_tracks_replacements(cache):
+    small = {'barcode': ['YS1']}
+    large = {'barcode': ['YS12345678', 'YT87654321']}
+    cache.put('a', small)
+    cache.put('b', small)
+    cache.put('a', large)
+    assert cache.stats()['bytes'] == entry_size(small) + entry_size(large)
+    cache.clear()
+    assert cache.stats()['bytes'] == 0
+
+
+def test_evicts_least_recently_used(tmp_path, monkeypatch):
+    candidates = {'barcode': ['YS12345678']}
+    size = entry_size(candidates)
+    cache = CandidateCache(str(tmp_path / 'cache.sqlite'), max_bytes=int(size * 3.5))
+    clock = [1000.0]
+    monkeypatch.setattr(cache_module.time, 'time', lambda: clock[0])
+    for key in ('a', 'b', 'c'):
+        cache.put(key, candidates)
+        clock[0] += cache_module.ACCESS_UPDATE_INTERVAL
+    # 访问 a 后 b 成为最久未访问的条目
+    assert cache.get('a') is not None
+    cache.put('d', candidates)
+    
+    assert cache.get('b') is None
+    assert all(cache.get(key) is not None for key in ('a', 'c', 'd'))
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['bytes'] == size * 3
+    cache.close()
+
+
+def test_counters_are_shared_after_close(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    first = CandidateCache(path)
+    second = CandidateCache(path)
+    first.put('a', {'barcode': []})
+    first.get('a')
+    second.get('a')
+    second.get('b')
+    first.close()
+    second.close()
+    
+    cache = CandidateCache(path)
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (2, 1)
+    cache.close()
+
+
+def test_existing_database_without_stats_is_summed(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = CandidateCache(path)
+    cache.put('a', {'barcode': ['YS12345678']})
+    cache.conn.execute('DROP TABLE stats')
+    cache.conn.commit()
+    cache.close()
+    
+    cache = CandidateCache(path)
+    assert cache.stats()['bytes'] == entry_size({'barcode': ['YS12345678']})
+    cache.close()
+
+
+def test_hits_do_not_write_until_flush(cache, monkeypatch):
+    cache.put('a', {'barcode': []})
+    writes = []
+    cache.conn.set_trace_callback(lambda sql: writes.append(sql) if sql.startswith(('UPDATE', 'INSERT')) else None)
+    for _ in range(10):
+        cache.get('a')
+    assert writes == []
+    
+    monkeypatch.setattr(cache_module, 'FLUSH_INTERVAL', 0)
+    cache.get('a')
+    assert writes
+    cache.conn.set_trace_callback(None)
+    assert cache.stats()['hits'] == 11
+
+
+def test_recent_access_time_is_not_rewritten(cache):
+    cache.put('a', {'barcode': []})
+    cache.get('a')
+    assert 'a' not in cache._touched
+    time_before = time.time()
+    cache.conn.execute('UPDATE entries SET last_access = ?', (time_before - cache_module.ACCESS_UPDATE_INTERVAL,))
+    cache.conn.commit()
+    cache.get('a')
+    assert 'a' in cache._touched
@@ -0,0 +1,39 @@
+import sys
+
+import pytest
+
+from core import engine
+from core.engine import lazy_import, module_available
+
+
+@pytest.fixture
+def modules(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(engine, '_failed_imports', {})
+    yield tmp_path
+    for name in ('broken_backend', 'working_backend'):
+        sys.modules.pop(name, None)
+
+
+def test_missing_optional_module_is_none():
+    assert lazy_import('no_such_backend_module', optional=True) is None
+    assert not module_available(None)
+
+
+def test_installed_but_broken_module_is_unavailable(modules):
+    # 例如 Windows 上 tesserocr 与 Tesseract 的 DLL 版本不匹配
+    (modules / 'broken_backend.py').write_text("raise ImportError('DLL load failed')\n")
+    module = lazy_import('broken_backend', optional=True)
+    assert module is not None
+    assert not module_available(module)
+    assert not module_available(module)
+    assert 'broken_backend' in engine._failed_imports
+
+
+def test_working_module_is_loaded_once(modules):
+    (modules / 'working_backend.py').write_text("VALUE = 42\n")
+    module = lazy_import('working_backend', optional=True)
+    assert 'working_backend' not in sys.modules
+    assert module_available(module)
+    assert module.VALUE == 42
+    assert 'working_backend' in engine.IMPORT_TIMINGS
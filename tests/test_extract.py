@@ -0,0 +1,50 @@
+import pytest
+
+from core.extract import CandidateExtractor, get_extractor
+
+
+@pytest.fixture
+def extractor():
+    return CandidateExtractor()
+
+
+def test_specific_carrier_wins_over_fallback(extractor):
+    # YS 开头的号码同时符合兜底格式，只应作为具体格式的候选出现一次
+    assert extractor.extract("ys12345678") == ['YS12345678']
+
+
+def test_candidates_are_ordered_by_priority(extractor):
+    text = "AB87654321 运单号：KD-2024-0001 YT123456789"
+    assert extractor.extract(text) == ['YT123456789', 'KD20240001', 'AB87654321']
+
+
+def test_separator_content_requires_keyword(extractor):
+    assert extractor.extract("备注：KD-2024-0001") == []
+    assert extractor.extract("单号：KD-0001") == []
+
+
+def test_registered_carrier_is_preferred_over_fallback(extractor):
+    extractor.register('sf', r'SF[0-9]{10,12}')
+    assert extractor.extract("SF1234567890 ZZ12345678") == ['SF1234567890', 'ZZ12345678']
+    assert ['sf', r'SF[0-9]{10,12}', False] in extractor.carriers
+
+
+def test_register_rejects_invalid_patterns(extractor):
+    with pytest.raises(ValueError):
+        extractor.register('bad name', r'X[0-9]+')
+    with pytest.raises(ValueError):
+        extractor.register('ys_yt', r'X[0-9]+')
+    with pytest.raises(ValueError):
+        extractor.register('broken', r'X[0-9')
+    with pytest.raises(ValueError):
+        extractor.register('named', r'(?P<digits>[0-9]+)')
+    # 全局标志无法合并，注册失败后提取器仍然可用
+    with pytest.raises(ValueError):
+        extractor.register('flags', r'(?i)jd[0-9]{10}')
+    assert extractor.extract("YS12345678") == ['YS12345678']
+
+
+def test_get_extractor_reuses_instances():
+    first = get_extractor({'carrier_patterns': {'jd': r'JD[0-9]{12}'}})
+    assert get_extractor({'carrier_patterns': {'jd': r'JD[0-9]{12}'}}) is first
+    assert get_extractor({}) is not first
@@ -0,0 +1,54 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from core.metrics import Metrics, percentile
+
+
+@pytest.mark.parametrize('q, expected', [(50, 5), (90, 9), (95, 10), (100, 10), (1, 1)])
+def test_percentile_is_nearest_rank(q, expected):
+    values = list(range(10, 0, -1))
+    assert percentile(values, q) == expected
+
+
+def test_percentile_of_small_samples():
+    assert percentile([], 90) == 0.0
+    assert percentile([0.3], 99) == 0.3
+    assert percentile([0.1, 0.2], 50) == 0.1
+
+
+def scan_result(number=None, stage=None, error=None, cache=None, **timings):
+    return SimpleNamespace(number=number, stage=stage, error=error, cache=cache, peak_rss=None, timings=timings)
+
+
+def test_metrics_export(tmp_path):
+    metrics = Metrics(buckets=(0.1, 1.0))
+    metrics.observe(scan_result('YS12345678', 'barcode', cache='hit', total=0.05))
+    metrics.observe(scan_result(total=0.5, eng_psm11=0.4))
+    metrics.observe(scan_result(error='broken', total=2.0))
+    metrics.observe_phase('fast', 3, 1, 1.5)
+    metrics.set_gauge('queue_depth', 4)
+    
+    prom = tmp_path / 'metrics.prom'
+    metrics.write(str(prom))
+    lines = prom.read_text(encoding='utf-8').splitlines()
+    assert 'waybill_step_seconds_bucket{step="total",le="0.1"} 1' in lines
+    assert 'waybill_step_seconds_bucket{step="total",le="1.0"} 2' in lines
+    assert 'waybill_step_seconds_bucket{step="total",le="+Inf"} 3' in lines
+    assert 'waybill_step_seconds_count{step="eng_psm11"} 1' in lines
+    assert 'waybill_files_total{result="recognized"} 1' in lines
+    assert 'waybill_files_total{result="failed"} 1' in lines
+    assert 'waybill_files_total{result="error"} 1' in lines
+    assert 'waybill_stage_hits_total{stage="barcode"} 1' in lines
+    assert 'waybill_cache_lookups_total{result="hit"} 1' in lines
+    assert 'waybill_phase_files{phase="fast",result="recognized"} 1' in lines
+    assert 'waybill_queue_depth 4' in lines
+    
+    report = tmp_path / 'metrics.json'
+    metrics.write(str(report))
+    data = json.loads(report.read_text(encoding='utf-8'))
+    assert data['files'] == {'recognized': 1, 'failed': 1, 'error': 1}
+    assert data['steps']['total']['count'] == 3
+    assert data['phases']['fast']['yield'] == pytest.approx(1 / 3)
+    assert not (tmp_path / 'metrics.json.tmp').exists()
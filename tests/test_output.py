@@ -0,0 +1,215 @@
+import os
+import json
+
+import pytest
+
+from core import output
+from core.output import OutputStage, JOURNAL_NAME, decision_settings
+
+
+@pytest.fixture
+def folders(tmp_path):
+    source = tmp_path / 'source'
+    target = tmp_path / 'success'
+    source.mkdir()
+    target.mkdir()
+    return source, target
+
+
+def make_file(folder, name, content=b'image'):
+    path = folder / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def read_ops(target):
+    with open(target / JOURNAL_NAME, encoding='utf-8') as f:
+        return [json.loads(line)['op'] for line in f]
+
+
+def test_commit_moves_file_and_finished_run_starts_fresh(folders):
+    source, target = folders
+    path = make_file(source, 'a.jpg')
+    stage = OutputStage(str(target))
+    assert stage.commit(path, 'YS12345678') == 'YS12345678.jpg'
+    stage.close()
+    assert (target / 'YS12345678.jpg').exists()
+    assert read_ops(target) == ['start', 'plan', 'done', 'end']
+    
+    stage = OutputStage(str(target))
+    assert stage.resumed == 0
+    stage.close()
+
+
+def test_duplicate_policies(folders):
+    source, target = folders
+    make_file(target, 'YS12345678.jpg', b'old')
+    
+    stage = OutputStage(str(target), 'suffix')
+    assert stage.commit(make_file(source, 'a.jpg'), 'YS12345678') == 'YS12345678_2.jpg'
+    stage.close()
+    
+    stage = OutputStage(str(target), 'skip')
+    path = make_file(source, 'b.jpg')
+    assert stage.commit(path, 'YS12345678') is None
+    assert os.path.exists(path)
+    assert stage.is_decided(path)
+    stage.close()
+    
+    stage = OutputStage(str(target), 'overwrite')
+    assert stage.commit(make_file(source, 'c.jpg', b'new'), 'YS12345678') == 'YS12345678.jpg'
+    stage.close()
+    assert (target / 'YS12345678.jpg').read_bytes() == b'new'
+
+
+def test_interrupted_run_skips_decided_files(folders):
+    source, target = folders
+    done = make_file(source, 'done.jpg')
+    failed = make_file(source, 'failed.jpg')
+    untouched = make_file(source, 'untouched.jpg')
+    stage = OutputStage(str(target))
+    stage.commit(done, 'YS12345678')
+    stage.fail(failed, 'not recognized')
+    stage.close(finished=False)
+    
+    stage = OutputStage(str(target))
+    assert stage.resumed == 2
+    assert list(stage.pending([failed, untouched, None])) == [untouched, None]
+    stage.close()
+
+
+def test_changed_file_is_scanned_again(folders):
+    source, target = folders
+    failed = make_file(source, 'failed.jpg')
+    stage = OutputStage(str(target))
+    stage.fail(failed, 'not recognized')
+    stage.close(finished=False)
+    
+    # 文件被替换（大小变化）后不再视为已有决定
+    make_file(source, 'failed.jpg', b'rescanned image')
+    stage = OutputStage(str(target))
+    assert not stage.is_decided(failed)
+    stage.close()
+
+
+def test_restart_ignores_journal(folders):
+    source, target = folders
+    failed = make_file(source, 'failed.jpg')
+    stage = OutputStage(str(target))
+    stage.fail(failed, 'not recognized')
+    stage.close(finished=False)
+    
+    stage = OutputStage(str(target), resume=False)
+    assert stage.resumed == 0
+    assert not stage.is_decided(failed)
+    stage.close()
+
+
+def test_changed_settings_rescan_failed_files(folders):
+    source, target = folders
+    failed = make_file(source, 'failed.jpg')
+    stage = OutputStage(str(target), settings={'prefix': 'YS'})
+    stage.fail(failed, 'not recognized')
+    stage.close(finished=False)
+    
+    stage = OutputStage(str(target), settings={'prefix': 'YS'})
+    assert stage.is_decided(failed)
+    stage.close(finished=False)
+    
+    stage = OutputStage(str(target), settings={'prefix': 'YT'})
+    assert stage.resumed == 0
+    assert not stage.is_decided(failed)
+    stage.close()
+
+
+@pytest.mark.parametrize('change', [
+    {'preprocess': 'clean'},
+    {'stage_order': ['ocr_full']},
+    {'orientation': False},
+    {'pdf_dpi': 300},
+    {'two_phase': True},
+])
+def test_changed_recognition_options_rescan_failed_files(folders, change):
+    source, target = folders
+    failed = make_file(source, 'failed.jpg')
+    options = {'scan_text': True, 'prefix': 'YS', 'preprocess': 'default', 'orientation': True, 'pdf_dpi': 200}
+    stage = OutputStage(str(target), settings=decision_settings(options))
+    stage.fail(failed, 'not recognized')
+    stage.close(finished=False)
+    
+    # 与识别无关的选项（如进程数）不影响上次的决定
+    stage = OutputStage(str(target), settings=decision_settings(dict(options, workers=8)))
+    assert stage.is_decided(failed)
+    stage.close(finished=False)
+    
+    stage = OutputStage(str(target), settings=decision_settings(dict(options, **change)))
+    assert not stage.is_decided(failed)
+    stage.close()
+
+
+def test_changed_policy_reprocesses_skipped_files(folders):
+    source, target = folders
+    make_file(target, 'YS12345678.jpg', b'old')
+    skipped = make_file(source, 'skipped.jpg')
+    stage = OutputStage(str(target), 'skip')
+    stage.commit(skipped, 'YS12345678')
+    stage.close(finished=False)
+    
+    stage = OutputStage(str(target), 'suffix')
+    assert not stage.is_decided(skipped)
+    stage.close()
+
+
+def test_failed_move_is_not_replayed(folders, monkeypatch):
+    source, target = folders
+    path = make_file(source, 'a.jpg')
+    
+    def broken_move(src, dst):
+        raise PermissionError("file is locked")
+    
+    monkeypatch.setattr(output, 'move_file', broken_move)
+    stage = OutputStage(str(target))
+    with pytest.raises(OSError):
+        stage.commit(path, 'YS12345678')
+    stage.fail(path, 'file is locked')
+    stage.close(finished=False)
+    assert read_ops(target) == ['start', 'plan', 'aborted', 'failed']
+    
+    monkeypatch.undo()
+    stage = OutputStage(str(target))
+    # 放弃的移动不补做，文件按失败处理
+    assert os.path.exists(path)
+    assert not (target / 'YS12345678.jpg').exists()
+    assert stage.resumed == 1
+    assert stage.is_decided(path)
+    stage.close()
+
+
+def test_plan_only_move_is_replayed(folders):
+    source, target = folders
+    path = make_file(source, 'a.jpg')
+    # 写入 plan 后进程崩溃，移动没有发生
+    with open(target / JOURNAL_NAME, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'op': 'start', 'policy': 'suffix'}) + '\n')
+        f.write(json.dumps({'op': 'plan', 'src': path, 'dst': 'YS12345678.jpg', 'number': 'YS12345678'}) + '\n')
+    
+    stage = OutputStage(str(target))
+    assert not os.path.exists(path)
+    assert (target / 'YS12345678.jpg').read_bytes() == b'image'
+    assert stage.resumed == 1
+    stage.close()
+    assert read_ops(target) == ['start', 'plan', 'done', 'start', 'end']
+
+
+def test_truncated_last_record_is_ignored(folders):
+    source, target = folders
+    failed = make_file(source, 'failed.jpg')
+    stage = OutputStage(str(target))
+    stage.fail(failed, 'not recognized')
+    stage.close(finished=False)
+    with open(target / JOURNAL_NAME, 'a', encoding='utf-8') as f:
+        f.write('{"op": "pl')
+    
+    stage = OutputStage(str(target))
+    assert stage.is_decided(failed)
+    stage.close()
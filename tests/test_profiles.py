@@ -0,0 +1,32 @@
+from types import SimpleNamespace
+
+import pytest
+
+from core.profiles import ProfileStore, MIN_ATTEMPTS
+
+
+def scan(timings, counts, config=None):
+    return SimpleNamespace(timings=timings, counts=counts, config=config)
+
+
+def test_attempts_count_every_execution(tmp_path):
+    store = ProfileStore(str(tmp_path / 'profiles.json'))
+    # 三页 PDF：同一配置执行三次，第三页命中
+    store.record_result('default', scan({'eng_psm11': 0.9, 'total': 1.0}, {'eng_psm11': 3, 'total': 1}, 'eng_psm11'),
+                        ['eng_psm11'])
+    store.record_result('default', scan({'eng_psm11': 0.2}, {'eng_psm11': 1}), ['eng_psm11'])
+    entry = store.profile('default')['ocr_stats']['eng_psm11']
+    assert entry == {'attempts': 4, 'hits': 1, 'seconds': pytest.approx(1.1)}
+    assert 'total' not in store.profile('default')['ocr_stats']
+
+
+def test_score_uses_seconds_per_execution(tmp_path):
+    store = ProfileStore(str(tmp_path / 'profiles.json'))
+    for _ in range(MIN_ATTEMPTS):
+        store.record_result('default', scan({'slow': 0.4}, {'slow': 1}), ['slow', 'paged'])
+        store.record_result('default', scan({'paged': 0.4}, {'paged': 4}), ['slow', 'paged'])
+    # 总耗时相同，多页执行的配置单次更快
+    rows = {row[0]: row for row in store.stats_table('default')}
+    assert rows['paged'][4] == pytest.approx(0.1)
+    assert rows['slow'][4] == pytest.approx(0.4)
+    assert store.order_configs('default', ['slow', 'paged']) == ['paged', 'slow']
@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+
+import pytest
+
+from core.region import RegionLearner
+
+
+def hit(x1, y1, x2, y2):
+    return SimpleNamespace(number='YS12345678', box={'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2})
+
+
+def test_not_ready_before_warmup():
+    learner = RegionLearner(warmup=3)
+    learner.observe(hit(0.5, 0.1, 0.7, 0.15))
+    learner.observe(SimpleNamespace(number=None, box=None))
+    assert learner.region() is None
+
+
+def test_region_is_padded_union_of_boxes():
+    learner = RegionLearner(warmup=2, padding=0.05)
+    learner.observe(hit(0.50, 0.10, 0.70, 0.15))
+    learner.observe(hit(0.52, 0.12, 0.72, 0.17))
+    assert learner.region() == pytest.approx({'x1': 0.45, 'y1': 0.05, 'x2': 0.77, 'y2': 0.22})
+
+
+def test_outlier_does_not_inflate_region():
+    learner = RegionLearner(warmup=5, padding=0.0)
+    for offset in (0.0, 0.01, 0.02, 0.01, 0.0, 0.02):
+        learner.observe(hit(0.5 + offset, 0.1 + offset, 0.7 + offset, 0.15 + offset))
+    # 一次误识别到页脚的号码
+    learner.observe(hit(0.0, 0.9, 0.3, 0.95))
+    assert learner.bounds() == pytest.approx({'x1': 0.5, 'y1': 0.1, 'x2': 0.72, 'y2': 0.17})
+
+
+def test_initial_region_is_used_until_boxes_are_observed():
+    initial = {'x1': 0.4, 'y1': 0.0, 'x2': 0.8, 'y2': 0.3}
+    learner = RegionLearner(padding=0.0, initial=initial)
+    assert learner.bounds() == initial
+    learner.observe(hit(0.5, 0.1, 0.9, 0.2))
+    assert learner.bounds() == {'x1': 0.4, 'y1': 0.0, 'x2': 0.9, 'y2': 0.3}
@@ -0,0 +1,67 @@
+from core.scanner import WaybillScanner
+
+
+def psms(backend):
+    return [psm for psm, _ in backend.calls]
+
+
+def test_cascade_stops_at_first_accepted_stage(fake_ocr, make_image, text_options):
+    path = make_image('a.png', 300)
+    fake_ocr.texts[(300, 11)] = "运单号：YS12345678"
+    result = WaybillScanner().scan(path, text_options)
+    
+    assert (result.number, result.stage, result.config) == ('YS12345678', 'ocr_fast', 'eng_psm11')
+    # 整页识别阶段没有执行
+    assert psms(fake_ocr) == [11]
+    assert 'chi_psm3' not in result.timings
+
+
+def test_cascade_tries_next_config_until_hit(fake_ocr, make_image, text_options):
+    path = make_image('a.png', 300)
+    # 快速阶段的候选通不过前缀过滤
+    fake_ocr.texts[(300, 11)] = "AB12345678"
+    fake_ocr.texts[(300, 3)] = "YT12345678\nYS87654321"
+    result = WaybillScanner().scan(path, text_options)
+    
+    assert (result.number, result.stage, result.config) == ('YS87654321', 'ocr_full', 'chi_psm3')
+    assert psms(fake_ocr) == [11, 3]
+    assert result.candidates['eng_psm11'] == ['AB12345678']
+
+
+def test_stage_configs_reorder_configs(fake_ocr, make_image, text_options):
+    path = make_image('a.png', 300)
+    fake_ocr.texts[(300, 6)] = "YS12345678"
+    options = dict(text_options, stage_order=['ocr_full'], stage_configs={'ocr_full': ['chi_psm6', 'chi_psm3']})
+    result = WaybillScanner().scan(path, options)
+    assert result.config == 'chi_psm6'
+    assert psms(fake_ocr) == [6]
+
+
+def test_scan_many_merges_requests_per_config(fake_ocr, make_image, text_options):
+    paths = [make_image('a.png', 300), make_image('b.png', 310), make_image('c.png', 320)]
+    fake_ocr.texts[(300, 11)] = "YS11111111"
+    fake_ocr.texts[(310, 3)] = "YS22222222"
+    results = WaybillScanner().scan_many(paths, text_options)
+    
+    # 每一轮同一配置的请求合并为一次调用，识别出的文件不再参与
+    assert fake_ocr.calls == [(11, [300, 310, 320]), (3, [310, 320]), (6, [320])]
+    assert [r.path for r in results] == paths
+    assert [r.number for r in results] == ['YS11111111', 'YS22222222', None]
+    assert results[2].counts['chi_psm6'] == 1
+    assert all('total' in r.timings for r in results)
+
+
+def test_scan_many_keeps_errors_per_file(fake_ocr, make_image, text_options, tmp_path):
+    paths = [make_image('a.png', 300), make_image('b.png', 310)]
+    broken = tmp_path / 'broken.png'
+    broken.write_bytes(b'not an image')
+    paths.insert(1, str(broken))
+    fake_ocr.texts[(300, 11)] = "YS11111111"
+    fake_ocr.fail_psm = 3
+    results = WaybillScanner().scan_many(paths, text_options)
+    
+    assert results[0].number == 'YS11111111' and results[0].error is None
+    # 无法解码的文件没有运单号，但不影响其他文件
+    assert results[1].number is None and results[1].error is None
+    # 合并调用失败只记录在参与该调用的文件中
+    assert results[2].number is None and 'tesseract failed' in results[2].error
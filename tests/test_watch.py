@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from core import watch
+from core.watch import FolderWatcher
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(watch.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def write(path, content):
+    with open(path, 'wb') as f:
+        f.write(content)
+    return str(path)
+
+
+def test_file_is_ready_after_settle_time(tmp_path, clock):
+    watcher = FolderWatcher(str(tmp_path), settle_time=1.0)
+    path = write(tmp_path / 'a.jpg', b'part')
+    write(tmp_path / 'notes.txt', b'ignored')
+    assert watcher.scan() == []
+    
+    # 扫描仪仍在写入：大小变化后重新计时
+    clock[0] += 0.8
+    write(tmp_path / 'a.jpg', b'partial image')
+    assert watcher.scan() == []
+    clock[0] += 0.8
+    assert watcher.scan() == []
+    clock[0] += 0.3
+    assert watcher.scan() == [path]
+    # 到达时间是首次发现的时间
+    assert watcher.arrival(path) == 100.0
+    assert watcher.scan() == []
+
+
+def test_empty_file_is_not_ready(tmp_path, clock):
+    watcher = FolderWatcher(str(tmp_path), settle_time=0.5)
+    write(tmp_path / 'a.jpg', b'')
+    watcher.scan()
+    clock[0] += 5
+    assert watcher.scan() == []
+
+
+def test_removed_file_can_arrive_again(tmp_path, clock):
+    watcher = FolderWatcher(str(tmp_path), settle_time=0.5)
+    path = write(tmp_path / 'a.jpg', b'image')
+    watcher.scan()
+    clock[0] += 1
+    assert watcher.scan() == [path]
+    
+    os.remove(path)
+    assert watcher.scan() == []
+    write(tmp_path / 'a.jpg', b'new image')
+    watcher.scan()
+    clock[0] += 1
+    assert watcher.scan() == [path]
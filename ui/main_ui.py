@@ -1,99 +1,172 @@
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                             QPushButton, QLabel, QLineEdit, QCheckBox, 
                             QProgressBar, QFileDialog, QGroupBox, QSpinBox,
-                            QDialog, QDialogButtonBox, QMessageBox)
+                            QDialog, QDialogButtonBox, QMessageBox, QComboBox)
 from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QPixmap, QPainter, QColor, QPen
 import os
-import shutil
-from core.scanner import WaybillScanner
-from PyQt6.QtWidgets import QApplication
-from datetime import datetime
+from core.batch import default_workers
+from core.files import list_image_files
+from core.cache import DEFAULT_CACHE_PATH
+from core.scanner import STAGES, DEFAULT_STAGE_ORDER
+from core.pdf import DEFAULT_PDF_DPI, MIN_PDF_DPI, MAX_PDF_DPI
+from core.preprocess import PRESETS, PRESET_LABELS, DEFAULT_PRESET
+from core.profiles import ProfileStore, format_stats_table, DEFAULT_PROFILE
+from core.output import DUPLICATE_POLICIES, DUPLICATE_LABELS, DEFAULT_DUPLICATE_POLICY
+from core.watch import FolderWatcher
+from core.thumbnails import ThumbnailCache, display_to_region, region_to_display
+from core.dryrun import DEFAULT_SAMPLE_SIZE, format_report
+from ui.worker import ProcessThread, DryRunThread
 
-class RegionSelectDialog(QDialog):
-    """识别区域选择对话框"""
-    def __init__(self, image_path, parent=None):
+# 区域选择对话框中可以翻看的样本文件数
+REGION_SAMPLES = 8
+
+class RegionLabel(QLabel):
+    """显示预览图并用鼠标框选区域，选中的区域以比例坐标保存（与预览缩放无关）"""
+    region_changed = pyqtSignal()
+    
+    def __init__(self, parent=None):
         super().__init__(parent)
-        self.image_path = image_path
-        self.selected_region = None
+        self.region = None
+        self.full_size = None
         self.start_pos = None
         self.current_pos = None
-        
-        self.setWindowTitle("选择识别区域")
-        self.setMinimumSize(800, 600)
-        
-        # 加载图片
-        self.pixmap = QPixmap(image_path)
-        
-        # 创建布局
-        layout = QVBoxLayout(self)
-        
-        # 图片标签
-        self.image_label = QLabel()
-        self.image_label.setPixmap(self.pixmap)
-        layout.addWidget(self.image_label)
-        
-        # 按钮
-        buttons = QDialogButtonBox(
-            QDialogButtonBox.StandardButton.Ok | 
-            QDialogButtonBox.StandardButton.Cancel
-        )
-        buttons.accepted.connect(self.accept)
-        buttons.rejected.connect(self.reject)
-        layout.addWidget(buttons)
-        
-        # 设置鼠标跟踪
-        self.image_label.setMouseTracking(True)
-        self.image_label.mousePressEvent = self.mousePressEvent
-        self.image_label.mouseMoveEvent = self.mouseMoveEvent
-        self.image_label.mouseReleaseEvent = self.mouseReleaseEvent
-        
+        self.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop)
+    
+    def set_preview(self, pixmap, full_size):
+        self.full_size = full_size
+        self.setPixmap(pixmap)
+        self.setFixedSize(pixmap.size())
+        self.update()
+    
+    def _display_size(self):
+        return self.pixmap().width(), self.pixmap().height()
+    
     def mousePressEvent(self, event):
-        if event.button() == Qt.MouseButton.LeftButton:
+        if event.button() == Qt.MouseButton.LeftButton and self.full_size:
             self.start_pos = event.pos()
             self.current_pos = event.pos()
-            
+    
     def mouseMoveEvent(self, event):
         if self.start_pos:
             self.current_pos = event.pos()
             self.update()
-            
+    
     def mouseReleaseEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton and self.start_pos:
             x1 = min(self.start_pos.x(), self.current_pos.x())
             y1 = min(self.start_pos.y(), self.current_pos.y())
             x2 = max(self.start_pos.x(), self.current_pos.x())
             y2 = max(self.start_pos.y(), self.current_pos.y())
-            
-            # 计算相对于图片的坐标比例
-            img_width = self.pixmap.width()
-            img_height = self.pixmap.height()
-            
-            self.selected_region = {
-                'x1': x1 / img_width,
-                'y1': y1 / img_height,
-                'x2': x2 / img_width,
-                'y2': y2 / img_height
-            }
-            
             self.start_pos = None
             self.current_pos = None
+            if x2 > x1 and y2 > y1:
+                # 按原图像素换算比例坐标，预览缩放不影响识别区域
+                self.region = display_to_region((x1, y1, x2, y2), self._display_size(), self.full_size)
+                self.region_changed.emit()
             self.update()
-            
+    
     def paintEvent(self, event):
         super().paintEvent(event)
         if self.start_pos and self.current_pos:
-            painter = QPainter(self)
-            pen = QPen(QColor(255, 0, 0))
-            pen.setWidth(2)
-            painter.setPen(pen)
-            
             x = min(self.start_pos.x(), self.current_pos.x())
             y = min(self.start_pos.y(), self.current_pos.y())
-            w = abs(self.current_pos.x() - self.start_pos.x())
-            h = abs(self.current_pos.y() - self.start_pos.y())
-            
-            painter.drawRect(x, y, w, h)
+            rect = (x, y, abs(self.current_pos.x() - self.start_pos.x()),
+                    abs(self.current_pos.y() - self.start_pos.y()))
+        elif self.region and self.full_size:
+            rect = region_to_display(self.region, self._display_size())
+        else:
+            return
+        painter = QPainter(self)
+        pen = QPen(QColor(255, 0, 0))
+        pen.setWidth(2)
+        painter.setPen(pen)
+        painter.drawRect(*rect)
+        painter.end()
+
+class RegionSelectDialog(QDialog):
+    """识别区域选择对话框：显示缓存的缩略图，可以翻看多个样本文件确认区域"""
+    # 预览图在对话框中的最大显示尺寸
+    PREVIEW_WIDTH = 1000
+    PREVIEW_HEIGHT = 700
+    
+    def __init__(self, image_paths, parent=None, region=None):
+        super().__init__(parent)
+        self.image_paths = image_paths
+        self.index = 0
+        self.thumbnails = ThumbnailCache()
+        
+        self.setWindowTitle("选择识别区域")
+        self.setMinimumSize(800, 600)
+        
+        # 创建布局
+        layout = QVBoxLayout(self)
+        
+        # 样本翻页
+        nav_layout = QHBoxLayout()
+        self.prev_btn = QPushButton("上一张")
+        self.prev_btn.clicked.connect(lambda: self.show_sample(self.index - 1))
+        self.next_btn = QPushButton("下一张")
+        self.next_btn.clicked.connect(lambda: self.show_sample(self.index + 1))
+        self.info_label = QLabel()
+        nav_layout.addWidget(self.prev_btn)
+        nav_layout.addWidget(self.info_label, 1)
+        nav_layout.addWidget(self.next_btn)
+        layout.addLayout(nav_layout)
+        
+        # 图片标签
+        self.image_label = RegionLabel()
+        self.image_label.region = region
+        self.image_label.region_changed.connect(self.update_info)
+        layout.addWidget(self.image_label, 0, Qt.AlignmentFlag.AlignCenter)
+        
+        # 按钮
+        buttons = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok | 
+            QDialogButtonBox.StandardButton.Cancel
+        )
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+        
+        self.show_sample(0)
+    
+    @property
+    def selected_region(self):
+        return self.image_label.region
+    
+    def show_sample(self, index):
+        """显示第 index 个样本文件的预览（缩略图按文件哈希缓存，再次打开无需解码原图）"""
+        self.index = index
+        self.prev_btn.setEnabled(index > 0)
+        self.next_btn.setEnabled(index < len(self.image_paths) - 1)
+        entry = self.thumbnails.get(self.image_paths[index])
+        if entry is None:
+            self.image_label.full_size = None
+            self.image_label.setPixmap(QPixmap())
+            self.image_label.setText("无法预览该文件")
+        else:
+            thumb_path, full_size = entry
+            pixmap = QPixmap(thumb_path).scaled(
+                self.PREVIEW_WIDTH, self.PREVIEW_HEIGHT,
+                Qt.AspectRatioMode.KeepAspectRatio,
+                Qt.TransformationMode.SmoothTransformation
+            )
+            self.image_label.set_preview(pixmap, full_size)
+        self.update_info()
+    
+    def update_info(self):
+        name = os.path.basename(self.image_paths[self.index])
+        text = f"{self.index + 1}/{len(self.image_paths)}  {name}"
+        full_size = self.image_label.full_size
+        if full_size:
+            text += f"  原图 {full_size[0]}×{full_size[1]}"
+            region = self.selected_region
+            if region:
+                width = round((region['x2'] - region['x1']) * full_size[0])
+                height = round((region['y2'] - region['y1']) * full_size[1])
+                text += f"  区域 {width}×{height}"
+        self.info_label.setText(text)
 
 class MainWindow(QMainWindow):
     # 定义信号
@@ -143,8 +216,85 @@ class MainWindow(QMainWindow):
         region_layout.addWidget(self.full_image_cb)
         region_layout.addWidget(self.custom_region_cb)
         region_layout.addWidget(self.select_region_btn)
+        self.auto_region_cb = QCheckBox("自动学习区域")
+        self.auto_region_cb.setToolTip("根据前几个识别成功的文件学习运单号位置，之后优先识别该区域，失败再识别完整区域")
+        region_layout.addWidget(self.auto_region_cb)
         recognition_layout.addLayout(region_layout)
         
+        # 并行进程数
+        workers_layout = QHBoxLayout()
+        workers_layout.addWidget(QLabel("并行进程数:"))
+        self.workers_input = QSpinBox()
+        self.workers_input.setMinimum(1)
+        self.workers_input.setMaximum(64)
+        self.workers_input.setValue(default_workers())
+        workers_layout.addWidget(self.workers_input)
+        self.cache_cb = QCheckBox("启用识别缓存")
+        self.cache_cb.setChecked(True)
+        self.cache_cb.setToolTip("缓存原始识别候选，修改运单号设置后重新处理时无需再次识别")
+        workers_layout.addWidget(self.cache_cb)
+        self.watch_cb = QCheckBox("监视模式")
+        self.watch_cb.setToolTip("持续处理新放入待处理文件夹的文件（等待写入完成），点击取消停止")
+        workers_layout.addWidget(self.watch_cb)
+        workers_layout.addStretch()
+        recognition_layout.addLayout(workers_layout)
+        
+        # 文字识别预处理预设
+        preprocess_layout = QHBoxLayout()
+        preprocess_layout.addWidget(QLabel("图像预处理:"))
+        self.preprocess_combo = QComboBox()
+        for name in PRESETS:
+            self.preprocess_combo.addItem(PRESET_LABELS.get(name, name), name)
+        self.preprocess_combo.setCurrentIndex(self.preprocess_combo.findData(DEFAULT_PRESET))
+        preprocess_layout.addWidget(self.preprocess_combo)
+        self.orientation_cb = QCheckBox("自动纠正方向")
+        self.orientation_cb.setToolTip("文字识别前检测横放、倒置和倾斜的回单并摆正")
+        self.orientation_cb.setChecked(True)
+        preprocess_layout.addWidget(self.orientation_cb)
+        self.two_phase_cb = QCheckBox("两阶段处理")
+        self.two_phase_cb.setToolTip("先用条码和快速文字识别处理全部文件并立即移动成功的，"
+                                     "未识别的再用更多识别配置、额外预处理和放大依次重试（监视模式下不生效）")
+        preprocess_layout.addWidget(self.two_phase_cb)
+        
+        # 运单号重复（成功文件夹中已有同名文件）时的处理方式
+        preprocess_layout.addWidget(QLabel("运单号重复时:"))
+        self.duplicate_combo = QComboBox()
+        for name in DUPLICATE_POLICIES:
+            self.duplicate_combo.addItem(DUPLICATE_LABELS[name], name)
+        self.duplicate_combo.setCurrentIndex(self.duplicate_combo.findData(DEFAULT_DUPLICATE_POLICY))
+        preprocess_layout.addWidget(self.duplicate_combo)
+        self.restart_cb = QCheckBox("忽略上次记录")
+        self.restart_cb.setToolTip("从头开始：不继续上次未完成的处理，重新识别所有文件（包括上次失败或跳过的文件）")
+        preprocess_layout.addWidget(self.restart_cb)
+        preprocess_layout.addStretch()
+        recognition_layout.addLayout(preprocess_layout)
+        
+        # 识别阶段顺序与 PDF 渲染分辨率
+        stage_layout = QHBoxLayout()
+        stage_layout.addWidget(QLabel("识别阶段顺序:"))
+        self.stage_order_input = QLineEdit()
+        self.stage_order_input.setPlaceholderText(','.join(DEFAULT_STAGE_ORDER))
+        self.stage_order_input.setToolTip(f"逗号分隔，可调整顺序或省略阶段，留空使用默认顺序（可选 {', '.join(STAGES)}）")
+        stage_layout.addWidget(self.stage_order_input)
+        stage_layout.addWidget(QLabel("PDF 分辨率:"))
+        self.pdf_dpi_input = QSpinBox()
+        self.pdf_dpi_input.setRange(MIN_PDF_DPI, MAX_PDF_DPI)
+        self.pdf_dpi_input.setValue(DEFAULT_PDF_DPI)
+        self.pdf_dpi_input.setSuffix(" DPI")
+        stage_layout.addWidget(self.pdf_dpi_input)
+        recognition_layout.addLayout(stage_layout)
+        
+        # 配置方案与自适应 OCR 顺序
+        profile_layout = QHBoxLayout()
+        profile_layout.addWidget(QLabel("配置方案:"))
+        self.profile_input = QLineEdit(DEFAULT_PROFILE)
+        profile_layout.addWidget(self.profile_input)
+        self.adaptive_cb = QCheckBox("按命中率自动调整识别顺序")
+        profile_layout.addWidget(self.adaptive_cb)
+        self.stats_btn = QPushButton("识别统计")
+        profile_layout.addWidget(self.stats_btn)
+        recognition_layout.addLayout(profile_layout)
+        
         recognition_group.setLayout(recognition_layout)
         layout.addWidget(recognition_group)
         
@@ -238,8 +388,28 @@ class MainWindow(QMainWindow):
         layout.addWidget(progress_group)
         
         # === 控制按钮 ===
+        control_layout = QHBoxLayout()
         self.start_btn = QPushButton("开始处理")
-        layout.addWidget(self.start_btn)
+        self.pause_btn = QPushButton("暂停")
+        self.pause_btn.setEnabled(False)
+        self.cancel_btn = QPushButton("取消")
+        self.cancel_btn.setEnabled(False)
+        control_layout.addWidget(self.start_btn)
+        control_layout.addWidget(self.pause_btn)
+        control_layout.addWidget(self.cancel_btn)
+        # 试运行：识别随机样本，不移动文件，用于调整识别选项
+        control_layout.addWidget(QLabel("样本数:"))
+        self.sample_input = QSpinBox()
+        self.sample_input.setRange(1, 1000)
+        self.sample_input.setValue(DEFAULT_SAMPLE_SIZE)
+        control_layout.addWidget(self.sample_input)
+        self.dry_run_btn = QPushButton("试运行")
+        self.dry_run_btn.setToolTip("随机识别部分文件，不移动文件，报告识别率、耗时和预计总耗时")
+        control_layout.addWidget(self.dry_run_btn)
+        layout.addLayout(control_layout)
+        
+        # 后台处理线程
+        self.process_thread = None
         
         # 绑定事件
         self.setup_connections()
@@ -262,9 +432,13 @@ class MainWindow(QMainWindow):
         self.source_btn.clicked.connect(self.select_source_folder)
         self.target_btn.clicked.connect(self.select_target_folder)
         self.start_btn.clicked.connect(self.start_process)
+        self.pause_btn.clicked.connect(self.toggle_pause)
+        self.cancel_btn.clicked.connect(self.cancel_process)
+        self.dry_run_btn.clicked.connect(self.start_dry_run)
         self.full_image_cb.toggled.connect(self.toggle_region_selection)
         self.custom_region_cb.toggled.connect(self.toggle_region_selection)
         self.select_region_btn.clicked.connect(self.select_region)
+        self.stats_btn.clicked.connect(self.show_stats)
     
     def select_source_folder(self):
         """选择源文件夹"""
@@ -293,26 +467,53 @@ class MainWindow(QMainWindow):
         if not self.source_input.text():
             QMessageBox.warning(self, "警告", "请先选择待处理文件夹！")
             return
-            
-        # 获取第一个图片文件
-        image_files = [f for f in os.listdir(self.source_input.text()) 
-                      if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+        
+        # 在文件夹中均匀抽取几个样本，翻看确认区域对不同文件都适用
+        image_files = [path for path in list_image_files(self.source_input.text())
+                       if not path.lower().endswith('.pdf')]
         if not image_files:
             QMessageBox.warning(self, "警告", "待处理文件夹中没有图片文件！")
             return
-            
-        image_path = os.path.join(self.source_input.text(), image_files[0])
-        dialog = RegionSelectDialog(image_path, self)
+        step = max(1, len(image_files) // REGION_SAMPLES)
+        samples = image_files[::step][:REGION_SAMPLES]
+        
+        dialog = RegionSelectDialog(samples, self, self.selected_region)
         if dialog.exec() == QDialog.DialogCode.Accepted:
             self.selected_region = dialog.selected_region
     
-    def start_process(self):
-        """开始处理按钮点击事件"""
-        if not self.validate_inputs():
+    def show_stats(self):
+        """显示当前配置方案的 OCR 配置统计"""
+        profile = self.profile_input.text().strip() or DEFAULT_PROFILE
+        rows = ProfileStore().stats_table(profile)
+        if not rows:
+            QMessageBox.information(self, "识别统计", f"配置方案 {profile} 暂无统计数据")
             return
-        
-        # 获取所有设置
-        options = {
+        box = QMessageBox(self)
+        box.setWindowTitle("识别统计")
+        box.setText(f"配置方案：{profile}")
+        box.setDetailedText(format_stats_table(rows))
+        box.exec()
+    
+    def stage_order(self):
+        """解析识别阶段顺序，留空返回 None（使用默认顺序）"""
+        stages = [v.strip() for v in self.stage_order_input.text().split(',') if v.strip()]
+        return stages or None
+    
+    def validate_stage_order(self):
+        """检查识别阶段顺序中的阶段名"""
+        stages = self.stage_order() or []
+        unknown = [stage for stage in stages if stage not in STAGES]
+        if unknown:
+            QMessageBox.warning(self, "警告", f"未知的识别阶段：{', '.join(unknown)}（可选 {', '.join(STAGES)}）")
+            return False
+        if len(set(stages)) != len(stages):
+            QMessageBox.warning(self, "警告", "识别阶段顺序中有重复的阶段！")
+            return False
+        return True
+    
+    def get_options(self):
+        """获取所有识别设置"""
+        return {
             'scan_barcode': self.barcode_cb.isChecked(),
             'scan_qrcode': self.qrcode_cb.isChecked(),
             'scan_text': self.text_cb.isChecked(),
@@ -324,8 +525,28 @@ class MainWindow(QMainWindow):
             'custom_chars': self.custom_chars_input.text(),
             'prefix': self.prefix_input.text(),
             'suffix': self.suffix_input.text(),
-            'region': self.selected_region if self.custom_region_cb.isChecked() else None
+            'region': self.selected_region if self.custom_region_cb.isChecked() else None,
+            'workers': self.workers_input.value(),
+            'cache_path': DEFAULT_CACHE_PATH if self.cache_cb.isChecked() else None,
+            'preprocess': self.preprocess_combo.currentData(),
+            'stage_order': self.stage_order(),
+            'pdf_dpi': self.pdf_dpi_input.value(),
+            'orientation': self.orientation_cb.isChecked(),
+            'two_phase': self.two_phase_cb.isChecked(),
+            'profile': self.profile_input.text().strip() or DEFAULT_PROFILE,
+            'adaptive': self.adaptive_cb.isChecked(),
+            'auto_region': self.auto_region_cb.isChecked(),
+            'duplicate_policy': self.duplicate_combo.currentData(),
+            'restart': self.restart_cb.isChecked()
         }
+    
+    def start_process(self):
+        """开始处理按钮点击事件"""
+        if not self.validate_inputs():
+            return
+        
+        # 获取所有设置
+        options = self.get_options()
         
         # 获取源文件夹和目标文件夹
         source_folder = self.source_input.text()
@@ -335,85 +556,160 @@ class MainWindow(QMainWindow):
         success_folder = os.path.join(target_folder, 'success')
         os.makedirs(success_folder, exist_ok=True)
         
-        # 获取源文件夹中的图片文件
-        image_files = [f for f in os.listdir(source_folder) 
-                      if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.pdf'))]
+        watcher = None
+        if self.watch_cb.isChecked():
+            # 监视模式：已有文件和之后放入的文件都由监视器按写入完成顺序送入队列
+            image_files = []
+            watcher = FolderWatcher(source_folder)
+        else:
+            # 获取源文件夹中的图片文件
+            image_files = list_image_files(source_folder)
+            
+            if not image_files:
+                QMessageBox.warning(self, "警告", "源文件夹中没有图片文件！")
+                return
+        
+        # 在后台线程中处理，界面保持响应
+        self.process_thread = ProcessThread(image_files, target_folder, success_folder, options, watcher)
+        self.process_thread.progress_updated.connect(self.update_progress)
+        self.process_thread.watch_updated.connect(self.update_watch_status)
+        self.process_thread.process_finished.connect(self.process_finished)
         
+        # 禁用开始按钮，启用暂停/取消
+        self.start_btn.setEnabled(False)
+        self.dry_run_btn.setEnabled(False)
+        self.pause_btn.setEnabled(True)
+        self.pause_btn.setText("暂停")
+        self.cancel_btn.setEnabled(True)
+        self.watch_cb.setEnabled(False)
+        if watcher is not None:
+            # 总数未知，进度条显示为忙碌状态
+            self.progress.setRange(0, 0)
+            self.status_label.setText(f"正在监视: {source_folder}")
+        else:
+            self.progress.setValue(0)
+            self.status_label.setText(f"正在处理... (0/{len(image_files)})")
+        
+        self.process_thread.start()
+    
+    def start_dry_run(self):
+        """试运行按钮点击事件：只需要源文件夹"""
+        source_folder = self.source_input.text()
+        if not source_folder:
+            QMessageBox.warning(self, "警告", "请先选择待处理文件夹！")
+            return
+        if not (self.barcode_cb.isChecked() or self.qrcode_cb.isChecked() or self.text_cb.isChecked()):
+            QMessageBox.warning(self, "警告", "请至少选择一种识别方式！")
+            return
+        if not self.validate_stage_order():
+            return
+        image_files = list_image_files(source_folder)
         if not image_files:
             QMessageBox.warning(self, "警告", "源文件夹中没有图片文件！")
             return
         
-        # 创建扫描器实例
-        try:
-            scanner = WaybillScanner()
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"初始化扫描器失败：{str(e)}")
-            return
+        self.process_thread = DryRunThread(image_files, self.get_options(), self.sample_input.value())
+        self.process_thread.progress_updated.connect(self.update_progress)
+        self.process_thread.dry_run_finished.connect(self.dry_run_finished)
         
-        # 禁用开始按钮
         self.start_btn.setEnabled(False)
+        self.dry_run_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
         self.progress.setValue(0)
+        self.status_label.setText(f"试运行：从 {len(image_files)} 个文件中抽样识别...")
+        self.process_thread.start()
+    
+    def dry_run_finished(self, report):
+        """试运行完成：显示识别率和预计耗时，详细信息中列出各步骤耗时和未识别的文件"""
+        self.start_btn.setEnabled(True)
+        self.dry_run_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        self.process_thread = None
+        self.status_label.setText("就绪")
         
-        # 处理每个图片
-        success_count = 0
-        failed_count = 0
-        total = len(image_files)
+        if report.get('fatal'):
+            QMessageBox.critical(self, "错误", f"试运行失败：{report['fatal']}")
+            return
         
-        # 创建处理记录文件
-        log_path = os.path.join(target_folder, 'process_log.txt')
-        with open(log_path, 'w', encoding='utf-8') as log_file:
-            log_file.write(f"处理时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            log_file.write("----------------------------------------\n")
-            
-            for i, image_file in enumerate(image_files, 1):
-                try:
-                    image_path = os.path.join(source_folder, image_file)
-                    result = scanner.scan_image(image_path, options)
-                    
-                    if result:
-                        # 构建新文件名
-                        new_name = f"{result}{os.path.splitext(image_file)[1]}"
-                        new_path = os.path.join(success_folder, new_name)
-                        
-                        # 移动文件到成功文件夹
-                        shutil.move(image_path, new_path)
-                        success_count += 1
-                        
-                        # 记录成功
-                        log_file.write(f"成功 - {image_file} -> {new_name}\n")
-                    else:
-                        # 记录失败但不移动文件
-                        failed_count += 1
-                        log_file.write(f"失败 - {image_file} (未识别到运单号)\n")
-                    
-                    # 更新进度
-                    self.progress.setValue(int(i * 100 / total))
-                    self.status_label.setText(f"正在处理: {image_file} ({i}/{total})")
-                    QApplication.processEvents()  # 保持界面响应
-                    
-                except Exception as e:
-                    # 记录错误但不移动文件
-                    failed_count += 1
-                    log_file.write(f"错误 - {image_file} ({str(e)})\n")
-                    QMessageBox.warning(self, "警告", f"处理文件 {image_file} 时出错：{str(e)}")
-            
-            # 写入统计信息
-            log_file.write("\n----------------------------------------\n")
-            log_file.write(f"处理完成！\n")
-            log_file.write(f"总数：{total}\n")
-            log_file.write(f"成功：{success_count}\n")
-            log_file.write(f"失败：{failed_count}\n")
-        
-        # 启用开始按钮
+        text = format_report(report)
+        box = QMessageBox(self)
+        box.setWindowTitle("试运行结果（已取消）" if report['cancelled'] else "试运行结果")
+        box.setIcon(QMessageBox.Icon.Information)
+        # 摘要在正文中显示，步骤耗时和未识别的文件放在详细信息中
+        box.setText(text.split('\n\n')[0])
+        box.setDetailedText(text)
+        box.exec()
+    
+    def toggle_pause(self):
+        """暂停/继续"""
+        if not self.process_thread:
+            return
+        if self.process_thread.paused:
+            self.process_thread.resume()
+            self.pause_btn.setText("暂停")
+        else:
+            self.process_thread.pause()
+            self.pause_btn.setText("继续")
+            self.status_label.setText("已暂停（正在识别的文件完成后停止）")
+    
+    def cancel_process(self):
+        """取消处理"""
+        if self.process_thread:
+            self.process_thread.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.pause_btn.setEnabled(False)
+            self.status_label.setText("正在取消...")
+    
+    def update_progress(self, current, total, filename):
+        """更新进度显示"""
+        self.progress.setValue(int(current * 100 / total) if total else 100)
+        if filename and not self.process_thread.paused:
+            self.status_label.setText(f"正在处理: {filename} ({current}/{total})")
+    
+    def update_watch_status(self, processed, depth, latency):
+        """更新监视模式状态"""
+        if not self.process_thread.paused:
+            self.status_label.setText(
+                f"监视中: 已处理 {processed} 个，队列 {depth} 个，最近延迟 {latency:.1f} 秒")
+    
+    def process_finished(self, summary):
+        """处理完成：汇总显示结果和错误"""
+        self.progress.setRange(0, 100)
+        self.watch_cb.setEnabled(True)
         self.start_btn.setEnabled(True)
+        self.pause_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(False)
+        self.dry_run_btn.setEnabled(True)
+        self.process_thread = None
+        
+        if summary['fatal']:
+            QMessageBox.critical(self, "错误", f"批量识别失败：{summary['fatal']}")
+            self.status_label.setText("就绪")
+            return
         
-        # 显示结果
-        QMessageBox.information(self, "完成", 
-            f"处理完成！\n总数：{total}\n成功：{success_count}\n失败：{failed_count}\n\n"
-            f"处理记录已保存到：{log_path}")
+        title = "已取消" if summary['cancelled'] else "完成"
+        box = QMessageBox(self)
+        box.setWindowTitle(title)
+        box.setIcon(QMessageBox.Icon.Warning if summary['errors'] else QMessageBox.Icon.Information)
+        box.setText(
+            f"{'已取消' if summary['cancelled'] else '处理完成'}！\n"
+            f"总数：{summary['total']}\n已处理：{summary['processed']}\n"
+            f"成功：{summary['success']}\n失败：{summary['failed']}\n"
+            f"重复跳过：{summary['duplicate']}\n出错：{len(summary['errors'])}\n"
+            + (f"（继续上次未完成的处理，之前已完成 {summary['resumed']} 个）\n" if summary['resumed'] else "")
+            + f"\n处理记录已保存到：{summary['log_path']}")
+        if summary['errors']:
+            box.setDetailedText('\n'.join(f"{name}: {error}" for name, error in summary['errors']))
+        box.exec()
         
         self.status_label.setText("就绪")
-        self.progress.setValue(100)
+    
+    def closeEvent(self, event):
+        """关闭窗口时停止后台处理"""
+        if self.process_thread:
+            self.process_thread.cancel()
+            self.process_thread.wait()
+        super().closeEvent(event)
     
     def validate_inputs(self):
         """验证输入"""
@@ -429,4 +725,7 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "警告", "最小长度不能大于最大长度！")
             return False
         
+        if not self.validate_stage_order():
+            return False
+        
         return True
\ No newline at end of file
@@ -0,0 +1,234 @@
+import os
+import time
+import threading
+from datetime import datetime
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from core.batch import BatchRunner
+from core.output import OutputStage, decision_settings, DEFAULT_DUPLICATE_POLICY
+from core.dryrun import DryRun
+
+
+class ProcessThread(QThread):
+    """批处理线程：识别、移动文件和写处理记录都在后台完成，界面线程只负责显示"""
+    progress_updated = pyqtSignal(int, int, str)  # 进度更新信号（已处理数, 总数, 当前文件）
+    process_finished = pyqtSignal(dict)  # 处理完成信号（汇总信息）
+    watch_updated = pyqtSignal(int, int, float)  # 监视模式状态（已处理数, 队列深度, 最近一个文件的端到端延迟）
+    
+    # 进度信号的最小间隔（秒），避免大批量时刷屏拖慢界面
+    PROGRESS_INTERVAL = 0.25
+    
+    def __init__(self, image_files, target_folder, success_folder, options, watcher=None):
+        super().__init__()
+        self.image_files = image_files
+        # 监视模式：从 FolderWatcher 持续领取新文件，直到取消
+        self.watcher = watcher
+        self.target_folder = target_folder
+        self.success_folder = success_folder
+        self.options = options
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+        self.output = None
+    
+    def cancel(self):
+        """取消处理（正在识别的文件完成后停止）"""
+        self._cancelled.set()
+        self._running.set()
+        if self.watcher is not None:
+            self.watcher.stop()
+    
+    def pause(self):
+        """暂停：不再领取新的识别结果，在途任务完成后工作进程空闲等待"""
+        self._running.clear()
+    
+    def resume(self):
+        self._running.set()
+    
+    @property
+    def paused(self):
+        return not self._running.is_set()
+    
+    def run(self):
+        summary = {
+            'total': 0,
+            'processed': 0,
+            'success': 0,
+            'failed': 0,
+            'duplicate': 0,
+            'resumed': 0,        # 继续上次中断的处理时，上次已完成的文件数
+            'errors': [],        # [(文件名, 错误信息)]
+            'cancelled': False,
+            'fatal': None,       # 扫描器初始化失败等导致整批中止的错误
+            'log_path': os.path.join(self.target_folder, 'process_log.txt'),
+        }
+        last_emit = 0.0
+        runner = BatchRunner(self.options)
+        try:
+            # 带日志的输出：上次处理中断时从中断处继续（选择忽略上次记录时重新开始）
+            self.output = OutputStage(
+                self.success_folder,
+                self.options.get('duplicate_policy') or DEFAULT_DUPLICATE_POLICY,
+                resume=not self.options.get('restart'),
+                settings=decision_settings(self.options)
+            )
+        except (OSError, ValueError) as e:
+            summary['fatal'] = str(e)
+            self.process_finished.emit(summary)
+            return
+        summary['resumed'] = self.output.resumed
+        
+        # 创建处理记录文件（继续处理时追加）
+        with open(summary['log_path'], 'a' if self.output.resumed else 'w', encoding='utf-8') as log_file:
+            log_file.write(f"处理时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            if self.output.resumed:
+                log_file.write(f"继续上次未完成的处理，已完成 {self.output.resumed} 个文件\n")
+            log_file.write("----------------------------------------\n")
+            
+            if self.watcher is not None:
+                source = self.output.pending(self.watcher.start())
+            else:
+                source = list(self.output.pending(self.image_files))
+            summary['total'] = total = len(source) if self.watcher is None else 0
+            results = runner.run(source)
+            try:
+                for scan_result in results:
+                    image_file = os.path.basename(scan_result.path)
+                    self._record(scan_result, image_file, log_file, summary)
+                    log_file.flush()
+                    summary['processed'] += 1
+                    last_file = summary['processed'] == total
+                    if self.watcher is not None:
+                        summary['total'] = total = summary['processed']
+                        latency = self._watch_latency(scan_result, runner.metrics)
+                        last_file = False
+                    
+                    # 节流发送进度
+                    now = time.monotonic()
+                    if now - last_emit >= self.PROGRESS_INTERVAL or last_file:
+                        if self.watcher is not None:
+                            self.watch_updated.emit(summary['processed'], self.watcher.depth(), latency)
+                        else:
+                            self.progress_updated.emit(summary['processed'], total, image_file)
+                        last_emit = now
+                    
+                    # 暂停时在这里等待，取消时停止领取结果
+                    self._running.wait()
+                    if self._cancelled.is_set():
+                        summary['cancelled'] = True
+                        break
+            except Exception as e:
+                # 扫描器初始化失败或工作进程异常退出
+                summary['fatal'] = str(e)
+            finally:
+                if self.watcher is not None:
+                    self.watcher.stop()
+                results.close()
+                # 取消或出错时不标记结束，下次处理从中断处继续；监视模式只能由取消停止，正常结束
+                self.output.close(not summary['fatal'] and (not summary['cancelled'] or self.watcher is not None))
+            
+            # 导出各步骤耗时统计
+            runner.metrics.write(os.path.join(self.target_folder, 'metrics.json'))
+            
+            # 写入统计信息
+            log_file.write("\n----------------------------------------\n")
+            log_file.write("已取消！\n" if summary['cancelled'] else "处理完成！\n")
+            log_file.write(f"总数：{total}\n")
+            log_file.write(f"已处理：{summary['processed']}\n")
+            log_file.write(f"成功：{summary['success']}\n")
+            log_file.write(f"失败：{summary['failed']}\n")
+            log_file.write(f"重复跳过：{summary['duplicate']}\n")
+            for name, phase in runner.metrics.phases.items():
+                log_file.write(f"阶段 {name}：{phase['files']} 个文件，识别 {phase['recognized']} 个，"
+                               f"耗时 {phase['seconds']:.1f}s\n")
+            stall = runner.metrics.stall_summary()
+            log_file.write(f"读取 {stall['read']:.1f}s 解码 {stall['decode']:.1f}s 识别 {stall['recognize']:.1f}s "
+                           f"等待预读 {stall['wait']:.1f}s（{stall['wait_ratio']:.0%}）\n")
+        
+        self.progress_updated.emit(summary['processed'], total, '')
+        self.process_finished.emit(summary)
+    
+    def _watch_latency(self, scan_result, metrics):
+        """记录监视模式的端到端延迟（发现文件到重命名完成）和队列深度"""
+        depth = self.watcher.depth()
+        metrics.set_gauge('watch_queue_depth', depth)
+        metrics.set_gauge('watch_queue_depth_max', self.watcher.max_depth)
+        arrival = self.watcher.arrival(scan_result.path)
+        if arrival is None:
+            return 0.0
+        latency = time.monotonic() - arrival
+        metrics.observe_value('watch.latency', latency)
+        return latency
+    
+    def _record(self, scan_result, image_file, log_file, summary):
+        """移动识别成功的文件并写处理记录，错误只收集不弹窗"""
+        try:
+            if scan_result.error:
+                raise RuntimeError(scan_result.error)
+            
+            if scan_result.number:
+                # 移动文件到成功文件夹
+                new_name = self.output.commit(scan_result.path, scan_result.number)
+                if new_name is None:
+                    # 运单号重复，按设置跳过
+                    summary['duplicate'] += 1
+                    log_file.write(f"重复 - {image_file} ({scan_result.number} 已存在，保留原文件)\n")
+                    return
+                summary['success'] += 1
+                
+                # 记录成功
+                log_file.write(f"成功 - {image_file} -> {new_name}\n")
+            else:
+                # 记录失败但不移动文件
+                summary['failed'] += 1
+                self.output.fail(scan_result.path, 'not recognized')
+                log_file.write(f"失败 - {image_file} (未识别到运单号)\n")
+        
+        except Exception as e:
+            # 记录错误但不移动文件
+            summary['failed'] += 1
+            summary['errors'].append((image_file, str(e)))
+            self.output.fail(scan_result.path, str(e))
+            log_file.write(f"错误 - {image_file} ({str(e)})\n")
+
+
+class DryRunThread(QThread):
+    """试运行线程：识别随机样本，不移动文件"""
+    progress_updated = pyqtSignal(int, int, str)  # 进度更新信号（已识别数, 样本数, 当前文件）
+    dry_run_finished = pyqtSignal(dict)  # 试运行完成信号（报告，出错时只有 fatal）
+    
+    def __init__(self, image_files, options, sample_size):
+        super().__init__()
+        self.image_files = image_files
+        self.options = options
+        self.sample_size = sample_size
+        self._cancelled = threading.Event()
+    
+    def cancel(self):
+        """取消试运行，报告只包含已识别的样本"""
+        self._cancelled.set()
+    
+    @property
+    def paused(self):
+        # 试运行不支持暂停，与 ProcessThread 保持相同的接口
+        return False
+    
+    def run(self):
+        try:
+            dry_run = DryRun(self.image_files, self.options, self.sample_size)
+            total = len(dry_run.sample)
+            results = dry_run.run()
+            try:
+                for index, scan_result in enumerate(results, 1):
+                    self.progress_updated.emit(index, total, os.path.basename(scan_result.path))
+                    if self._cancelled.is_set():
+                        break
+            finally:
+                results.close()
+        except Exception as e:
+            self.dry_run_finished.emit({'fatal': str(e)})
+            return
+        report = dry_run.report()
+        report['cancelled'] = self._cancelled.is_set()
+        self.dry_run_finished.emit(report)